@@ -2,11 +2,13 @@
 Authentication endpoints
 """
 
+import asyncio
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException, status
 
 from app.core.database import get_uow
+from app.core.telegram_suppression import telegram_suppression_list
 from app.database.unit_of_work import UnitOfWork
 from app.schemas.auth import TelegramAuth, Token
 from app.services.auth_service import AuthService
@@ -41,6 +43,9 @@ async def auth_telegram(auth_data: TelegramAuth, uow: UnitOfWork = Depends(get_u
 
             logger.info(f"Auth success: user_id={user.id}, telegram_id={user.telegram_id}")
 
+            # Пользователь снова пишет боту - доставка в его чат снова возможна
+            await asyncio.to_thread(telegram_suppression_list.unsuppress, user.telegram_id)
+
             return Token(access_token=token, token_type="bearer")
 
         except HTTPException:
@@ -2,14 +2,16 @@
 Auto Payment endpoints - эндпоинты для тестирования и мониторинга автоплатежей
 """
 
+import asyncio
 from datetime import datetime, timezone
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 
 from app.core.database import get_uow
 from app.core.logger import logger
 from app.core.redis_client import redis_client
+from app.core.renewal_pacer import RenewalPacer
 from app.database.unit_of_work import UnitOfWork
 from app.services.auto_payment_service import AutoPaymentService
 
@@ -265,6 +267,35 @@ async def get_auto_payment_stats(uow: UnitOfWork = Depends(get_uow)):
             )
 
 
+@router.get("/forecast", response_model=dict[str, Any])
+async def get_renewal_forecast(
+    days: int = Query(7, ge=1, le=90, description="Количество дней прогноза, начиная с сегодняшнего"),
+    uow: UnitOfWork = Depends(get_uow),
+):
+    """
+    Получить прогноз продлений на ближайшие N дней по календарю продлений.
+
+    GET /api/v1/auto-payments/forecast?days=7
+
+    Returns:
+        Dict с количеством продлений и ожидаемой суммой по дням
+    """
+    async with uow:
+        try:
+            forecast = await uow.subscriptions.get_renewal_forecast(days)
+            return {
+                "days": days,
+                "total": sum(day["count"] for day in forecast),
+                "amount": sum(day["amount"] for day in forecast),
+                "forecast": forecast,
+            }
+        except Exception as e:
+            logger.error(f"Error getting renewal forecast: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Ошибка получения прогноза: {str(e)}"
+            )
+
+
 @router.post("/simulate-subscription-ending/{subscription_id}", response_model=dict[str, Any])
 async def simulate_subscription_ending(subscription_id: int, uow: UnitOfWork = Depends(get_uow)):
     """
@@ -499,7 +530,8 @@ async def process_cancelled_waiting():
 async def get_redis_status():
     """
     Получить статус Redis для автосписаний.
-    Показывает подписки в Redis на сегодня.
+    Показывает подписки в Redis на сегодня и журнал дневного запуска:
+    счетчики (collected/charged/skipped/failed/notified), скорость обработки и ETA.
 
     GET /api/v1/auto-payments/redis-status
 
@@ -510,8 +542,15 @@ async def get_redis_status():
         today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
         subscription_ids = redis_client.get_subscriptions_for_date(today_str)
         count = redis_client.get_subscriptions_count(today_str)
+        run = redis_client.get_run_status(today_str)
 
-        return {"date": today_str, "subscription_ids": list(subscription_ids), "count": count, "redis_available": True}
+        return {
+            "date": today_str,
+            "subscription_ids": list(subscription_ids),
+            "count": count,
+            "run": run,
+            "redis_available": True,
+        }
     except Exception as e:
         logger.error(f"Error getting Redis status: {str(e)}")
         return {
@@ -523,6 +562,92 @@ async def get_redis_status():
         }
 
 
+@router.get("/pacing-status", response_model=dict[str, Any])
+async def get_pacing_status():
+    """
+    Получить прогресс сегодняшнего запуска автосписаний и прогноз его завершения.
+
+    GET /api/v1/auto-payments/pacing-status
+
+    Returns:
+        Dict с прогрессом, плановой/фактической скоростью и признаком выхода за окно
+    """
+    try:
+        today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        return RenewalPacer.get_status(today_str)
+    except Exception as e:
+        logger.error(f"Error getting pacing status: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error getting pacing status: {str(e)}"
+        )
+
+
+@router.get("/yookassa-pool-status", response_model=dict[str, Any])
+async def get_yookassa_pool_status():
+    """
+    Получить состояние клиентов API Юкассы: переиспользование соединений, состояние circuit breaker
+    и счетчики кэша платежей (payment_cache: проверки статуса, обслуженные без запроса к API).
+    sync - суммарно по Celery воркерам, async - суммарно по процессам FastAPI,
+    current_process - счетчики async клиента текущего процесса API (включая еще не сброшенные в Redis).
+    Счетчики читаются из Redis в потоке, не блокируя event loop.
+
+    GET /api/v1/auto-payments/yookassa-pool-status
+
+    Returns:
+        Dict со счетчиками соединений, состоянием цепи и счетчиками кэша платежей
+    """
+    try:
+        from app.core.clients.async_yookassa_client import async_yookassa_client
+        from app.core.yookassa_circuit_breaker import yookassa_circuit_breaker
+
+        def collect() -> dict[str, Any]:
+            return {
+                "sync": redis_client.get_http_pool_stats("sync"),
+                "async": redis_client.get_http_pool_stats("async"),
+                "circuit": yookassa_circuit_breaker.get_state(),
+                "payment_cache": redis_client.get_payment_cache_stats(),
+            }
+
+        result = await asyncio.to_thread(collect)
+        result["current_process"] = async_yookassa_client.stats.snapshot()
+        return result
+    except Exception as e:
+        logger.error(f"Error getting YooKassa pool status: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error getting YooKassa pool status: {str(e)}"
+        )
+
+
+@router.get("/webhook-status", response_model=dict[str, Any])
+async def get_webhook_status():
+    """
+    Получить состояние обработки webhook-ов Юкассы: очередь (webhook_stream: длина, неподтвержденные,
+    dead letter) и дедупликация (webhook_dedup: новые события, отброшенные повторы, захваты через БД).
+    Счетчики читаются из Redis в потоке, не блокируя event loop.
+
+    GET /api/v1/auto-payments/webhook-status
+
+    Returns:
+        Dict с состоянием очереди и счетчиками дедупликации webhook-ов
+    """
+    try:
+        from app.core.payment_webhook_stream import payment_webhook_stream
+        from app.core.webhook_deduplicator import webhook_deduplicator
+
+        def collect() -> dict[str, Any]:
+            return {
+                "webhook_stream": payment_webhook_stream.get_stats(),
+                "webhook_dedup": webhook_deduplicator.get_stats(),
+            }
+
+        return await asyncio.to_thread(collect)
+    except Exception as e:
+        logger.error(f"Error getting webhook status: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error getting webhook status: {str(e)}"
+        )
+
+
 @router.get("/cancelled-waiting", response_model=list[dict[str, Any]])
 async def get_cancelled_waiting_subscriptions(uow: UnitOfWork = Depends(get_uow)):
     """
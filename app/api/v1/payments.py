@@ -2,10 +2,13 @@
 # FASTAPI ENDPOINTS ДЛЯ ПЛАТЕЖЕЙ
 # ===========================================
 
+import asyncio
+import math
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 
-from app.core.database import get_uow
+from app.core.database import db_manager, get_uow
+from app.core.exceptions import YookassaUnavailable
 from app.database.unit_of_work import UnitOfWork
 from app.schemas.payment import (
     ChangePaymentMethodRequest,
@@ -53,6 +56,12 @@ async def create_payment(request: PaymentCreateRequest, uow: UnitOfWork = Depend
             return result
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+        except YookassaUnavailable as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            )
         except RuntimeError as e:
             raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
         except Exception as e:
@@ -92,6 +101,12 @@ async def create_payment_two_stage(request: PaymentCreateRequest, uow: UnitOfWor
             return result
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+        except YookassaUnavailable as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            )
         except RuntimeError as e:
             raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
         except Exception as e:
@@ -124,6 +139,12 @@ async def capture_payment(payment_id: int, uow: UnitOfWork = Depends(get_uow)):
             return result
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except YookassaUnavailable as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            )
         except RuntimeError as e:
             raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
         except Exception as e:
@@ -157,6 +178,12 @@ async def cancel_payment(payment_id: int, uow: UnitOfWork = Depends(get_uow)):
             return result
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except YookassaUnavailable as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            )
         except RuntimeError as e:
             raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
         except Exception as e:
@@ -197,6 +224,12 @@ async def change_payment_method(request: ChangePaymentMethodRequest, uow: UnitOf
             return result
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+        except YookassaUnavailable as e:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=str(e),
+                headers={"Retry-After": str(math.ceil(e.retry_after))},
+            )
         except RuntimeError as e:
             raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
         except Exception as e:
@@ -206,7 +239,7 @@ async def change_payment_method(request: ChangePaymentMethodRequest, uow: UnitOf
 
 
 @router.post("/webhook")
-async def yookassa_webhook(request: Request, uow: UnitOfWork = Depends(get_uow)):
+async def yookassa_webhook(request: Request):
     """
     Endpoint: Webhook от Юкассы
 
@@ -224,8 +257,19 @@ async def yookassa_webhook(request: Request, uow: UnitOfWork = Depends(get_uow))
     Для локальной разработки можно использовать ngrok или аналогичные сервисы.
 
     Примечание: Для ngrok используйте команду: ngrok http 8000
+
+    При YOOKASSA_WEBHOOK_STREAM_ENABLED событие только добавляется в Redis Stream и ответ 200
+    возвращается сразу; обработку пачками выполняет Celery задача consume_payment_webhooks.
+    Если Redis недоступен, webhook обрабатывается сразу, как раньше. Платеж из webhook-а, пришедшего
+    с адреса Юкассы (YOOKASSA_WEBHOOK_TRUSTED_NETWORKS), сохраняется в кэш платежей. Сессия БД открывается
+    только в этом случае: при записи в Stream endpoint не занимает соединение из пула.
     """
+    from app.core.clients.async_yookassa_client import async_yookassa_client
+    from app.core.config import settings
     from app.core.logger import logger
+    from app.core.payment_webhook_stream import payment_webhook_stream
+    from app.core.redis_client import redis_client
+    from app.core.yookassa_webhook_source import is_yookassa_webhook_source
 
     try:
         webhook_data = await request.json()
@@ -233,16 +277,35 @@ async def yookassa_webhook(request: Request, uow: UnitOfWork = Depends(get_uow))
         logger.info(f"Webhook received: {webhook_data}")
         logger.info(f"Webhook headers: {dict(request.headers)}")
 
-        async with uow:
+        # Платеж из webhook-а с адреса Юкассы сохраняется в кэш финальных статусов (get_payment_cached)
+        client_host = request.client.host if request.client else None
+        if str(webhook_data.get("event", "")).startswith("payment.") and is_yookassa_webhook_source(client_host):
+            await asyncio.to_thread(redis_client.cache_payment, webhook_data.get("object") or {})
+
+        if settings.YOOKASSA_WEBHOOK_STREAM_ENABLED:
             try:
-                service = PaymentService(uow)
-                result = await service.process_webhook(webhook_data)
-                logger.info(f"Webhook processed successfully: {result}")
-                return result
+                message_id = await asyncio.to_thread(payment_webhook_stream.add, webhook_data)
+                return {"status": "ok", "message": "Webhook queued", "message_id": message_id}
             except Exception as e:
-                # Юкассе важно, чтобы мы вернули 200, даже если была ошибка
-                logger.error(f"Webhook processing error: {str(e)}", exc_info=True)
-                return {"status": "ok", "message": "Webhook received"}
+                logger.error(f"Failed to queue webhook in Redis Stream, processing inline: {str(e)}")
+
+        session = await db_manager.get_session()
+        try:
+            async with UnitOfWork(session, async_yookassa_client) as uow:
+                try:
+                    service = PaymentService(uow)
+                    result = await service.process_webhook(webhook_data)
+                    logger.info(f"Webhook processed successfully: {result}")
+                    return result
+                except Exception as e:
+                    # Юкассе важно, чтобы мы вернули 200, даже если была ошибка.
+                    # Откатываем транзакцию: иначе захват события зафиксируется и повтор Юкассы
+                    # будет отброшен как дубликат
+                    logger.error(f"Webhook processing error: {str(e)}", exc_info=True)
+                    await uow.rollback()
+                    return {"status": "ok", "message": "Webhook received"}
+        finally:
+            await session.close()
     except Exception as e:
         # Ошибка при парсинге JSON - логируем и возвращаем 200
         logger.error(f"Webhook JSON parsing error: {str(e)}", exc_info=True)
@@ -2,9 +2,12 @@
 User endpoints
 """
 
+import asyncio
+
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 
 from app.core.database import get_uow
+from app.core.telegram_id_cache import telegram_id_cache
 from app.database.unit_of_work import UnitOfWork
 from app.schemas.user import User, UserUpdate
 from app.services.user_service import UserService
@@ -60,9 +63,11 @@ async def transfer_user(user_id: int, new_telegram_id: int, uow: UnitOfWork = De
         try:
             service = UserService(uow)
             user = await service.update_user_by_telegram_id(user_id, new_telegram_id)
-            return user
         except Exception as e:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    # После коммита: уведомление, отправленное между сменой и коммитом, могло закэшировать старый telegram_id
+    await asyncio.to_thread(telegram_id_cache.invalidate, user_id)
+    return user
 
 
 @router.get("/", response_model=list[User])
@@ -55,6 +55,30 @@ if settings.CELERY_BROKER_URL and settings.CELERY_RESULT_BACKEND:
                         hour=settings.AUTO_PAYMENT_START_HOUR, minute=settings.AUTO_PAYMENT_START_MINUTE
                     ),
                 },
+                "dispatch-paced-renewals": {
+                    "task": "app.tasks.auto_payment.dispatch_paced_renewals",
+                    "schedule": settings.AUTO_PAYMENT_PACING_TICK_SECONDS,
+                },
+                "retry-failed-payments": {
+                    "task": "app.tasks.payment.retry_failed_payments",
+                    "schedule": 60.0,  # Каждую минуту - попытки с наступившим next_retry_at
+                },
+                "consume-payment-webhooks": {
+                    "task": "app.tasks.payment.consume_payment_webhooks",
+                    "schedule": settings.YOOKASSA_WEBHOOK_CONSUMER_INTERVAL_SECONDS,
+                },
+                "cleanup-processed-webhook-events": {
+                    "task": "app.tasks.payment.cleanup_processed_webhook_events",
+                    "schedule": crontab(hour=3, minute=30),  # Каждый день в 03:30
+                },
+                "reconcile-payments": {
+                    "task": "app.tasks.payment.reconcile_payments",
+                    "schedule": settings.PAYMENT_RECONCILIATION_INTERVAL_SECONDS,
+                },
+                "dispatch-notification-outbox": {
+                    "task": "app.tasks.notification.dispatch_notification_outbox",
+                    "schedule": settings.NOTIFICATION_OUTBOX_SWEEP_INTERVAL_SECONDS,
+                },
                 "send-payment-reminders": {
                     "task": "app.tasks.auto_payment.send_payment_reminders",
                     "schedule": crontab(hour=1, minute=0),  # Каждый день в 01:00
@@ -120,7 +144,8 @@ if settings.CELERY_BROKER_URL and settings.CELERY_RESULT_BACKEND:
             но ДО того, как задачи начнут выполняться. Каждый worker процесс
             получает свой собственный вызов этого сигнала.
 
-            Инициализируем синхронный engine для Celery задач и конфигурируем YooKassa SDK.
+            Инициализируем синхронный engine для Celery задач, постоянный event loop с async engine
+            для async задач, конфигурируем YooKassa SDK и открываем пул соединений к API Юкассы.
             """
             import os
 
@@ -154,6 +179,17 @@ if settings.CELERY_BROKER_URL and settings.CELERY_RESULT_BACKEND:
                     # Воркер все равно должен быть способен выполнять задачи
                     logger.warning(f"[PID {pid}] Worker will continue, but database-dependent tasks may fail")
 
+            # Постоянный event loop и async engine процесса для async задач (run_async)
+            try:
+                from app.tasks.utils import init_worker_async_runtime
+
+                init_worker_async_runtime()
+                logger.info(f"[PID {pid}] Async runtime initialized in Celery worker")
+            except Exception as e:
+                logger.error(f"[PID {pid}] Failed to initialize async runtime in Celery worker: {e}", exc_info=True)
+                # НЕ прерываем запуск воркера - runtime будет создан при первой async задаче
+                logger.warning(f"[PID {pid}] Async runtime will be initialized lazily on first async task")
+
             # Инициализируем YooKassa SDK для Celery воркера
             try:
                 if not settings.YOOKASSA_SHOP_ID or not settings.YOOKASSA_SECRET_KEY:
@@ -166,6 +202,15 @@ if settings.CELERY_BROKER_URL and settings.CELERY_RESULT_BACKEND:
                         f"[PID {pid}] YooKassa configuration initialized in Celery worker: "
                         f"account_id={str(settings.YOOKASSA_SHOP_ID)}"
                     )
+
+                    # Пул keep-alive соединений процесса к API Юкассы
+                    from app.core.clients.yookassa_client import yookassa_client
+
+                    yookassa_client.open()
+                    logger.info(
+                        f"[PID {pid}] YooKassa HTTP pool opened: pool_size={settings.YOOKASSA_HTTP_POOL_SIZE}, "
+                        f"keepalive_expiry={settings.YOOKASSA_HTTP_KEEPALIVE_EXPIRY}s"
+                    )
             except Exception as e:
                 logger.error(f"[PID {pid}] Failed to initialize YooKassa in Celery worker: {e}", exc_info=True)
                 # НЕ прерываем запуск воркера - не все задачи требуют YooKassa
@@ -186,7 +231,7 @@ if settings.CELERY_BROKER_URL and settings.CELERY_RESULT_BACKEND:
         @worker_process_shutdown.connect
         def shutdown_worker_process(sender=None, **kwargs):
             """
-            Закрыть все соединения с БД при завершении worker процесса.
+            Закрыть все соединения с БД и API Юкассы при завершении worker процесса.
 
             Это важно для правильной очистки ресурсов и предотвращения
             утечек соединений.
@@ -199,6 +244,23 @@ if settings.CELERY_BROKER_URL and settings.CELERY_RESULT_BACKEND:
             pid = os.getpid()
             logger.info(f"[PID {pid}] worker_process_shutdown signal received")
 
+            # Закрываем async engine и event loop процесса
+            try:
+                from app.tasks.utils import shutdown_worker_async_runtime
+
+                shutdown_worker_async_runtime()
+                logger.info(f"[PID {pid}] Async runtime closed")
+            except Exception as e:
+                logger.warning(f"[PID {pid}] Error closing async runtime: {e}")
+
+            # Закрываем пул соединений к API Юкассы
+            try:
+                from app.core.clients.yookassa_client import yookassa_client
+
+                yookassa_client.close()
+            except Exception as e:
+                logger.warning(f"[PID {pid}] Error closing YooKassa HTTP pool: {e}")
+
             # Закрываем синхронный engine
             if db_manager.sync_engine is not None:
                 try:
@@ -38,6 +38,11 @@ class AutoPaymentConfig:
             "max_attempts": settings.AUTO_PAYMENT_MAX_ATTEMPTS,
             "retry_interval_seconds": settings.AUTO_PAYMENT_RETRY_INTERVAL_SECONDS,
             "redis_ttl_hours": settings.AUTO_PAYMENT_REDIS_TTL_HOURS,
+            "chunked_mode": settings.AUTO_PAYMENT_CHUNKED_MODE,
+            "chunk_size": settings.AUTO_PAYMENT_CHUNK_SIZE,
+            "chunk_concurrency": settings.AUTO_PAYMENT_CHUNK_CONCURRENCY,
+            "claim_mode": settings.AUTO_PAYMENT_CLAIM_MODE,
+            "target_rate_per_second": settings.AUTO_PAYMENT_TARGET_RATE,
         }
 
     @classmethod
@@ -85,6 +90,18 @@ class AutoPaymentConfig:
         if not (1 <= config.get("redis_ttl_hours", 0) <= 168):
             return False
 
+        # Необязательные ключи (старые конфиги в Redis их не содержат)
+        if "chunked_mode" in config and not isinstance(config["chunked_mode"], bool):
+            return False
+        if "claim_mode" in config and not isinstance(config["claim_mode"], bool):
+            return False
+        if "target_rate_per_second" in config and not (0 <= config["target_rate_per_second"] <= 1000):
+            return False
+        if "chunk_size" in config and not (1 <= config["chunk_size"] <= 5000):
+            return False
+        if "chunk_concurrency" in config and not (1 <= config["chunk_concurrency"] <= 64):
+            return False
+
         return True
 
     @classmethod
@@ -99,7 +116,8 @@ class AutoPaymentConfig:
         # 1. Пытаемся загрузить из Redis
         config = cls._get_config_from_redis()
         if config and cls._validate_config(config):
-            return config
+            # Дополняем отсутствующие необязательные ключи значениями из settings
+            return {**cls._get_default_config(), **config}
 
         # 2. Fallback на settings
         default_config = cls._get_default_config()
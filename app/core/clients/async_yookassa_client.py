@@ -0,0 +1,246 @@
+import asyncio
+import time
+import uuid
+from typing import Any, Optional
+
+import httpx
+from yookassa.domain.exceptions import ApiError, TooManyRequestsError
+from yookassa.domain.response import PaymentResponse, RefundResponse
+
+from app.core.clients.yookassa_client import (
+    NEW_CONNECTION_EVENTS,
+    HttpPoolStats,
+    YookassaClient,
+    http_client_options,
+    raise_for_api_error,
+)
+from app.core.logger import logger
+from app.core.redis_client import redis_client
+from app.core.yookassa_circuit_breaker import yookassa_circuit_breaker
+from app.core.yookassa_rate_limiter import YookassaRateLimiter, retry_after_seconds, yookassa_rate_limiter
+from app.schemas.yookassa import YookassaPaymentRequest
+
+
+class AsyncYookassaClient:
+    """
+    Неблокирующий клиент для работы с API Юкассы (для FastAPI и async-задач).
+
+    Те же методы, что у YookassaClient, но запросы выполняются через httpx.AsyncClient
+    с пулом keep-alive соединений, а паузы между повторами - через asyncio.sleep.
+    Обращения к Redis (circuit breaker, лимит запросов, кэш платежей, счетчики пула) синхронные
+    и выполняются в потоке через asyncio.to_thread. Медленный ответ Юкассы или Redis
+    не блокирует event loop и остальные запросы воркера.
+    Ответы возвращаются в тех же типах SDK (PaymentResponse, RefundResponse).
+    """
+
+    MAX_RETRIES = YookassaClient.MAX_RETRIES
+    BASE_DELAY = YookassaClient.BASE_DELAY
+    RETRYABLE_STATUS_CODES = YookassaClient.RETRYABLE_STATUS_CODES
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = HttpPoolStats("async")
+        self.rate_limiter = yookassa_rate_limiter
+        self.circuit_breaker = yookassa_circuit_breaker
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Получить HTTP-клиент с пулом соединений.
+
+        Соединения пула привязаны к event loop, в котором созданы, поэтому клиент создается
+        лениво в текущем loop и пересоздается, если loop сменился.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(**http_client_options())
+            self._loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        """Закрыть HTTP-клиент и его соединения"""
+        client, self._client, self._loop = self._client, None, None
+        if client is None or client.is_closed:
+            return
+        try:
+            await asyncio.to_thread(self.stats.flush)
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing YooKassa HTTP client: {e}")
+
+    async def _send(
+        self, method: str, path: str, json: Optional[dict] = None, idempotency_key: Optional[str] = None
+    ) -> dict[str, Any]:
+        """Выполнить один запрос к API Юкассы и учесть, было ли открыто новое соединение"""
+        opened = []
+
+        async def trace(event_name: str, info: dict) -> None:
+            if event_name in NEW_CONNECTION_EVENTS:
+                opened.append(event_name)
+
+        headers = {"Idempotence-Key": idempotency_key} if idempotency_key else None
+        response = await self._get_client().request(
+            method, path, json=json, headers=headers, extensions={"trace": trace}
+        )
+        await asyncio.to_thread(self.stats.record, new_connection=bool(opened))
+        if response.status_code == TooManyRequestsError.HTTP_CODE:
+            retry_after = retry_after_seconds(response.headers.get("Retry-After")) or 0.0
+            await asyncio.to_thread(self.rate_limiter.block_for, retry_after)
+        raise_for_api_error(response)
+        return response.json()
+
+    async def _retry_request(self, operation: str, method: str, path: str, **kwargs) -> dict[str, Any]:
+        """
+        Общая логика повторных попыток для запросов к Юкассе (без блокировки event loop).
+        Перед каждой попыткой проверяется circuit breaker и берется токен общего лимита
+        запросов операции (create/find/refund). Пока цепь разомкнута, запрос сразу завершается
+        исключением YookassaCircuitOpen, без пауз между повторами.
+        """
+        for attempt in range(self.MAX_RETRIES + 1):
+            await asyncio.to_thread(self.circuit_breaker.before_call)
+            await self.rate_limiter.acquire_async(operation)
+            try:
+                data = await self._send(method, path, **kwargs)
+            except ApiError as e:
+                if e.HTTP_CODE >= 500:
+                    await asyncio.to_thread(self.circuit_breaker.record_failure)
+                elif e.HTTP_CODE not in self.RETRYABLE_STATUS_CODES:
+                    # API отвечает, ошибка в самом запросе
+                    await asyncio.to_thread(self.circuit_breaker.record_success)
+                if attempt == self.MAX_RETRIES or e.HTTP_CODE not in self.RETRYABLE_STATUS_CODES:
+                    raise RuntimeError(
+                        f"Ошибка при запросе к ЮKассе: {str(e)} (статус: {getattr(e, 'HTTP_CODE', 'неизвестно')})"
+                    )
+                delay = self.BASE_DELAY * (2**attempt) + (time.time() % 1.0)
+                await asyncio.sleep(delay)
+            except Exception as e:
+                await asyncio.to_thread(self.circuit_breaker.record_failure)
+                if attempt == self.MAX_RETRIES:
+                    raise RuntimeError(f"Ошибка при запросе к ЮKассе: {str(e)}")
+                await asyncio.sleep(self.BASE_DELAY)
+            else:
+                await asyncio.to_thread(self.circuit_breaker.record_success)
+                return data
+        raise RuntimeError("Достигнут лимит ретраев")
+
+    async def create_payment(self, request: YookassaPaymentRequest, idempotency_key: str) -> PaymentResponse:
+        """
+        Создать одностадийный платеж в Юкассе.
+        Если передан payment_method_id, используется сохраненный платежный метод для автоплатежа.
+        """
+        params = YookassaClient.build_payment_params(request, capture=True)
+        data = await self._retry_request(
+            YookassaRateLimiter.CREATE, "POST", "/payments", json=params, idempotency_key=idempotency_key
+        )
+        return PaymentResponse(data)
+
+    async def create_payment_two_stage(
+        self, request: YookassaPaymentRequest, idempotency_key: str
+    ) -> PaymentResponse:
+        """
+        Создать двухстадийный платеж в Юкассе.
+        Платеж сначала авторизуется, затем нужно вызвать capture_payment для списания.
+        """
+        params = YookassaClient.build_payment_params(request, capture=False)
+        data = await self._retry_request(
+            YookassaRateLimiter.CREATE, "POST", "/payments", json=params, idempotency_key=idempotency_key
+        )
+        return PaymentResponse(data)
+
+    async def capture_payment(self, payment_id: str, idempotency_key: Optional[str] = None) -> PaymentResponse:
+        """
+        Провести (capture) двухстадийный платеж.
+
+        Args:
+            payment_id: ID платежа в Юкассе
+            idempotency_key: Ключ идемпотентности (опционально, генерируется автоматически если не указан)
+
+        Returns:
+            PaymentResponse: Обновленная информация о платеже
+        """
+        data = await self._retry_request(
+            YookassaRateLimiter.CREATE,
+            "POST",
+            f"/payments/{payment_id}/capture",
+            json={},
+            idempotency_key=idempotency_key or str(uuid.uuid4()),
+        )
+        return PaymentResponse(data)
+
+    async def cancel_payment(self, payment_id: str, idempotency_key: Optional[str] = None) -> PaymentResponse:
+        """
+        Отменить платеж.
+
+        Args:
+            payment_id: ID платежа в Юкассе
+            idempotency_key: Ключ идемпотентности (опционально, генерируется автоматически если не указан)
+
+        Returns:
+            PaymentResponse: Обновленная информация о платеже
+        """
+        data = await self._retry_request(
+            YookassaRateLimiter.CREATE,
+            "POST",
+            f"/payments/{payment_id}/cancel",
+            json={},
+            idempotency_key=idempotency_key or str(uuid.uuid4()),
+        )
+        return PaymentResponse(data)
+
+    async def get_payment(self, payment_id: str) -> PaymentResponse:
+        """
+        Получить информацию о платеже из API (финальный статус сохраняется в кэш платежей).
+
+        Args:
+            payment_id: ID платежа в Юкассе
+
+        Returns:
+            PaymentResponse: Информация о платеже
+        """
+        data = await self._retry_request(YookassaRateLimiter.FIND, "GET", f"/payments/{payment_id}")
+        await asyncio.to_thread(redis_client.cache_payment, data)
+        return PaymentResponse(data)
+
+    async def get_payment_cached(self, payment_id: str) -> PaymentResponse:
+        """
+        Получить информацию о платеже, сначала из кэша финальных статусов (заполняется ответами API
+        и webhook-ами с адресов Юкассы). Запрос к API выполняется только при промахе кэша.
+
+        Args:
+            payment_id: ID платежа в Юкассе
+
+        Returns:
+            PaymentResponse: Информация о платеже
+        """
+        data = await asyncio.to_thread(redis_client.get_cached_payment, payment_id)
+        if data is None:
+            data = await self._retry_request(YookassaRateLimiter.FIND, "GET", f"/payments/{payment_id}")
+            await asyncio.to_thread(redis_client.cache_payment, data)
+        return PaymentResponse(data)
+
+    async def create_refund(
+        self, payment_id: str, amount: Optional[float] = None, idempotency_key: Optional[str] = None
+    ) -> RefundResponse:
+        """
+        Создать возврат платежа в Юкассе.
+
+        Args:
+            payment_id: ID платежа в Юкассе
+            amount: Сумма возврата (если None - полный возврат)
+            idempotency_key: Ключ идемпотентности (опционально, генерируется автоматически если не указан)
+
+        Returns:
+            RefundResponse: Информация о возврате
+        """
+        params = YookassaClient.build_refund_params(payment_id, amount)
+        data = await self._retry_request(
+            YookassaRateLimiter.REFUND,
+            "POST",
+            "/refunds",
+            json=params,
+            idempotency_key=idempotency_key or str(uuid.uuid4()),
+        )
+        return RefundResponse(data)
+
+
+async_yookassa_client = AsyncYookassaClient()
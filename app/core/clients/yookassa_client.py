@@ -1,48 +1,249 @@
-import time
+import os
 import uuid
-from typing import Optional
+from collections.abc import Iterator
+from datetime import datetime
+from typing import Any, Optional
 
-from yookassa import Payment, Refund
-from yookassa.domain.exceptions import ApiError
+import httpx
+from yookassa.domain.exceptions import (
+    ApiError,
+    BadRequestError,
+    ForbiddenError,
+    GoneError,
+    InternalServerError,
+    NotFoundError,
+    ResponseProcessingError,
+    TooManyRequestsError,
+    UnauthorizedError,
+)
 from yookassa.domain.response import PaymentResponse, RefundResponse
 
+from app.core.config import settings
+from app.core.exceptions import YookassaTemporaryError
+from app.core.logger import logger
+from app.core.redis_client import redis_client
+from app.core.yookassa_circuit_breaker import yookassa_circuit_breaker
+from app.core.yookassa_rate_limiter import YookassaRateLimiter, retry_after_seconds, yookassa_rate_limiter
 from app.schemas.yookassa import YookassaPaymentRequest
 
+# Исключения SDK по HTTP-коду ответа (как в yookassa.client.ApiClient)
+API_ERRORS: dict[int, type[ApiError]] = {
+    error.HTTP_CODE: error
+    for error in (
+        BadRequestError,
+        ForbiddenError,
+        NotFoundError,
+        TooManyRequestsError,
+        UnauthorizedError,
+        ResponseProcessingError,
+        InternalServerError,
+        GoneError,
+    )
+}
+
+# События трассировки httpcore, означающие открытие нового соединения (иначе соединение взято из пула)
+NEW_CONNECTION_EVENTS = {"connection.connect_tcp.started", "connection.connect_unix_socket.started"}
+
+
+def raise_for_api_error(response: httpx.Response) -> None:
+    """
+    Выбросить исключение SDK, если Юкасса ответила кодом, отличным от 200.
+
+    Raises:
+        ApiError: Подкласс по HTTP-коду ответа
+    """
+    if response.status_code == 200:
+        return
+    try:
+        content = response.json()
+    except ValueError:
+        content = {"type": "error", "description": response.text}
+    error = API_ERRORS.get(response.status_code, ApiError)(content)
+    # У ApiError нет своего кода (HTTP_CODE = 0) - сохраняем фактический (502, 503, 504 ...)
+    error.HTTP_CODE = response.status_code
+    raise error
+
+
+def http_client_options() -> dict[str, Any]:
+    """Общие параметры HTTP-клиентов Юкассы: адрес API, авторизация, таймауты и пул соединений"""
+    return {
+        "base_url": settings.YOOKASSA_API_URL,
+        "auth": (str(settings.YOOKASSA_SHOP_ID), settings.YOOKASSA_SECRET_KEY),
+        "timeout": httpx.Timeout(settings.YOOKASSA_HTTP_READ_TIMEOUT, connect=settings.YOOKASSA_HTTP_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=settings.YOOKASSA_HTTP_POOL_SIZE,
+            max_keepalive_connections=settings.YOOKASSA_HTTP_POOL_SIZE,
+            keepalive_expiry=settings.YOOKASSA_HTTP_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+class HttpPoolStats:
+    """
+    Счетчики переиспользования соединений HTTP-клиента Юкассы в текущем процессе.
+
+    Прирост счетчиков периодически (и при закрытии клиента) сбрасывается в Redis,
+    где суммируется по всем процессам: redis_client.get_http_pool_stats(name).
+    """
+
+    FLUSH_EVERY = 100  # Сбрасывать в Redis каждые N запросов
+
+    def __init__(self, name: str):
+        self.name = name
+        self.requests = 0
+        self.new_connections = 0
+        self._unflushed = {"requests": 0, "new_connections": 0, "reused_connections": 0}
+
+    def record(self, new_connection: bool) -> None:
+        """Учесть выполненный запрос"""
+        self.requests += 1
+        self._unflushed["requests"] += 1
+        if new_connection:
+            self.new_connections += 1
+            self._unflushed["new_connections"] += 1
+        else:
+            self._unflushed["reused_connections"] += 1
+
+        if self._unflushed["requests"] >= self.FLUSH_EVERY:
+            self.flush()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Счетчики текущего процесса"""
+        reused = self.requests - self.new_connections
+        return {
+            "pid": os.getpid(),
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+        }
+
+    def flush(self) -> None:
+        """Сбросить прирост счетчиков в Redis"""
+        if not self._unflushed["requests"]:
+            return
+        counts, self._unflushed = self._unflushed, {field: 0 for field in self._unflushed}
+        redis_client.record_http_pool_stats(self.name, counts)
+
 
 class YookassaClient:
     """
     Клиент для работы с API Юкассы.
     Поддерживает одностадийные и двухстадийные платежи.
+
+    Запросы выполняются через собственный httpx.Client процесса с пулом keep-alive соединений,
+    поэтому повторные запросы не открывают новое TLS-соединение. Клиент создается в
+    worker_process_init (open) и закрывается в worker_process_shutdown (close);
+    при вызове без open создается лениво.
     """
 
     MAX_RETRIES = 5
     BASE_DELAY = 1.0
-    RETRYABLE_STATUS_CODES = {429, 500}
-
-    def _retry_request(self, func, *args, **kwargs):
-        """Общая логика повторных попыток для запросов к Юкассе"""
-        for attempt in range(self.MAX_RETRIES + 1):
-            try:
-                return func(*args, **kwargs)
-            except ApiError as e:
-                if attempt == self.MAX_RETRIES or e.HTTP_CODE not in self.RETRYABLE_STATUS_CODES:
-                    raise RuntimeError(
-                        f"Ошибка при запросе к ЮKассе: {str(e)} (статус: {getattr(e, 'HTTP_CODE', 'неизвестно')})"
-                    )
-                delay = self.BASE_DELAY * (2**attempt) + (time.time() % 1.0)
-                time.sleep(delay)
-            except Exception as e:
-                if attempt == self.MAX_RETRIES:
-                    raise RuntimeError(f"Ошибка при запросе к ЮKассе: {str(e)}")
-                time.sleep(self.BASE_DELAY)
-        raise RuntimeError("Достигнут лимит ретраев")
+    # 202 - запрос еще обрабатывается Юкассой (SDK повторял такие запросы автоматически)
+    RETRYABLE_STATUS_CODES = {ResponseProcessingError.HTTP_CODE, 429, 500}
+    # Максимальный размер страницы списка платежей в API
+    LIST_PAGE_SIZE = 100
 
-    def create_payment(self, request: YookassaPaymentRequest, idempotency_key: str) -> PaymentResponse:
+    def __init__(self):
+        self._session: Optional[httpx.Client] = None
+        self._session_pid: Optional[int] = None
+        self.stats = HttpPoolStats("sync")
+        self.rate_limiter = yookassa_rate_limiter
+        self.circuit_breaker = yookassa_circuit_breaker
+
+    def open(self) -> httpx.Client:
         """
-        Создать одностадийный платеж в Юкассе (старый метод).
-        Платеж сразу списывается после подтверждения.
+        Получить HTTP-клиент процесса (создать при необходимости).
 
-        Если передан payment_method_id, используется сохраненный платежный метод для автоплатежа.
+        Соединения, унаследованные от родительского процесса после fork, не используются:
+        клиент пересоздается, если PID изменился.
+        """
+        pid = os.getpid()
+        if self._session is None or self._session.is_closed or self._session_pid != pid:
+            self._session = httpx.Client(**http_client_options())
+            self._session_pid = pid
+            self.stats = HttpPoolStats("sync")
+        return self._session
+
+    def close(self) -> None:
+        """Закрыть HTTP-клиент процесса и сбросить счетчики соединений"""
+        session, self._session = self._session, None
+        if session is None or self._session_pid != os.getpid():
+            return
+        try:
+            self.stats.flush()
+            logger.info(f"YooKassa HTTP pool stats: {self.stats.snapshot()}")
+            session.close()
+        except Exception as e:
+            logger.warning(f"Error closing YooKassa HTTP client: {e}")
+
+    def _send(
+        self,
+        method: str,
+        path: str,
+        json: Optional[dict] = None,
+        idempotency_key: Optional[str] = None,
+        params: Optional[dict] = None,
+    ) -> dict[str, Any]:
+        """Выполнить один запрос к API Юкассы и учесть, было ли открыто новое соединение"""
+        opened = []
+
+        def trace(event_name: str, info: dict) -> None:
+            if event_name in NEW_CONNECTION_EVENTS:
+                opened.append(event_name)
+
+        headers = {"Idempotence-Key": idempotency_key} if idempotency_key else None
+        response = self.open().request(
+            method, path, json=json, params=params, headers=headers, extensions={"trace": trace}
+        )
+        self.stats.record(new_connection=bool(opened))
+        if response.status_code == TooManyRequestsError.HTTP_CODE:
+            self.rate_limiter.block_for(retry_after_seconds(response.headers.get("Retry-After")) or 0.0)
+        raise_for_api_error(response)
+        return response.json()
+
+    def _retry_request(self, operation: str, method: str, path: str, **kwargs) -> dict[str, Any]:
+        """
+        Общая логика запроса к Юкассе для Celery задач.
+        Перед запросом проверяется circuit breaker и берется токен общего лимита запросов
+        операции (create/find/refund); короткое ожидание токена выполняется в воркере. Повторов в воркере
+        нет: временная ошибка (5xx, 429, 202, сеть) сразу завершает запрос исключением YookassaTemporaryError,
+        и задача повторяется через self.retry(countdown=...) - так же, как при разомкнутой цепи
+        (YookassaCircuitOpen) или долгом ожидании лимита (YookassaRateLimitExceeded).
+        Повтор с тем же idempotency_key безопасен.
+        """
+        self.circuit_breaker.before_call()
+        self.rate_limiter.acquire(operation)
+        try:
+            data = self._send(method, path, **kwargs)
+        except ApiError as e:
+            if e.HTTP_CODE >= 500:
+                self.circuit_breaker.record_failure()
+            elif e.HTTP_CODE not in self.RETRYABLE_STATUS_CODES:
+                # API отвечает, ошибка в самом запросе
+                self.circuit_breaker.record_success()
+            if e.HTTP_CODE in self.RETRYABLE_STATUS_CODES:
+                raise YookassaTemporaryError(f"{str(e)} (статус: {e.HTTP_CODE})", retry_after=self.BASE_DELAY)
+            raise RuntimeError(
+                f"Ошибка при запросе к ЮKассе: {str(e)} (статус: {getattr(e, 'HTTP_CODE', 'неизвестно')})"
+            )
+        except Exception as e:
+            self.circuit_breaker.record_failure()
+            raise YookassaTemporaryError(str(e), retry_after=self.BASE_DELAY)
+        self.circuit_breaker.record_success()
+        return data
+
+    @staticmethod
+    def build_payment_params(request: YookassaPaymentRequest, capture: bool) -> dict:
+        """
+        Собрать тело запроса на создание платежа.
+
+        Args:
+            request: Данные платежа
+            capture: True - одностадийный платеж, False - двухстадийный
+
+        Returns:
+            Dict с параметрами запроса POST /payments
         """
         params = {
             "amount": {
@@ -53,35 +254,58 @@ class YookassaClient:
                 "type": request.type,
                 "return_url": request.return_url,
             },
-            "capture": True,  # Одностадийный платеж
+            "capture": capture,
             "description": request.description,
         }
 
-        # Если передан сохраненный платежный метод - используем его для автоплатежа
-        if request.payment_method_id:
+        # Если передан сохраненный платежный метод - используем его для автоплатежа (только одностадийный платеж)
+        if capture and request.payment_method_id:
             params["payment_method_id"] = request.payment_method_id
 
-        return self._retry_request(Payment.create, params=params, idempotency_key=idempotency_key)
+        return params
+
+    @staticmethod
+    def build_refund_params(payment_id: str, amount: Optional[float] = None) -> dict:
+        """
+        Собрать тело запроса на создание возврата.
+
+        Args:
+            payment_id: ID платежа в Юкассе
+            amount: Сумма возврата (если None - полный возврат)
+
+        Returns:
+            Dict с параметрами запроса POST /refunds
+        """
+        params = {"payment_id": payment_id}
+
+        if amount is not None:
+            params["amount"] = {"value": amount, "currency": "RUB"}
+
+        return params
+
+    def create_payment(self, request: YookassaPaymentRequest, idempotency_key: str) -> PaymentResponse:
+        """
+        Создать одностадийный платеж в Юкассе (старый метод).
+        Платеж сразу списывается после подтверждения.
+
+        Если передан payment_method_id, используется сохраненный платежный метод для автоплатежа.
+        """
+        params = self.build_payment_params(request, capture=True)
+        data = self._retry_request(
+            YookassaRateLimiter.CREATE, "POST", "/payments", json=params, idempotency_key=idempotency_key
+        )
+        return PaymentResponse(data)
 
     def create_payment_two_stage(self, request: YookassaPaymentRequest, idempotency_key: str) -> PaymentResponse:
         """
         Создать двухстадийный платеж в Юкассе (новый метод).
         Платеж сначала авторизуется, затем нужно вызвать capture_payment для списания.
         """
-        params = {
-            "amount": {
-                "value": request.amount_value,
-                "currency": request.currency,
-            },
-            "confirmation": {
-                "type": request.type,
-                "return_url": request.return_url,
-            },
-            "capture": False,  # Двухстадийный платеж
-            "description": request.description,
-        }
-
-        return self._retry_request(Payment.create, params=params, idempotency_key=idempotency_key)
+        params = self.build_payment_params(request, capture=False)
+        data = self._retry_request(
+            YookassaRateLimiter.CREATE, "POST", "/payments", json=params, idempotency_key=idempotency_key
+        )
+        return PaymentResponse(data)
 
     def capture_payment(self, payment_id: str, idempotency_key: Optional[str] = None) -> PaymentResponse:
         """
@@ -90,12 +314,19 @@ class YookassaClient:
 
         Args:
             payment_id: ID платежа в Юкассе
-            idempotency_key: Ключ идемпотентности (опционально)
+            idempotency_key: Ключ идемпотентности (опционально, генерируется автоматически если не указан)
 
         Returns:
             PaymentResponse: Обновленная информация о платеже
         """
-        return self._retry_request(Payment.capture, payment_id=payment_id, idempotency_key=idempotency_key)
+        data = self._retry_request(
+            YookassaRateLimiter.CREATE,
+            "POST",
+            f"/payments/{payment_id}/capture",
+            json={},
+            idempotency_key=idempotency_key or str(uuid.uuid4()),
+        )
+        return PaymentResponse(data)
 
     def cancel_payment(self, payment_id: str, idempotency_key: Optional[str] = None) -> PaymentResponse:
         """
@@ -104,16 +335,38 @@ class YookassaClient:
 
         Args:
             payment_id: ID платежа в Юкассе
-            idempotency_key: Ключ идемпотентности (опционально)
+            idempotency_key: Ключ идемпотентности (опционально, генерируется автоматически если не указан)
 
         Returns:
             PaymentResponse: Обновленная информация о платеже
         """
-        return self._retry_request(Payment.cancel, payment_id=payment_id, idempotency_key=idempotency_key)
+        data = self._retry_request(
+            YookassaRateLimiter.CREATE,
+            "POST",
+            f"/payments/{payment_id}/cancel",
+            json={},
+            idempotency_key=idempotency_key or str(uuid.uuid4()),
+        )
+        return PaymentResponse(data)
 
     def get_payment(self, payment_id: str) -> PaymentResponse:
         """
-        Получить информацию о платеже.
+        Получить информацию о платеже из API (финальный статус сохраняется в кэш платежей).
+
+        Args:
+            payment_id: ID платежа в Юкассе
+
+        Returns:
+            PaymentResponse: Информация о платеже
+        """
+        data = self._retry_request(YookassaRateLimiter.FIND, "GET", f"/payments/{payment_id}")
+        redis_client.cache_payment(data)
+        return PaymentResponse(data)
+
+    def get_payment_cached(self, payment_id: str) -> PaymentResponse:
+        """
+        Получить информацию о платеже, сначала из кэша финальных статусов (заполняется ответами API
+        и webhook-ами с адресов Юкассы). Запрос к API выполняется только при промахе кэша.
 
         Args:
             payment_id: ID платежа в Юкассе
@@ -121,7 +374,40 @@ class YookassaClient:
         Returns:
             PaymentResponse: Информация о платеже
         """
-        return self._retry_request(Payment.find_one, payment_id)
+        data = redis_client.get_cached_payment(payment_id)
+        if data is None:
+            data = self._retry_request(YookassaRateLimiter.FIND, "GET", f"/payments/{payment_id}")
+            redis_client.cache_payment(data)
+        return PaymentResponse(data)
+
+    def iter_payments(
+        self, created_from: datetime, created_to: datetime, page_size: Optional[int] = None
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Получить все платежи, созданные в интервале [created_from, created_to), постранично по курсору.
+        Один запрос к API возвращает до page_size платежей.
+
+        Args:
+            created_from: Начало интервала (created_at.gte)
+            created_to: Конец интервала (created_at.lt)
+            page_size: Платежей на страницу (по умолчанию LIST_PAGE_SIZE - максимум API)
+
+        Yields:
+            Объект платежа в формате API Юкассы (платежи в финальном статусе сохраняются в кэш платежей)
+        """
+        params = {
+            "created_at.gte": created_from.isoformat(),
+            "created_at.lt": created_to.isoformat(),
+            "limit": page_size or self.LIST_PAGE_SIZE,
+        }
+        while True:
+            page = self._retry_request(YookassaRateLimiter.FIND, "GET", "/payments", params=params)
+            for item in page.get("items", []):
+                redis_client.cache_payment(item)
+                yield item
+            if not page.get("next_cursor"):
+                return
+            params["cursor"] = page["next_cursor"]
 
     def create_refund(
         self, payment_id: str, amount: Optional[float] = None, idempotency_key: Optional[str] = None
@@ -137,15 +423,15 @@ class YookassaClient:
         Returns:
             RefundResponse: Информация о возврате
         """
-        params = {"payment_id": payment_id}
-
-        if amount is not None:
-            params["amount"] = {"value": amount, "currency": "RUB"}
+        params = self.build_refund_params(payment_id, amount)
 
         if idempotency_key is None:
             idempotency_key = str(uuid.uuid4())
 
-        return self._retry_request(Refund.create, params=params, idempotency_key=idempotency_key)
+        data = self._retry_request(
+            YookassaRateLimiter.REFUND, "POST", "/refunds", json=params, idempotency_key=idempotency_key
+        )
+        return RefundResponse(data)
 
 
 yookassa_client = YookassaClient()
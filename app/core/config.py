@@ -26,6 +26,15 @@ class Settings(BaseSettings):
     # Telegram
     TELEGRAM_BOT_TOKEN: str = ""
     BOT_TOKEN: str
+    TELEGRAM_API_URL: str = "https://api.telegram.org"
+    TELEGRAM_RATE_LIMIT_PER_SECOND: float = 30.0  # Общий лимит бота (все процессы), сообщений в секунду
+    TELEGRAM_RATE_LIMIT_PER_CHAT: float = 1.0  # Сообщений в секунду в один чат
+    TELEGRAM_SENDER_CONCURRENCY: int = 30  # Одновременных запросов sendMessage (и соединений) на процесс
+    TELEGRAM_MAX_WAIT_SECONDS: float = 5.0  # Sync отправка: максимум ожидания лимита/retry_after
+    TELEGRAM_SUPPRESSION_RECHECK_DAYS: int = 30  # Через сколько снова пробовать чат, где бот был заблокирован
+    TELEGRAM_ID_CACHE_SIZE: int = 10000  # Сколько user_id -> telegram_id хранить в памяти процесса (LRU)
+    TELEGRAM_ID_CACHE_LOCAL_TTL_SECONDS: float = 60.0  # Сколько запись живет в памяти процесса (смена telegram_id)
+    TELEGRAM_ID_CACHE_TTL_SECONDS: int = 86400  # TTL user_id -> telegram_id в Redis
     # Redis
     REDIS_URL: str = "redis://redis:6379/0"
 
@@ -36,6 +45,14 @@ class Settings(BaseSettings):
     # Notifications
     NOTIFICATION_RETRY_ATTEMPTS: int = 3
     NOTIFICATION_RETRY_DELAY: int = 60
+    NOTIFICATION_OUTBOX_BATCH_SIZE: int = 500  # Сколько уведомлений из outbox захватывать и отправлять за раз
+    NOTIFICATION_OUTBOX_MAX_BATCHES_PER_RUN: int = 20  # Максимум пачек за один запуск задачи отправки
+    NOTIFICATION_OUTBOX_LEASE_SECONDS: int = 300  # Аренда захваченных уведомлений (защита от потери при падении)
+    NOTIFICATION_OUTBOX_RETRY_DELAY_SECONDS: int = 300  # Через сколько повторять неудачную отправку
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS: int = 5  # Максимум попыток отправки, затем запись переводится в failed
+    NOTIFICATION_OUTBOX_DISPATCH_DELAY_SECONDS: float = 1.0  # Коммиты за это время отправляются одной задачей
+    NOTIFICATION_COALESCE_WINDOW_SECONDS: float = 60.0  # Уведомления пользователя за это время - одним сообщением
+    NOTIFICATION_OUTBOX_SWEEP_INTERVAL_SECONDS: float = 60.0  # Периодическая отправка (если задача не поставилась)
 
     # Payment retry
     PAYMENT_RETRY_ATTEMPTS: int = 3
@@ -52,6 +69,17 @@ class Settings(BaseSettings):
     AUTO_PAYMENT_MAX_ATTEMPTS: int = 3  # Максимум попыток автосписания
     AUTO_PAYMENT_RETRY_INTERVAL_SECONDS: int = 60  # Интервал между попытками (в секундах)
     AUTO_PAYMENT_REDIS_TTL_HOURS: int = 24  # TTL для ключей Redis (часы)
+    AUTO_PAYMENT_CHUNKED_MODE: bool = True  # Обрабатывать подписки пачками (одна задача на пачку)
+    AUTO_PAYMENT_CHUNK_SIZE: int = 200  # Количество подписок в одной задаче
+    AUTO_PAYMENT_CHUNK_CONCURRENCY: int = 4  # Сколько пачек обрабатывается одновременно
+    AUTO_PAYMENT_TARGET_RATE: float = 0.0  # Целевая скорость списаний (в секунду), 0 - без распределения по окну
+    AUTO_PAYMENT_PACING_TICK_SECONDS: float = 10.0  # Как часто запускать подписки из очереди темпа списаний
+    AUTO_PAYMENT_CLAIM_MODE: bool = False  # Воркеры сами захватывают подписки (FOR UPDATE SKIP LOCKED), без Redis
+    AUTO_PAYMENT_RETRY_SWEEP_BATCH_SIZE: int = 200  # Сколько платежей с наступившим next_retry_at захватывать за раз
+    AUTO_PAYMENT_RETRY_LEASE_SECONDS: int = 600  # На сколько откладывается захваченная попытка (защита от потери)
+    PAYMENT_RECONCILIATION_INTERVAL_SECONDS: float = 3600.0  # Как часто сверять незавершенные платежи с Юкассой
+    PAYMENT_RECONCILIATION_WINDOW_HOURS: int = 24  # За сколько часов сверяются платежи
+    PAYMENT_RECONCILIATION_MIN_AGE_MINUTES: int = 15  # Более новые платежи не сверяются (ожидается webhook)
 
     # Trial Period Configuration
     TRIAL_PERIOD_DAYS: int = 7  # Количество дней промопериода для новых пользователей
@@ -61,6 +89,43 @@ class Settings(BaseSettings):
     YOOKASSA_SHOP_ID: str
     YOOKASSA_SECRET_KEY: str
     YOOKASSA_CALLBACK_RETURN_URL: str
+    YOOKASSA_API_URL: str = "https://api.yookassa.ru/v3"
+    YOOKASSA_HTTP_POOL_SIZE: int = 20  # Максимум соединений к API Юкассы на процесс
+    YOOKASSA_WEBHOOK_STREAM_ENABLED: bool = True  # Webhook ставится в Redis Stream и обрабатывается пачками в Celery
+    YOOKASSA_WEBHOOK_DEAD_LETTER_MAXLEN: int = 100000  # Максимальная длина потока недоставленных webhook-ов
+    YOOKASSA_WEBHOOK_BATCH_SIZE: int = 50  # Сколько webhook-ов обрабатывать в одной транзакции
+    YOOKASSA_WEBHOOK_CONSUMER_INTERVAL_SECONDS: float = 1.0  # Как часто запускать обработку потока webhook-ов
+    YOOKASSA_WEBHOOK_CONSUMER_MAX_BATCHES: int = 20  # Максимум пачек за один запуск обработки
+    YOOKASSA_WEBHOOK_CLAIM_IDLE_SECONDS: float = 60.0  # Через сколько неподтвержденный webhook забирается повторно
+    YOOKASSA_WEBHOOK_MAX_DELIVERIES: int = 5  # Попыток обработки webhook-а, затем - в dead letter поток
+    YOOKASSA_WEBHOOK_DEDUP_TTL_SECONDS: int = 172800  # Сколько помнить обработанный webhook (повторы Юкассы - до суток)
+    YOOKASSA_WEBHOOK_DEDUP_PROCESSING_TTL_SECONDS: int = 30  # Захват на время обработки, продлевается (< CLAIM_IDLE)
+    YOOKASSA_HTTP_CONNECT_TIMEOUT: float = 5.0  # Таймаут установки соединения (секунды)
+    YOOKASSA_HTTP_READ_TIMEOUT: float = 30.0  # Таймаут ответа API (секунды)
+    YOOKASSA_HTTP_KEEPALIVE_EXPIRY: float = 60.0  # Сколько держать простаивающее keep-alive соединение (секунды)
+    YOOKASSA_RATE_LIMIT_ENABLED: bool = True  # Общий (через Redis) лимит запросов к API Юкассы для всех процессов
+    YOOKASSA_RATE_LIMIT_TOTAL_RPS: float = 20.0  # Лимит магазина: всего запросов в секунду, 0 - без общего лимита
+    YOOKASSA_RATE_LIMIT_CREATE_RPS: float = 10.0  # Создание/подтверждение/отмена платежей в секунду
+    YOOKASSA_RATE_LIMIT_FIND_RPS: float = 10.0  # Запросы информации о платеже в секунду
+    YOOKASSA_RATE_LIMIT_REFUND_RPS: float = 5.0  # Создание возвратов в секунду
+    YOOKASSA_RATE_LIMIT_BURST_SECONDS: float = 1.0  # Емкость бакета: сколько секунд лимита можно израсходовать разом
+    YOOKASSA_RATE_LIMIT_MAX_WAIT_SECONDS: float = 30.0  # Async клиент: максимум ожидания токена перед ошибкой
+    YOOKASSA_RATE_LIMIT_SYNC_MAX_WAIT_SECONDS: float = 2.0  # Sync клиент: дольше не ждет, а откладывает задачу
+    YOOKASSA_CIRCUIT_FAILURE_THRESHOLD: int = 10  # Ошибок (5xx/сеть) за окно, после которых цепь размыкается
+    YOOKASSA_CIRCUIT_FAILURE_WINDOW_SECONDS: float = 60.0  # Окно подсчета ошибок (секунды)
+    YOOKASSA_CIRCUIT_OPEN_SECONDS: float = 30.0  # Сколько цепь разомкнута до пробного запроса (half-open)
+    YOOKASSA_CIRCUIT_MAX_DEFERRALS: int = 120  # Сколько раз Celery задача откладывает себя, пока API недоступно
+    YOOKASSA_PAYMENT_CACHE_TTL_SECONDS: int = 3600  # Сколько хранить платеж в финальном статусе из webhook
+    # Адреса, с которых Юкасса отправляет webhook-и: только их тело заполняет кэш платежей
+    YOOKASSA_WEBHOOK_TRUSTED_NETWORKS: list[str] = [
+        "185.71.76.0/27",
+        "185.71.77.0/27",
+        "77.75.153.0/25",
+        "77.75.156.11/32",
+        "77.75.156.35/32",
+        "77.75.154.128/25",
+        "2a02:5180::/32",
+    ]
 
     # Admin panel credentials (опционально, по умолчанию admin/admin)
     ADMIN_USERNAME: str = "admin"
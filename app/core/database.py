@@ -236,11 +236,11 @@ async def get_uow():
     FastAPI dependency для получения UnitOfWork.
     Правильный способ работы с БД через UoW паттерн.
     """
-    from app.core.clients.yookassa_client import yookassa_client
+    from app.core.clients.async_yookassa_client import async_yookassa_client
     from app.database.unit_of_work import UnitOfWork
 
     session = await db_manager.get_session()
-    uow = UnitOfWork(session, yookassa_client)
+    uow = UnitOfWork(session, async_yookassa_client)
     try:
         yield uow
     finally:
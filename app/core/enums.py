@@ -32,3 +32,10 @@ class PaymentStatus(str, enum.Enum):
     succeeded = "succeeded"
     cancelled = "cancelled"
     failed = "failed"
+
+
+class NotificationOutboxStatus(str, enum.Enum):
+    """Статусы записей outbox уведомлений (отправленные записи удаляются)"""
+
+    pending = "pending"
+    failed = "failed"  # Попытки отправки исчерпаны
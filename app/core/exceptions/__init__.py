@@ -33,6 +33,16 @@ class RefundNotFound(ApplicationException):
     message_template = "Refund not found: {identifier}"
 
 
+class NotificationOutboxEntryNotFound(ApplicationException):
+    entity_name = "NotificationOutboxEntry"
+    message_template = "Notification outbox entry not found: {identifier}"
+
+
+class ProcessedWebhookEventNotFound(ApplicationException):
+    entity_name = "ProcessedWebhookEvent"
+    message_template = "Processed webhook event not found: {identifier}"
+
+
 class SubscriptionPlanNotFound(ApplicationException):
     entity_name = "SubscriptionPlan"
     message_template = "SubscriptionPlan not found: {identifier}"
@@ -67,3 +77,38 @@ class TrialPeriodNotAvailable(ApplicationException):
     def __init__(self, reason: str):
         self.reason = reason
         super().__init__(f"Trial period not available: {reason}")
+
+
+class YookassaUnavailable(ApplicationException):
+    """API Юкассы временно недоступно для запросов - повторить позже, не расходуя попытку"""
+
+    message_template = "{identifier}"
+
+    def __init__(self, message: str, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(message)
+
+
+class YookassaRateLimitExceeded(YookassaUnavailable):
+    """Лимит запросов к API Юкассы исчерпан, ожидание токена превысило допустимое"""
+
+    def __init__(self, operation: str, wait_seconds: float):
+        self.operation = operation
+        self.wait_seconds = wait_seconds
+        super().__init__(
+            f"YooKassa rate limit exceeded for '{operation}', retry in {wait_seconds:.2f}s", retry_after=wait_seconds
+        )
+
+
+class YookassaTemporaryError(YookassaUnavailable):
+    """Временная ошибка API Юкассы (5xx, 429, 202, сеть) - запрос повторяется отложенной задачей, а не в воркере"""
+
+    def __init__(self, error: str, retry_after: float):
+        super().__init__(f"YooKassa request failed temporarily: {error}", retry_after=retry_after)
+
+
+class YookassaCircuitOpen(YookassaUnavailable):
+    """Цепь к API Юкассы разомкнута после серии ошибок - запросы отклоняются без обращения к API"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"YooKassa circuit is open, retry in {retry_after:.2f}s", retry_after=retry_after)
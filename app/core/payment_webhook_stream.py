@@ -0,0 +1,169 @@
+"""
+Очередь webhook-ов Юкассы в Redis Stream.
+
+Endpoint webhook-а только добавляет событие в поток (XADD) и сразу отвечает 200, обработку
+выполняет Celery задача consume_payment_webhooks через группу потребителей (XREADGROUP) пачками.
+Сообщения упавших потребителей и неудачно обработанные сообщения забираются повторно через XAUTOCLAIM
+после YOOKASSA_WEBHOOK_CLAIM_IDLE_SECONDS, после YOOKASSA_WEBHOOK_MAX_DELIVERIES попыток сообщение
+переносится в поток недоставленных (dead letter) для ручного разбора.
+Основной поток не обрезается по длине: обработанные сообщения удаляются при подтверждении,
+а в потоке остаются только необработанные события, на которые Юкассе уже ответили 200.
+"""
+
+import json
+from collections.abc import Sequence
+from typing import Any, Optional
+
+import redis
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.redis_client import redis_client
+
+# Сообщение потока: (ID сообщения, событие webhook-а или None, если payload не разбирается)
+StreamMessage = tuple[str, Optional[dict[str, Any]]]
+
+
+class PaymentWebhookStream:
+    """Redis Stream webhook-ов Юкассы с группой потребителей"""
+
+    STREAM_KEY = "yookassa:webhooks"
+    DEAD_LETTER_KEY = "yookassa:webhooks:dead"
+    GROUP = "payment_webhooks"
+
+    def add(self, webhook_data: dict[str, Any]) -> str:
+        """
+        Добавить событие webhook-а в поток.
+
+        Args:
+            webhook_data: Тело webhook-а Юкассы
+
+        Returns:
+            ID сообщения в потоке
+
+        Raises:
+            redis.RedisError: Redis недоступен (вызывающий код обрабатывает webhook сразу)
+        """
+        # Без MAXLEN: обрезка удаляла бы только необработанные события, которые Юкасса уже не повторит
+        return redis_client.client.xadd(self.STREAM_KEY, {"payload": json.dumps(webhook_data, default=str)})
+
+    def ensure_group(self) -> None:
+        """Создать группу потребителей (и поток), если их еще нет"""
+        try:
+            redis_client.client.xgroup_create(self.STREAM_KEY, self.GROUP, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    @staticmethod
+    def _parse(entries: Sequence[Any]) -> list[StreamMessage]:
+        """Разобрать сообщения потока [(id, {"payload": ...}), ...]"""
+        messages: list[StreamMessage] = []
+        for message_id, fields in entries:
+            try:
+                messages.append((message_id, json.loads(fields["payload"])))
+            except (TypeError, KeyError, ValueError):
+                messages.append((message_id, None))
+        return messages
+
+    def read(self, consumer: str, count: int) -> list[StreamMessage]:
+        """
+        Получить новые сообщения группы (без ожидания).
+
+        Args:
+            consumer: Имя потребителя
+            count: Максимальное количество сообщений
+
+        Returns:
+            Список (ID сообщения, событие) в порядке поступления
+        """
+        response = redis_client.client.xreadgroup(self.GROUP, consumer, {self.STREAM_KEY: ">"}, count=count)
+        if not response:
+            return []
+        return self._parse(response[0][1])
+
+    def claim_stale(self, consumer: str, count: int) -> list[StreamMessage]:
+        """
+        Забрать сообщения, которые другие потребители получили, но не подтвердили
+        за YOOKASSA_WEBHOOK_CLAIM_IDLE_SECONDS (падение воркера или ошибка обработки).
+
+        Args:
+            consumer: Имя потребителя
+            count: Максимальное количество сообщений
+
+        Returns:
+            Список (ID сообщения, событие)
+        """
+        response = redis_client.client.xautoclaim(
+            self.STREAM_KEY,
+            self.GROUP,
+            consumer,
+            min_idle_time=int(settings.YOOKASSA_WEBHOOK_CLAIM_IDLE_SECONDS * 1000),
+            start_id="0-0",
+            count=count,
+        )
+        # Сообщения, удаленные из потока в обход ack, приходят без полей (Redis 7 - отдельным списком)
+        missing = [entry[0] for entry in response[1] if entry and not entry[1]]
+        if len(response) > 2:
+            missing.extend(response[2])
+        if missing:
+            logger.error(f"Payment webhooks lost from stream before processing: {missing}")
+        return self._parse([entry for entry in response[1] if entry and entry[1]])
+
+    def get_delivery_counts(self, message_ids: Sequence[str]) -> dict[str, int]:
+        """Сколько раз сообщения выдавались потребителям"""
+        counts = {}
+        for message_id in message_ids:
+            pending = redis_client.client.xpending_range(
+                self.STREAM_KEY, self.GROUP, min=message_id, max=message_id, count=1
+            )
+            counts[message_id] = pending[0]["times_delivered"] if pending else 0
+        return counts
+
+    def ack(self, message_ids: Sequence[str]) -> None:
+        """Подтвердить обработку сообщений и удалить их из потока"""
+        if not message_ids:
+            return
+        pipe = redis_client.client.pipeline()
+        pipe.xack(self.STREAM_KEY, self.GROUP, *message_ids)
+        pipe.xdel(self.STREAM_KEY, *message_ids)
+        pipe.execute()
+
+    def dead_letter(self, message_id: str, webhook_data: Optional[dict[str, Any]], reason: str) -> None:
+        """
+        Перенести сообщение в поток недоставленных и подтвердить его в основном потоке.
+
+        Args:
+            message_id: ID сообщения
+            webhook_data: Событие (None, если payload не разбирается)
+            reason: Причина (для разбора)
+        """
+        logger.error(f"Payment webhook {message_id} moved to dead letter stream: {reason}")
+        redis_client.client.xadd(
+            self.DEAD_LETTER_KEY,
+            {"message_id": message_id, "payload": json.dumps(webhook_data, default=str), "reason": reason},
+            maxlen=settings.YOOKASSA_WEBHOOK_DEAD_LETTER_MAXLEN,
+            approximate=True,
+        )
+        self.ack([message_id])
+
+    def get_stats(self) -> dict[str, Any]:
+        """
+        Состояние очереди webhook-ов.
+
+        Returns:
+            Dict с длиной потока, количеством выданных, но не подтвержденных сообщений и длиной dead letter потока
+        """
+        pipe = redis_client.client.pipeline()
+        pipe.xlen(self.STREAM_KEY)
+        pipe.xlen(self.DEAD_LETTER_KEY)
+        length, dead_letters = pipe.execute()
+        try:
+            pending = redis_client.client.xpending(self.STREAM_KEY, self.GROUP)["pending"]
+        except redis.ResponseError:
+            # Группа еще не создана (потребитель ни разу не запускался)
+            pending = 0
+        return {"length": length, "pending": pending, "dead_letters": dead_letters}
+
+
+payment_webhook_stream = PaymentWebhookStream()
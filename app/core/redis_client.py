@@ -1,10 +1,16 @@
-from typing import Optional
+import json
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
 
 import redis
 
 from app.core.config import settings
 from app.core.logger import logger
 
+# Финальные статусы платежа Юкассы: после них статус уже не меняется
+FINAL_PAYMENT_STATUSES = ("succeeded", "canceled")
+
 
 class RedisClient:
     """Redis client для автосписаний"""
@@ -34,6 +40,34 @@ class RedisClient:
         """Получить ключ Redis для набора подписок"""
         return f"auto_payment:subscriptions:{date}"
 
+    def _get_done_key(self, date: str) -> str:
+        """Получить ключ Redis для набора обработанных подписок"""
+        return f"auto_payment:done:{date}"
+
+    def _get_run_key(self, date: str) -> str:
+        """Получить ключ Redis для журнала дневного запуска"""
+        return f"auto_payment:run:{date}"
+
+    def _get_chunk_queue_key(self, date: str) -> str:
+        """Получить ключ Redis для очереди пачек подписок"""
+        return f"auto_payment:chunks:{date}"
+
+    def _get_http_pool_key(self, name: str) -> str:
+        """Получить ключ Redis для счетчиков соединений HTTP-клиента Юкассы"""
+        return f"yookassa:http_pool:{name}"
+
+    def _get_payment_cache_key(self, yookassa_payment_id: str) -> str:
+        """Получить ключ Redis для кэша платежа Юкассы"""
+        return f"yookassa:payment:{yookassa_payment_id}"
+
+    def _get_payment_cache_stats_key(self) -> str:
+        """Получить ключ Redis для счетчиков попаданий в кэш платежей Юкассы"""
+        return "yookassa:payment_cache:stats"
+
+    def _get_telegram_id_cache_key(self, user_id: int) -> str:
+        """Получить ключ Redis для кэша telegram_id пользователя"""
+        return f"user:telegram_id:{user_id}"
+
     def add_subscriptions_for_date(self, subscription_ids: list[int], date: str) -> bool:
         """
         Добавить ID подписок для даты
@@ -130,5 +164,329 @@ class RedisClient:
             logger.error(f"Error clearing subscriptions from Redis: {e}", exc_info=True)
             return False
 
+    # Счетчики журнала дневного запуска
+    RUN_COUNTERS = ("collected", "charged", "skipped", "failed", "notified")
+
+    def start_run(self, date: str, pending: Optional[int] = None) -> None:
+        """
+        Отметить начало дневного запуска в журнале (повторный вызов не сбрасывает журнал).
+
+        Args:
+            date: Дата в формате YYYY-MM-DD
+            pending: Сколько подписок осталось обработать (режим захвата - без набора ID в Redis).
+                collected выставляется как уже обработанные + pending
+        """
+        try:
+            key = self._get_run_key(date)
+            ttl_seconds = settings.AUTO_PAYMENT_REDIS_TTL_HOURS * 3600
+
+            pipe = self.client.pipeline()
+            pipe.hsetnx(key, "started_at", datetime.now(timezone.utc).isoformat())
+            pipe.hdel(key, "finished_at")
+            pipe.hmget(key, "charged", "skipped", "failed")
+            pipe.expire(key, ttl_seconds)
+            _, _, done_counts, _ = pipe.execute()
+
+            if pending is not None:
+                done = sum(int(value or 0) for value in done_counts)
+                self.client.hset(key, "collected", done + pending)
+        except Exception as e:
+            logger.error(f"Error starting run ledger in Redis: {e}", exc_info=True)
+
+    def add_unfinished_subscriptions_for_date(self, subscription_ids: Sequence[int], date: str) -> list[int]:
+        """
+        Добавить ID подписок в набор ожидающих, пропустив уже обработанные за дату.
+
+        Используется коллектором: при повторном запуске (после падения) возвращаются
+        только необработанные подписки. Новые ID учитываются в счетчике collected.
+
+        Args:
+            subscription_ids: Список ID подписок
+            date: Дата в формате YYYY-MM-DD
+
+        Returns:
+            ID подписок, которые еще не обработаны
+        """
+        if not subscription_ids:
+            return []
+
+        try:
+            done_flags = self.client.smismember(self._get_done_key(date), [str(sid) for sid in subscription_ids])
+            unfinished = [sid for sid, done in zip(subscription_ids, done_flags) if not done]
+            if not unfinished:
+                return []
+
+            key = self._get_subscriptions_key(date)
+            ttl_seconds = settings.AUTO_PAYMENT_REDIS_TTL_HOURS * 3600
+            pipe = self.client.pipeline()
+            pipe.sadd(key, *[str(sid) for sid in unfinished])
+            pipe.expire(key, ttl_seconds)
+            added, _ = pipe.execute()
+
+            if added:
+                self.client.hincrby(self._get_run_key(date), "collected", added)
+            return unfinished
+        except Exception as e:
+            logger.error(f"Error adding unfinished subscriptions to Redis: {e}", exc_info=True)
+            return list(subscription_ids)
+
+    def push_subscription_chunks(self, chunks: Sequence[Sequence[int]], date: str) -> None:
+        """
+        Заменить очередь пачек подписок за дату (режим пачек без темпа).
+
+        Args:
+            chunks: Пачки ID подписок в порядке запуска
+            date: Дата в формате YYYY-MM-DD
+
+        Raises:
+            redis.RedisError: Redis недоступен (коллектор повторит сбор)
+        """
+        key = self._get_chunk_queue_key(date)
+        pipe = self.client.pipeline()
+        pipe.delete(key)
+        if chunks:
+            pipe.rpush(key, *[json.dumps(list(chunk_ids)) for chunk_ids in chunks])
+            pipe.expire(key, settings.AUTO_PAYMENT_REDIS_TTL_HOURS * 3600)
+        pipe.execute()
+
+    def pop_subscription_chunk(self, date: str) -> Optional[list[int]]:
+        """
+        Взять следующую пачку подписок из очереди за дату.
+
+        Args:
+            date: Дата в формате YYYY-MM-DD
+
+        Returns:
+            ID подписок пачки или None, если очередь пуста (или Redis недоступен)
+        """
+        try:
+            raw = self.client.lpop(self._get_chunk_queue_key(date))
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.error(f"Error taking subscription chunk from Redis: {e}", exc_info=True)
+            return None
+
+    def record_run_progress(
+        self,
+        date: str,
+        subscription_ids: Sequence[int] = (),
+        charged: int = 0,
+        skipped: int = 0,
+        failed: int = 0,
+        notified: int = 0,
+    ) -> None:
+        """
+        Записать прогресс дневного запуска одним pipeline.
+
+        Обработанные подписки переносятся из набора ожидающих в набор обработанных,
+        счетчики увеличиваются через HINCRBY. Когда ожидающих не осталось,
+        в журнал записывается finished_at.
+
+        Args:
+            date: Дата в формате YYYY-MM-DD
+            subscription_ids: ID обработанных подписок
+            charged: Создано платежей
+            skipped: Пропущено (уже продлены, промокод, платеж уже есть)
+            failed: Ошибки обработки
+            notified: Отправлено уведомлений
+        """
+        try:
+            run_key = self._get_run_key(date)
+            ttl_seconds = settings.AUTO_PAYMENT_REDIS_TTL_HOURS * 3600
+            ids_str = [str(sid) for sid in subscription_ids]
+
+            pipe = self.client.pipeline()
+            if ids_str:
+                pipe.srem(self._get_subscriptions_key(date), *ids_str)
+                pipe.sadd(self._get_done_key(date), *ids_str)
+                pipe.expire(self._get_done_key(date), ttl_seconds)
+            counters = {"charged": charged, "skipped": skipped, "failed": failed, "notified": notified}
+            for field, value in counters.items():
+                if value:
+                    pipe.hincrby(run_key, field, value)
+            pipe.hset(run_key, "updated_at", datetime.now(timezone.utc).isoformat())
+            pipe.expire(run_key, ttl_seconds)
+            pipe.scard(self._get_subscriptions_key(date))
+            remaining = pipe.execute()[-1]
+
+            if ids_str and remaining == 0:
+                self.client.hsetnx(run_key, "finished_at", datetime.now(timezone.utc).isoformat())
+        except Exception as e:
+            logger.error(f"Error recording run progress in Redis: {e}", exc_info=True)
+
+    def get_run_status(self, date: str) -> dict[str, Any]:
+        """
+        Получить журнал дневного запуска со скоростью обработки и прогнозом завершения.
+
+        Args:
+            date: Дата в формате YYYY-MM-DD
+
+        Returns:
+            Dict со счетчиками, временем начала/окончания, скоростью (подписок в секунду) и ETA
+        """
+        pipe = self.client.pipeline()
+        pipe.hgetall(self._get_run_key(date))
+        pipe.scard(self._get_subscriptions_key(date))
+        raw, pending = pipe.execute()
+
+        status: dict[str, Any] = {field: int(raw.get(field, 0)) for field in self.RUN_COUNTERS}
+        processed = status["charged"] + status["skipped"] + status["failed"]
+        started_at = raw.get("started_at")
+        finished_at = raw.get("finished_at")
+
+        now = datetime.now(timezone.utc)
+        elapsed = 0.0
+        if started_at:
+            end = datetime.fromisoformat(finished_at) if finished_at else now
+            elapsed = max((end - datetime.fromisoformat(started_at)).total_seconds(), 0.0)
+        rate = processed / elapsed if elapsed > 0 else 0.0
+
+        remaining = pending or max(status["collected"] - processed, 0)
+        eta = None
+        if not finished_at and remaining and rate > 0:
+            eta = (now + timedelta(seconds=remaining / rate)).isoformat()
+
+        status.update(
+            {
+                "processed": processed,
+                "pending": pending,
+                "started_at": started_at,
+                "finished_at": finished_at,
+                "elapsed_seconds": round(elapsed, 1),
+                "rate_per_second": round(rate, 3),
+                "eta": eta,
+            }
+        )
+        return status
+
+    def record_http_pool_stats(self, name: str, counts: dict[str, int]) -> None:
+        """
+        Добавить прирост счетчиков соединений HTTP-клиента Юкассы (суммируются по всем процессам).
+
+        Args:
+            name: Имя клиента (sync - Celery воркеры, async - FastAPI)
+            counts: Прирост счетчиков requests/new_connections/reused_connections
+        """
+        try:
+            key = self._get_http_pool_key(name)
+            pipe = self.client.pipeline()
+            for field, value in counts.items():
+                if value:
+                    pipe.hincrby(key, field, value)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Error recording HTTP pool stats in Redis: {e}", exc_info=True)
+
+    def get_http_pool_stats(self, name: str) -> dict[str, Any]:
+        """
+        Получить суммарные счетчики соединений HTTP-клиента Юкассы.
+
+        Args:
+            name: Имя клиента (sync - Celery воркеры, async - FastAPI)
+
+        Returns:
+            Dict со счетчиками и долей запросов, выполненных по уже открытому соединению
+        """
+        raw = self.client.hgetall(self._get_http_pool_key(name))
+        stats = {field: int(raw.get(field, 0)) for field in ("requests", "new_connections", "reused_connections")}
+        stats["reuse_ratio"] = round(stats["reused_connections"] / stats["requests"], 4) if stats["requests"] else 0.0
+        return stats
+
+    def cache_payment(self, payment_object: dict[str, Any]) -> None:
+        """
+        Сохранить платеж Юкассы в кэш на YOOKASSA_PAYMENT_CACHE_TTL_SECONDS.
+        Кэшируются только финальные статусы (succeeded/canceled) - они уже не изменятся,
+        поэтому кэш не может вернуть устаревший статус. Кэш читается вместо API (payment_method.id, статус),
+        поэтому сохраняются только ответы API и webhook-и с адресов Юкассы (is_yookassa_webhook_source).
+
+        Args:
+            payment_object: Объект платежа в формате API Юкассы
+        """
+        if payment_object.get("status") not in FINAL_PAYMENT_STATUSES or not payment_object.get("id"):
+            return
+        try:
+            self.client.set(
+                self._get_payment_cache_key(payment_object["id"]),
+                json.dumps(payment_object, default=str),
+                ex=settings.YOOKASSA_PAYMENT_CACHE_TTL_SECONDS,
+            )
+        except Exception as e:
+            logger.error(f"Error caching YooKassa payment {payment_object.get('id')} in Redis: {e}")
+
+    def get_cached_payment(self, yookassa_payment_id: str) -> Optional[dict[str, Any]]:
+        """
+        Получить платеж Юкассы из кэша.
+
+        Args:
+            yookassa_payment_id: ID платежа в Юкассе
+
+        Returns:
+            Объект платежа в формате API Юкассы или None, если его нет в кэше (или Redis недоступен)
+        """
+        try:
+            raw = self.client.get(self._get_payment_cache_key(yookassa_payment_id))
+            self.client.hincrby(self._get_payment_cache_stats_key(), "hits" if raw else "misses", 1)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.error(f"Error reading cached YooKassa payment {yookassa_payment_id} from Redis: {e}")
+            return None
+
+    def get_payment_cache_stats(self) -> dict[str, Any]:
+        """
+        Получить счетчики кэша платежей Юкассы (суммарно по всем процессам).
+
+        Returns:
+            Dict с количеством попаданий, промахов и долей запросов, обслуженных без обращения к API
+        """
+        raw = self.client.hgetall(self._get_payment_cache_stats_key())
+        stats = {field: int(raw.get(field, 0)) for field in ("hits", "misses")}
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+    def cache_telegram_id(self, user_id: int, telegram_id: int) -> None:
+        """
+        Сохранить telegram_id пользователя в кэш на TELEGRAM_ID_CACHE_TTL_SECONDS.
+
+        Args:
+            user_id: ID пользователя
+            telegram_id: Telegram ID пользователя
+        """
+        try:
+            self.client.set(
+                self._get_telegram_id_cache_key(user_id), telegram_id, ex=settings.TELEGRAM_ID_CACHE_TTL_SECONDS
+            )
+        except Exception as e:
+            logger.error(f"Error caching telegram_id of user {user_id} in Redis: {e}")
+
+    def get_cached_telegram_id(self, user_id: int) -> Optional[int]:
+        """
+        Получить telegram_id пользователя из кэша.
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            Telegram ID или None, если его нет в кэше (или Redis недоступен)
+        """
+        try:
+            raw = self.client.get(self._get_telegram_id_cache_key(user_id))
+            return int(raw) if raw else None
+        except Exception as e:
+            logger.error(f"Error reading cached telegram_id of user {user_id} from Redis: {e}")
+            return None
+
+    def invalidate_telegram_id(self, user_id: int) -> None:
+        """
+        Удалить telegram_id пользователя из кэша (после смены telegram_id).
+
+        Args:
+            user_id: ID пользователя
+        """
+        try:
+            self.client.delete(self._get_telegram_id_cache_key(user_id))
+        except Exception as e:
+            logger.error(f"Error invalidating cached telegram_id of user {user_id} in Redis: {e}")
+
 
 redis_client = RedisClient()
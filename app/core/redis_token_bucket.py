@@ -0,0 +1,99 @@
+"""
+Token bucket в Redis, общий для всех процессов (FastAPI, Celery воркеры).
+
+Токен списывается атомарно Lua-скриптом сразу из нескольких бакетов (например, бакет операции
+и общий бакет) - из всех или ни из одного. Ключ блокировки останавливает выдачу токенов
+до истечения его TTL (ответ 429 с Retry-After от внешнего API).
+"""
+
+from typing import Any
+
+from app.core.redis_client import redis_client
+
+# KEYS: бакеты..., ключ блокировки (последний)
+# ARGV: rate и capacity для каждого бакета
+# Возвращает 0, если токен получен, иначе - сколько миллисекунд ждать
+_ACQUIRE_SCRIPT = """
+local blocked_key = KEYS[#KEYS]
+local blocked = redis.call('PTTL', blocked_key)
+if blocked > 0 then
+    return blocked
+end
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local wait = 0
+local tokens = {}
+
+for i = 1, #KEYS - 1 do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(now - ts, 0) * rate / 1000)
+    tokens[i] = available
+    if available < 1 then
+        wait = math.max(wait, math.ceil((1 - available) * 1000 / rate))
+    end
+end
+
+for i = 1, #KEYS - 1 do
+    local rate = tonumber(ARGV[2 * i - 1])
+    local capacity = tonumber(ARGV[2 * i])
+    local available = tokens[i]
+    if wait == 0 then
+        available = available - 1
+    end
+    redis.call('HSET', KEYS[i], 'tokens', tostring(available), 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(capacity * 1000 / rate) + 1000)
+end
+
+return wait
+"""
+
+
+class RedisTokenBucket:
+    """Набор token bucket-ов в Redis с общим ключом блокировки"""
+
+    def __init__(self, blocked_key: str):
+        self.blocked_key = blocked_key
+        self._script: Any = None
+
+    def try_acquire(self, buckets: list[tuple[str, float]], burst_seconds: float) -> float:
+        """
+        Попытаться получить токен сразу из всех бакетов.
+
+        Args:
+            buckets: (ключ, токенов в секунду); бакеты с нулевым лимитом не учитываются
+            burst_seconds: Емкость бакета - сколько секунд лимита можно израсходовать разом
+
+        Returns:
+            0 - токен получен, иначе - сколько секунд ждать до следующей попытки
+
+        Raises:
+            redis.RedisError: Redis недоступен (решение о fallback принимает вызывающий код)
+        """
+        buckets = [(key, rate) for key, rate in buckets if rate > 0]
+        args = []
+        for _, rate in buckets:
+            args.extend([rate, max(rate * burst_seconds, 1.0)])
+
+        if self._script is None:
+            self._script = redis_client.client.register_script(_ACQUIRE_SCRIPT)
+        wait_ms = self._script(keys=[key for key, _ in buckets] + [self.blocked_key], args=args)
+        return int(wait_ms) / 1000
+
+    def block_for(self, seconds: float) -> None:
+        """
+        Остановить выдачу токенов на указанное время.
+        Более ранняя блокировка не сокращает уже установленную.
+
+        Raises:
+            redis.RedisError: Redis недоступен
+        """
+        ttl_ms = int(seconds * 1000)
+        if ttl_ms <= 0:
+            return
+        if redis_client.client.pttl(self.blocked_key) < ttl_ms:
+            redis_client.client.set(self.blocked_key, "1", px=ttl_ms)
@@ -0,0 +1,248 @@
+"""
+Планирование дневных автосписаний с целевой скоростью.
+
+Вместо одновременного запуска всех продлений в AUTO_PAYMENT_START_HOUR подписки (или пачки)
+ставятся в очередь запуска в Redis, а периодическая задача dispatch_paced_renewals выдает из нее
+подписку с позицией p не раньше старт + p / target_rate_per_second. Долгих ETA-сообщений в брокере нет:
+сообщение с ETA дольше visibility_timeout Redis-брокера выдается воркерам повторно (двойное списание).
+После конца окна (end_hour) очередь не выдается - оставшиеся подписки остаются необработанными в журнале запуска.
+Прогресс запуска хранится в Redis по ключу `auto_payment:pacing:{date}`, очередь - `auto_payment:pacing:{date}:queue`.
+"""
+
+import json
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from app.core.logger import logger
+from app.core.redis_client import redis_client
+
+
+class RenewalPacer:
+    """Распределение автосписаний по окну start_hour..end_hour с целевой скоростью"""
+
+    REDIS_KEY_PREFIX = "auto_payment:pacing"
+
+    def __init__(self, config: dict, now: Optional[datetime] = None):
+        """
+        Args:
+            config: Настройки автоплатежей (auto_payment_config.get_config())
+            now: Момент начала запуска (по умолчанию - текущее время UTC)
+        """
+        self.rate = float(config["target_rate_per_second"])
+        self.ttl_seconds = config["redis_ttl_hours"] * 3600
+        self.window_start = now or datetime.now(timezone.utc)
+        self.window_end = self.window_start.replace(
+            hour=config["end_hour"], minute=config["end_minute"], second=0, microsecond=0
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """Темп включен, если задана целевая скорость"""
+        return self.rate > 0
+
+    def eta_for(self, position: int) -> Optional[datetime]:
+        """
+        Получить ETA для списания с указанным порядковым номером.
+
+        Args:
+            position: Порядковый номер списания в запуске (с 0)
+
+        Returns:
+            Время запуска или None, если темп выключен
+        """
+        if not self.enabled:
+            return None
+        return self.window_start + timedelta(seconds=position / self.rate)
+
+    def window_closed(self, now: Optional[datetime] = None) -> bool:
+        """Окно запуска закончилось (с включенным темпом новые списания не начинаются)"""
+        return (now or datetime.now(timezone.utc)) >= self.window_end
+
+    def seconds_per_batch(self, batch_size: int, workers: int = 1) -> float:
+        """
+        Минимальная длительность обработки пачки одним из workers параллельных воркеров,
+        при которой суммарная скорость не превышает целевую.
+        """
+        if not self.enabled:
+            return 0.0
+        return batch_size * workers / self.rate
+
+    def start_run(self, date: str, total: int, batches: Sequence[Sequence[int]] = ()) -> dict[str, Any]:
+        """
+        Зафиксировать план запуска в Redis.
+
+        Args:
+            date: Дата в формате YYYY-MM-DD
+            total: Количество списаний в запуске
+            batches: Пачки ID подписок в порядке запуска - ставятся в очередь для dispatch_paced_renewals
+                (только с включенным темпом)
+
+        Returns:
+            Dict с планом запуска
+        """
+        planned_end = self.eta_for(total) if total else self.window_start
+        plan = {
+            "total": total,
+            "done": 0,
+            "dispatched": 0,
+            "not_dispatched": 0,
+            "rate": self.rate,
+            "started_at": self.window_start.isoformat(),
+            "planned_end": planned_end.isoformat() if planned_end else "",
+            "window_end": self.window_end.isoformat(),
+        }
+
+        if planned_end and planned_end > self.window_end:
+            logger.warning(
+                f"Auto payment run for {date}: {total} charges at {self.rate}/s end at {planned_end}, "
+                f"after window end {self.window_end}"
+            )
+
+        try:
+            key, queue_key = self._get_key(date), self._get_queue_key(date)
+            pipe = redis_client.client.pipeline()
+            pipe.delete(key, queue_key)
+            pipe.hset(key, mapping=plan)
+            pipe.expire(key, self.ttl_seconds)
+            if self.enabled and batches:
+                pipe.rpush(queue_key, *(json.dumps(list(batch)) for batch in batches))
+                pipe.expire(queue_key, self.ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            if self.enabled and batches:
+                # Без очереди подписки не будут запущены - коллектор повторит сбор
+                raise
+            logger.error(f"Error saving pacing plan to Redis: {e}", exc_info=True)
+
+        return plan
+
+    @classmethod
+    def take_due(cls, date: str, now: Optional[datetime] = None) -> tuple[list[list[int]], int]:
+        """
+        Забрать из очереди пачки, время запуска которых наступило.
+        После конца окна очередь очищается без запуска.
+
+        Вызывается только из dispatch_paced_renewals под блокировкой (один вызов одновременно).
+
+        Args:
+            date: Дата в формате YYYY-MM-DD
+            now: Текущее время (по умолчанию - текущее время UTC)
+
+        Returns:
+            (пачки ID подписок к запуску, количество подписок, не запущенных из-за конца окна)
+        """
+        key, queue_key = cls._get_key(date), cls._get_queue_key(date)
+        raw = redis_client.client.hgetall(key)
+        if not raw or not redis_client.client.llen(queue_key):
+            return [], 0
+
+        now = now or datetime.now(timezone.utc)
+        if now >= datetime.fromisoformat(raw["window_end"]):
+            pipe = redis_client.client.pipeline()
+            pipe.lrange(queue_key, 0, -1)
+            pipe.delete(queue_key)
+            left = sum(len(json.loads(item)) for item in pipe.execute()[0])
+            redis_client.client.hincrby(key, "not_dispatched", left)
+            return [], left
+
+        rate = float(raw.get("rate", 0))
+        dispatched = int(raw.get("dispatched", 0))
+        elapsed = max((now - datetime.fromisoformat(raw["started_at"])).total_seconds(), 0.0)
+        # Пачка с позицией p запускается не раньше старт + p / rate
+        allowed_position = rate * elapsed if rate > 0 else float("inf")
+
+        batches: list[list[int]] = []
+        while dispatched <= allowed_position:
+            item = redis_client.client.lpop(queue_key)
+            if item is None:
+                break
+            batch = json.loads(item)
+            batches.append(batch)
+            dispatched += len(batch)
+
+        if batches:
+            redis_client.client.hset(key, "dispatched", dispatched)
+        return batches, 0
+
+    @classmethod
+    def mark_done(cls, date: str, count: int = 1) -> None:
+        """
+        Отметить обработанные списания.
+
+        Args:
+            date: Дата в формате YYYY-MM-DD
+            count: Количество обработанных списаний
+        """
+        if count <= 0:
+            return
+        try:
+            redis_client.client.hincrby(cls._get_key(date), "done", count)
+        except Exception as e:
+            logger.error(f"Error updating pacing progress in Redis: {e}", exc_info=True)
+
+    @classmethod
+    def get_status(cls, date: str) -> dict[str, Any]:
+        """
+        Получить прогресс запуска и прогноз завершения.
+
+        Прогноз считается по фактической скорости (done / прошедшее время),
+        а до первых обработанных списаний - по плановой.
+
+        Args:
+            date: Дата в формате YYYY-MM-DD
+
+        Returns:
+            Dict с прогрессом запуска (пустой план - {"date": date, "started": False})
+        """
+        raw = redis_client.client.hgetall(cls._get_key(date))
+        if not raw:
+            return {"date": date, "started": False}
+
+        now = datetime.now(timezone.utc)
+        total = int(raw.get("total", 0))
+        done = int(raw.get("done", 0))
+        rate = float(raw.get("rate", 0))
+        started_at = datetime.fromisoformat(raw["started_at"])
+        window_end = datetime.fromisoformat(raw["window_end"])
+
+        elapsed = max((now - started_at).total_seconds(), 0.0)
+        observed_rate = done / elapsed if elapsed > 0 and done else 0.0
+        remaining = max(total - done, 0)
+
+        if not remaining:
+            projected_end = now
+        elif observed_rate > 0:
+            projected_end = now + timedelta(seconds=remaining / observed_rate)
+        elif rate > 0:
+            projected_end = max(now, started_at) + timedelta(seconds=remaining / rate)
+        else:
+            projected_end = None
+
+        return {
+            "date": date,
+            "started": True,
+            "total": total,
+            "done": done,
+            "remaining": remaining,
+            "progress_percent": round(done / total * 100, 2) if total else 100.0,
+            "target_rate": rate,
+            "observed_rate": round(observed_rate, 3),
+            "dispatched": int(raw.get("dispatched", 0)),
+            "not_dispatched": int(raw.get("not_dispatched", 0)),
+            "started_at": raw["started_at"],
+            "planned_end": raw.get("planned_end") or None,
+            "projected_end": projected_end.isoformat() if projected_end else None,
+            "window_end": raw["window_end"],
+            "projected_overrun": bool(projected_end and projected_end > window_end),
+        }
+
+    @classmethod
+    def _get_key(cls, date: str) -> str:
+        """Получить ключ Redis для плана запуска"""
+        return f"{cls.REDIS_KEY_PREFIX}:{date}"
+
+    @classmethod
+    def _get_queue_key(cls, date: str) -> str:
+        """Получить ключ Redis для очереди запуска"""
+        return f"{cls.REDIS_KEY_PREFIX}:{date}:queue"
@@ -0,0 +1,88 @@
+"""
+Кэш user_id -> telegram_id для отправки уведомлений.
+
+Два уровня:
+- LRU в памяти процесса (TELEGRAM_ID_CACHE_SIZE записей, TELEGRAM_ID_CACHE_LOCAL_TTL_SECONDS)
+- Redis, общий для всех процессов (TELEGRAM_ID_CACHE_TTL_SECONDS)
+
+При смене telegram_id (перенос пользователя) запись удаляется из Redis и из памяти текущего процесса,
+в памяти остальных процессов она устаревает не позже чем через TELEGRAM_ID_CACHE_LOCAL_TTL_SECONDS.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+
+class TelegramIdCache:
+    """Кэш telegram_id пользователей: LRU в памяти процесса поверх Redis"""
+
+    def __init__(self, maxsize: Optional[int] = None, local_ttl_seconds: Optional[float] = None):
+        """
+        Args:
+            maxsize: Размер LRU в памяти (если None, берется из settings)
+            local_ttl_seconds: Время жизни записи в памяти (если None, берется из settings)
+        """
+        self.maxsize = maxsize or settings.TELEGRAM_ID_CACHE_SIZE
+        self.local_ttl_seconds = local_ttl_seconds or settings.TELEGRAM_ID_CACHE_LOCAL_TTL_SECONDS
+        # user_id -> (telegram_id, время истечения записи по time.monotonic())
+        self._entries: OrderedDict[int, tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_local(self, user_id: int) -> Optional[int]:
+        """Получить telegram_id из памяти процесса"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            telegram_id, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return telegram_id
+
+    def _set_local(self, user_id: int, telegram_id: int) -> None:
+        """Сохранить telegram_id в памяти процесса, вытесняя самые давние записи"""
+        with self._lock:
+            self._entries[user_id] = (telegram_id, time.monotonic() + self.local_ttl_seconds)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, user_id: int) -> Optional[int]:
+        """
+        Получить telegram_id пользователя из кэша.
+
+        Args:
+            user_id: ID пользователя
+
+        Returns:
+            Telegram ID или None при промахе (тогда его нужно прочитать из БД и сохранить через set)
+        """
+        telegram_id = self._get_local(user_id)
+        if telegram_id is not None:
+            return telegram_id
+
+        telegram_id = redis_client.get_cached_telegram_id(user_id)
+        if telegram_id is not None:
+            self._set_local(user_id, telegram_id)
+        return telegram_id
+
+    def set(self, user_id: int, telegram_id: int) -> None:
+        """Сохранить telegram_id пользователя в обоих уровнях кэша"""
+        self._set_local(user_id, telegram_id)
+        redis_client.cache_telegram_id(user_id, telegram_id)
+
+    def invalidate(self, user_id: int) -> None:
+        """Удалить telegram_id пользователя из обоих уровней кэша"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+        redis_client.invalidate_telegram_id(user_id)
+
+
+telegram_id_cache = TelegramIdCache()
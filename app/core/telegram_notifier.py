@@ -2,18 +2,28 @@
 Telegram notification service
 """
 
+import os
+import time
 from typing import Optional
 
-import requests
+import httpx
 
 from app.core.config import settings
 from app.core.logger import logger
+from app.core.telegram_sender import TelegramRateLimiter
+from app.core.telegram_suppression import is_permanent_delivery_error, telegram_suppression_list
 
 
 class TelegramNotifier:
-    """Сервис для отправки уведомлений в Telegram"""
+    """
+    Сервис для отправки одиночных уведомлений в Telegram (sync, для Celery задач и сервисов).
+    Пачки сообщений отправляются через AsyncTelegramSender.send_many.
+
+    Соблюдает общие с AsyncTelegramSender лимиты (TelegramRateLimiter) и ждет их
+    не дольше TELEGRAM_MAX_WAIT_SECONDS: долгий retry_after не блокирует воркер.
+    Чаты из списка подавления (telegram_suppression_list) пропускаются без HTTP-запроса.
+    """
 
-    BASE_URL = "https://api.telegram.org/bot"
     TIMEOUT = 10
     MAX_RETRIES = 3
 
@@ -27,6 +37,35 @@ class TelegramNotifier:
         self.bot_token = bot_token or settings.BOT_TOKEN or settings.TELEGRAM_BOT_TOKEN
         if not self.bot_token:
             raise ValueError("Telegram bot token is not configured")
+        self.rate_limiter = TelegramRateLimiter()
+        self._session: Optional[httpx.Client] = None
+        self._session_pid: Optional[int] = None
+
+    def _get_session(self) -> httpx.Client:
+        """Получить HTTP-клиент процесса с пулом keep-alive соединений (после fork пересоздается)"""
+        if self._session is None or self._session_pid != os.getpid():
+            self._session = httpx.Client(
+                base_url=f"{settings.TELEGRAM_API_URL}/bot{self.bot_token}", timeout=self.TIMEOUT
+            )
+            self._session_pid = os.getpid()
+        return self._session
+
+    def _wait_for_rate_limit(self, chat_id: int) -> bool:
+        """
+        Дождаться токена общего и чатового лимита.
+
+        Returns:
+            False, если ожидание превысило бы TELEGRAM_MAX_WAIT_SECONDS
+        """
+        waited = 0.0
+        while True:
+            wait = self.rate_limiter.try_acquire(chat_id)
+            if not wait:
+                return True
+            if waited + wait > settings.TELEGRAM_MAX_WAIT_SECONDS:
+                return False
+            time.sleep(wait)
+            waited += wait
 
     def send_message(
         self, chat_id: int, message: str, parse_mode: str = "HTML", disable_web_page_preview: bool = True
@@ -43,7 +82,9 @@ class TelegramNotifier:
         Returns:
             True если сообщение отправлено успешно, False в противном случае
         """
-        url = f"{self.BASE_URL}{self.bot_token}/sendMessage"
+        if telegram_suppression_list.is_suppressed(chat_id):
+            logger.debug(f"Telegram chat_id={chat_id} is suppressed (bot blocked or chat not found), message skipped")
+            return False
 
         payload = {
             "chat_id": chat_id,
@@ -53,8 +94,12 @@ class TelegramNotifier:
         }
 
         for attempt in range(self.MAX_RETRIES):
+            if not self._wait_for_rate_limit(chat_id):
+                logger.warning(f"Telegram rate limit wait exceeded for chat_id={chat_id}, message not sent")
+                return False
+
             try:
-                response = requests.post(url, json=payload, timeout=self.TIMEOUT)
+                response = self._get_session().post("/sendMessage", json=payload)
 
                 if response.status_code == 200:
                     result = response.json()
@@ -64,30 +109,34 @@ class TelegramNotifier:
                     else:
                         error_description = result.get("description", "Unknown error")
                         logger.warning(f"Telegram API returned error for chat_id={chat_id}: {error_description}")
-                        # Если ошибка критическая (например, чат не найден), не повторяем
-                        if "chat not found" in error_description.lower() or "blocked" in error_description.lower():
-                            return False
+
+                elif response.status_code in (400, 403):
+                    error_description = self._get_error_description(response)
+                    logger.warning(f"Telegram API returned error for chat_id={chat_id}: {error_description}")
+                    # Чат не найден, бот заблокирован - повтор не поможет, следующие отправки пропускаются
+                    if is_permanent_delivery_error(response.status_code, error_description):
+                        telegram_suppression_list.suppress(chat_id, error_description)
+                    return False
 
                 elif response.status_code == 429:
-                    # Rate limit - получаем время ожидания
+                    # Rate limit - приостанавливаем отправку всех процессов, повтор дождется лимита
                     retry_after = response.json().get("parameters", {}).get("retry_after", 60)
-                    logger.warning(f"Telegram rate limit hit for chat_id={chat_id}, waiting {retry_after} seconds")
-                    if attempt < self.MAX_RETRIES - 1:
-                        import time
-
-                        time.sleep(retry_after)
-                        continue
+                    logger.warning(
+                        f"Telegram rate limit hit for chat_id={chat_id}, all senders paused for {retry_after}s"
+                    )
+                    self.rate_limiter.block_for(retry_after)
+                    continue
 
                 else:
                     logger.warning(f"Telegram API returned status {response.status_code} for chat_id={chat_id}")
 
-            except requests.exceptions.Timeout:
+            except httpx.TimeoutException:
                 logger.warning(f"Telegram API timeout for chat_id={chat_id}, attempt {attempt + 1}/{self.MAX_RETRIES}")
                 if attempt == self.MAX_RETRIES - 1:
                     logger.error(f"Failed to send Telegram message after {self.MAX_RETRIES} attempts")
                     return False
 
-            except requests.exceptions.RequestException as e:
+            except httpx.HTTPError as e:
                 logger.error(
                     f"Error sending Telegram message to chat_id={chat_id}: {str(e)}, "
                     f"attempt {attempt + 1}/{self.MAX_RETRIES}"
@@ -101,6 +150,14 @@ class TelegramNotifier:
 
         return False
 
+    @staticmethod
+    def _get_error_description(response: httpx.Response) -> str:
+        """Поле description ответа Telegram с ошибкой"""
+        try:
+            return response.json().get("description", f"HTTP {response.status_code}")
+        except ValueError:
+            return f"HTTP {response.status_code}"
+
     def send_notification_to_user(self, telegram_id: int, message: str, parse_mode: str = "HTML") -> bool:
         """
         Отправить уведомление пользователю по telegram_id
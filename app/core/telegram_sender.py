@@ -0,0 +1,246 @@
+"""
+Асинхронная пакетная отправка сообщений в Telegram.
+
+Сообщения ставятся во внутреннюю очередь и отправляются TELEGRAM_SENDER_CONCURRENCY
+корутинами через общий httpx.AsyncClient с пулом keep-alive соединений.
+Лимиты Telegram соблюдаются для всех процессов сразу (token bucket в Redis):
+- общий лимит бота TELEGRAM_RATE_LIMIT_PER_SECOND сообщений в секунду
+- лимит на один чат TELEGRAM_RATE_LIMIT_PER_CHAT сообщений в секунду
+Ответ 429 с retry_after приостанавливает отправку всех процессов, сообщение возвращается в очередь.
+Чаты из списка подавления (бот заблокирован, чат не найден) пропускаются без HTTP-запроса,
+постоянная ошибка доставки добавляет чат в этот список.
+Ожидание выполняется через asyncio.sleep, а обращения к Redis (лимиты, список подавления) -
+в потоке через asyncio.to_thread, поэтому не блокируют остальные отправки.
+"""
+
+import asyncio
+from collections.abc import Sequence
+from typing import Any, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.redis_token_bucket import RedisTokenBucket
+from app.core.telegram_suppression import is_permanent_delivery_error, telegram_suppression_list
+
+# Результаты одной попытки отправки
+SENT = "sent"
+FAILED = "failed"
+RETRY = "retry"
+BLOCKED = "blocked"  # Доставка в чат невозможна, чат добавлен в список подавления
+
+
+class TelegramRateLimiter:
+    """Общий (через Redis) лимит отправки сообщений бота: на бота и на каждый чат"""
+
+    REDIS_KEY_PREFIX = "telegram:ratelimit"
+
+    def __init__(self):
+        self._bucket = RedisTokenBucket(f"{self.REDIS_KEY_PREFIX}:blocked")
+
+    def try_acquire(self, chat_id: int) -> float:
+        """
+        Попытаться получить токен на отправку сообщения в чат.
+        При недоступности Redis отправка не ограничивается (ответы 429 по-прежнему обрабатываются).
+
+        Args:
+            chat_id: ID чата
+
+        Returns:
+            0 - токен получен, иначе - сколько секунд ждать до следующей попытки
+        """
+        buckets = [
+            (f"{self.REDIS_KEY_PREFIX}:total", settings.TELEGRAM_RATE_LIMIT_PER_SECOND),
+            (f"{self.REDIS_KEY_PREFIX}:chat:{chat_id}", settings.TELEGRAM_RATE_LIMIT_PER_CHAT),
+        ]
+        try:
+            return self._bucket.try_acquire(buckets, burst_seconds=1.0)
+        except Exception as e:
+            logger.warning(f"Telegram rate limiter unavailable, message allowed: {e}")
+            return 0.0
+
+    def block_for(self, seconds: float) -> None:
+        """Остановить отправку всех процессов на указанное время (ответ 429 с retry_after)"""
+        try:
+            self._bucket.block_for(seconds)
+        except Exception as e:
+            logger.warning(f"Failed to store Telegram retry_after in Redis: {e}")
+
+
+class AsyncTelegramSender:
+    """Неблокирующая отправка сообщений в Telegram пачками с общим лимитом скорости"""
+
+    MAX_RETRIES = 3
+    BASE_DELAY = 1.0
+
+    def __init__(self, bot_token: Optional[str] = None):
+        """
+        Args:
+            bot_token: Токен бота (если None, берется из settings)
+        """
+        self.bot_token = bot_token or settings.BOT_TOKEN or settings.TELEGRAM_BOT_TOKEN
+        self.rate_limiter = TelegramRateLimiter()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Получить HTTP-клиент с пулом соединений.
+        Клиент создается лениво в текущем event loop и пересоздается, если loop сменился.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=f"{settings.TELEGRAM_API_URL}/bot{self.bot_token}",
+                timeout=httpx.Timeout(10.0),
+                limits=httpx.Limits(
+                    max_connections=settings.TELEGRAM_SENDER_CONCURRENCY,
+                    max_keepalive_connections=settings.TELEGRAM_SENDER_CONCURRENCY,
+                ),
+            )
+            self._loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        """Закрыть HTTP-клиент и его соединения"""
+        client, self._client, self._loop = self._client, None, None
+        if client is None or client.is_closed:
+            return
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing Telegram HTTP client: {e}")
+
+    async def _acquire(self, chat_id: int) -> None:
+        """Дождаться токена общего и чатового лимита"""
+        while True:
+            wait = await asyncio.to_thread(self.rate_limiter.try_acquire, chat_id)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    async def _send_once(self, chat_id: int, text: str, parse_mode: str) -> tuple[str, float]:
+        """
+        Одна попытка отправки сообщения.
+
+        Returns:
+            (SENT | FAILED | RETRY | BLOCKED, задержка перед повтором в секундах)
+        """
+        payload = {"chat_id": chat_id, "text": text, "parse_mode": parse_mode, "disable_web_page_preview": True}
+        try:
+            response = await self._get_client().post("/sendMessage", json=payload)
+        except httpx.HTTPError as e:
+            logger.warning(f"Error sending Telegram message to chat_id={chat_id}: {e}")
+            return RETRY, self.BASE_DELAY
+
+        try:
+            result = response.json()
+        except ValueError:
+            result = {}
+
+        if response.status_code == 200 and result.get("ok"):
+            return SENT, 0.0
+
+        if response.status_code == 429:
+            retry_after = float(result.get("parameters", {}).get("retry_after", 1))
+            logger.warning(f"Telegram rate limit hit for chat_id={chat_id}, all senders paused for {retry_after}s")
+            await asyncio.to_thread(self.rate_limiter.block_for, retry_after)
+            return RETRY, 0.0
+
+        description = result.get("description", f"HTTP {response.status_code}")
+        logger.warning(f"Telegram API returned error for chat_id={chat_id}: {description}")
+        if response.status_code >= 500:
+            return RETRY, self.BASE_DELAY
+        if is_permanent_delivery_error(response.status_code, description):
+            # Чат не найден, бот заблокирован - следующие отправки в этот чат не выполняются
+            await asyncio.to_thread(telegram_suppression_list.suppress, chat_id, description)
+            return BLOCKED, 0.0
+        # Остальные 4xx (например, ошибка разметки) - повтор не поможет
+        return FAILED, 0.0
+
+    async def _worker(self, queue: asyncio.Queue, results: dict[str, Any], parse_mode: str) -> None:
+        """Отправлять сообщения из очереди, пока она не опустеет"""
+        while True:
+            chat_id, text, attempt = await queue.get()
+            try:
+                await self._acquire(chat_id)
+                outcome, delay = await self._send_once(chat_id, text, parse_mode)
+                if outcome == RETRY and attempt + 1 < self.MAX_RETRIES:
+                    if delay:
+                        await asyncio.sleep(delay * (2**attempt))
+                    queue.put_nowait((chat_id, text, attempt + 1))
+                elif outcome == SENT:
+                    results["sent"] += 1
+                elif outcome == BLOCKED:
+                    results["blocked"] += 1
+                else:
+                    results["failed"] += 1
+                    results["failed_chat_ids"].append(chat_id)
+            except Exception as e:
+                logger.error(f"Unexpected error sending Telegram message to chat_id={chat_id}: {str(e)}")
+                results["failed"] += 1
+                results["failed_chat_ids"].append(chat_id)
+            finally:
+                queue.task_done()
+
+    async def send_many(self, messages: Sequence[tuple[int, str]], parse_mode: str = "HTML") -> dict[str, Any]:
+        """
+        Отправить пачку сообщений.
+
+        Args:
+            messages: Пары (chat_id, текст сообщения)
+            parse_mode: Режим парсинга (HTML, Markdown, MarkdownV2)
+
+        Returns:
+            Dict с количеством отправленных, неудачных, заблокированных (blocked - ошибка доставки в этой пачке,
+            suppressed - пропущены по списку подавления) сообщений и chat_id неудачных отправок
+        """
+        results: dict[str, Any] = {
+            "total": len(messages),
+            "sent": 0,
+            "failed": 0,
+            "blocked": 0,
+            "suppressed": 0,
+            "failed_chat_ids": [],
+        }
+        if not messages:
+            return results
+        if not self.bot_token:
+            raise ValueError("Telegram bot token is not configured")
+
+        chat_ids = [chat_id for chat_id, _ in messages]
+        suppressed = await asyncio.to_thread(telegram_suppression_list.get_suppressed, chat_ids)
+        queue: asyncio.Queue = asyncio.Queue()
+        for chat_id, text in messages:
+            if chat_id in suppressed:
+                results["suppressed"] += 1
+            else:
+                queue.put_nowait((chat_id, text, 0))
+        if queue.empty():
+            return results
+
+        workers = [
+            asyncio.create_task(self._worker(queue, results, parse_mode))
+            for _ in range(min(settings.TELEGRAM_SENDER_CONCURRENCY, queue.qsize()))
+        ]
+        try:
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return results
+
+    async def send(self, chat_id: int, text: str, parse_mode: str = "HTML") -> bool:
+        """
+        Отправить одно сообщение (с соблюдением общих лимитов).
+
+        Returns:
+            True если сообщение отправлено успешно
+        """
+        results = await self.send_many([(chat_id, text)], parse_mode=parse_mode)
+        return results["sent"] == 1
+
+
+telegram_sender = AsyncTelegramSender()
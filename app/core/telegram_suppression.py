@@ -0,0 +1,114 @@
+"""
+Список чатов Telegram, доставка в которые невозможна (бот заблокирован, чат не найден, пользователь удален).
+
+Хранится в Redis (sorted set: chat_id со временем ошибки в качестве score), общий для всех процессов.
+Отправители проверяют его до HTTP-запроса: одиночная проверка - ZSCORE, пачка - один ZMSCORE.
+Запись перестает действовать через TELEGRAM_SUPPRESSION_RECHECK_DAYS (пользователь мог разблокировать бота)
+или сразу, когда пользователь снова обращается к боту (авторизация через бота).
+Устаревшие записи удаляются ZREMRANGEBYSCORE при каждой записи и подсчете, поэтому список не растет бесконечно.
+"""
+
+import time
+from collections.abc import Iterable
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.redis_client import redis_client
+
+# Ошибки 400, означающие, что чата нет (остальные 400 - например, ошибка разметки - к чату не относятся)
+_PERMANENT_BAD_REQUEST_MARKERS = ("chat not found", "user not found", "peer_id_invalid", "user is deactivated")
+
+
+def is_permanent_delivery_error(status_code: int, description: str) -> bool:
+    """
+    Ошибка Telegram означает, что в этот чат доставить сообщение невозможно.
+
+    Args:
+        status_code: HTTP-статус ответа Telegram
+        description: Поле description ответа
+
+    Returns:
+        True для 403 (бот заблокирован/исключен, пользователь удален) и 400 "chat not found" и аналогов
+    """
+    if status_code == 403:
+        return True
+    description = (description or "").lower()
+    return status_code == 400 and any(marker in description for marker in _PERMANENT_BAD_REQUEST_MARKERS)
+
+
+class TelegramSuppressionList:
+    """Чаты с постоянной ошибкой доставки (общий для всех процессов, Redis)"""
+
+    REDIS_KEY = "telegram:suppressed_chats:by_time"
+
+    def _get_cutoff(self) -> float:
+        """Время, раньше которого записи уже не действуют (TELEGRAM_SUPPRESSION_RECHECK_DAYS назад)"""
+        return time.time() - settings.TELEGRAM_SUPPRESSION_RECHECK_DAYS * 86400
+
+    def suppress(self, chat_id: int, reason: str) -> None:
+        """
+        Записать чат с постоянной ошибкой доставки (заодно удалить устаревшие записи).
+
+        Args:
+            chat_id: ID чата
+            reason: Описание ошибки Telegram (для логов)
+        """
+        try:
+            pipe = redis_client.client.pipeline()
+            pipe.zadd(self.REDIS_KEY, {str(chat_id): int(time.time())})
+            pipe.zremrangebyscore(self.REDIS_KEY, "-inf", self._get_cutoff())
+            pipe.execute()
+            logger.info(f"Telegram chat_id={chat_id} suppressed: {reason}")
+        except Exception as e:
+            logger.warning(f"Failed to suppress Telegram chat_id={chat_id} in Redis: {e}")
+
+    def unsuppress(self, chat_id: int) -> None:
+        """Снова разрешить доставку в чат (пользователь обратился к боту)"""
+        try:
+            redis_client.client.zrem(self.REDIS_KEY, str(chat_id))
+        except Exception as e:
+            logger.warning(f"Failed to unsuppress Telegram chat_id={chat_id} in Redis: {e}")
+
+    def is_suppressed(self, chat_id: int) -> bool:
+        """
+        Доставка в чат заведомо невозможна.
+        При недоступности Redis отправка не блокируется.
+        """
+        try:
+            suppressed_at = redis_client.client.zscore(self.REDIS_KEY, str(chat_id))
+        except Exception as e:
+            logger.warning(f"Telegram suppression list unavailable, chat_id={chat_id} allowed: {e}")
+            return False
+        return suppressed_at is not None and suppressed_at >= self._get_cutoff()
+
+    def get_suppressed(self, chat_ids: Iterable[int]) -> set[int]:
+        """
+        Выбрать из пачки чаты, доставка в которые заведомо невозможна (один ZMSCORE).
+        При недоступности Redis отправка не блокируется.
+
+        Args:
+            chat_ids: ID чатов
+
+        Returns:
+            Множество ID чатов из списка подавления
+        """
+        chat_ids = list(dict.fromkeys(chat_ids))
+        if not chat_ids:
+            return set()
+        try:
+            scores = redis_client.client.zmscore(self.REDIS_KEY, [str(chat_id) for chat_id in chat_ids])
+        except Exception as e:
+            logger.warning(f"Telegram suppression list unavailable, {len(chat_ids)} chats allowed: {e}")
+            return set()
+        cutoff = self._get_cutoff()
+        return {chat_id for chat_id, score in zip(chat_ids, scores) if score is not None and score >= cutoff}
+
+    def count(self) -> int:
+        """Количество действующих записей в списке (устаревшие удаляются)"""
+        pipe = redis_client.client.pipeline()
+        pipe.zremrangebyscore(self.REDIS_KEY, "-inf", self._get_cutoff())
+        pipe.zcard(self.REDIS_KEY)
+        return pipe.execute()[1]
+
+
+telegram_suppression_list = TelegramSuppressionList()
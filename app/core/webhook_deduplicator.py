@@ -0,0 +1,125 @@
+"""
+Дедупликация webhook-ов Юкассы.
+
+Юкасса повторяет доставку уведомлений, поэтому одно и то же событие приходит несколько раз.
+Событие определяется ключом (object.id, event, object.status) и захватывается через SET NX:
+- на время обработки - с коротким TTL YOOKASSA_WEBHOOK_DEDUP_PROCESSING_TTL_SECONDS, который
+  обработчик продлевает, пока транзакция не завершена (если обработчик упал, захват истекает
+  раньше повторной выдачи сообщения из потока)
+- после коммита транзакции - на YOOKASSA_WEBHOOK_DEDUP_TTL_SECONDS
+- при откате транзакции захват снимается, повтор события будет обработан
+Повтор уже захваченного события отбрасывается до обращения к БД.
+Если Redis недоступен, вызывающий код захватывает событие в таблице processed_webhook_events.
+"""
+
+from collections.abc import Sequence
+from typing import Any, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.redis_client import redis_client
+
+
+def get_webhook_event_key(webhook_data: dict[str, Any]) -> Optional[tuple[str, str, str]]:
+    """
+    Получить ключ дедупликации события webhook-а.
+
+    Args:
+        webhook_data: Тело webhook-а Юкассы
+
+    Returns:
+        (object.id, event, object.status) или None, если в событии нет ID объекта
+    """
+    webhook_object = webhook_data.get("object") or {}
+    object_id = webhook_object.get("id")
+    if not object_id:
+        return None
+    return str(object_id), str(webhook_data.get("event") or ""), str(webhook_object.get("status") or "")
+
+
+class WebhookDeduplicator:
+    """Захват событий webhook-ов Юкассы в Redis (SET NX с TTL) и счетчики отброшенных повторов"""
+
+    KEY_PREFIX = "yookassa:webhook:seen"
+    STATS_KEY = "yookassa:webhook_dedup:stats"
+
+    def _get_key(self, event_key: tuple[str, str, str]) -> str:
+        """Получить ключ Redis события"""
+        return f"{self.KEY_PREFIX}:{':'.join(event_key)}"
+
+    def claim(self, event_key: tuple[str, str, str]) -> bool:
+        """
+        Захватить событие на время обработки.
+
+        Args:
+            event_key: Ключ события (object.id, event, status)
+
+        Returns:
+            True - событие новое и захвачено, False - повтор (событие обработано или обрабатывается)
+
+        Raises:
+            redis.RedisError: Redis недоступен (вызывающий код захватывает событие в БД)
+        """
+        ttl = settings.YOOKASSA_WEBHOOK_DEDUP_PROCESSING_TTL_SECONDS
+        return bool(redis_client.client.set(self._get_key(event_key), "processing", nx=True, ex=ttl))
+
+    def refresh(self, event_keys: Sequence[tuple[str, str, str]]) -> None:
+        """Продлить захват событий, которые еще обрабатываются, на YOOKASSA_WEBHOOK_DEDUP_PROCESSING_TTL_SECONDS"""
+        if not event_keys:
+            return
+        try:
+            pipe = redis_client.client.pipeline()
+            for event_key in event_keys:
+                pipe.expire(self._get_key(event_key), settings.YOOKASSA_WEBHOOK_DEDUP_PROCESSING_TTL_SECONDS)
+            expired = sum(1 for refreshed in pipe.execute() if not refreshed)
+            if expired:
+                # Захват уже истек: повтор события мог быть обработан другим воркером (обработка идемпотентна)
+                logger.warning(f"{expired} webhook event claims expired before refresh")
+        except Exception as e:
+            logger.warning(f"Failed to refresh webhook event claims in Redis: {e}")
+
+    def confirm(self, event_keys: Sequence[tuple[str, str, str]]) -> None:
+        """Запомнить обработанные события после коммита транзакции"""
+        if not event_keys:
+            return
+        try:
+            pipe = redis_client.client.pipeline()
+            for event_key in event_keys:
+                pipe.set(self._get_key(event_key), "processed", ex=settings.YOOKASSA_WEBHOOK_DEDUP_TTL_SECONDS)
+            pipe.execute()
+        except Exception as e:
+            # Захват истечет сам, повтор события будет обработан повторно (обработка идемпотентна)
+            logger.warning(f"Failed to store processed webhook events in Redis: {e}")
+
+    def release(self, event_keys: Sequence[tuple[str, str, str]]) -> None:
+        """Снять захват событий, транзакция которых откатилась"""
+        if not event_keys:
+            return
+        try:
+            redis_client.client.delete(*(self._get_key(event_key) for event_key in event_keys))
+        except Exception as e:
+            logger.warning(f"Failed to release webhook events in Redis: {e}")
+
+    def record(self, claimed: int = 0, suppressed: int = 0, db_fallback: int = 0) -> None:
+        """Увеличить счетчики захваченных событий, отброшенных повторов и захватов через БД"""
+        try:
+            pipe = redis_client.client.pipeline()
+            for field, value in (("claimed", claimed), ("suppressed", suppressed), ("db_fallback", db_fallback)):
+                if value:
+                    pipe.hincrby(self.STATS_KEY, field, value)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to record webhook dedup stats in Redis: {e}")
+
+    def get_stats(self) -> dict[str, int]:
+        """
+        Счетчики дедупликации webhook-ов.
+
+        Returns:
+            Dict: claimed - новые события, suppressed - отброшенные повторы, db_fallback - захваты через БД
+        """
+        raw = redis_client.client.hgetall(self.STATS_KEY)
+        return {field: int(raw.get(field, 0)) for field in ("claimed", "suppressed", "db_fallback")}
+
+
+webhook_deduplicator = WebhookDeduplicator()
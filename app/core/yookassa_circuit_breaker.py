@@ -0,0 +1,159 @@
+"""
+Circuit breaker для API Юкассы, общий для всех процессов (FastAPI, Celery воркеры).
+
+Состояния (ключи Redis `yookassa:circuit:*`):
+- closed - запросы идут в API, ошибки 5xx/сети считаются в окне YOOKASSA_CIRCUIT_FAILURE_WINDOW_SECONDS
+- open - после YOOKASSA_CIRCUIT_FAILURE_THRESHOLD ошибок запросы YOOKASSA_CIRCUIT_OPEN_SECONDS
+  отклоняются сразу исключением YookassaCircuitOpen, без обращения к API и без ожидания
+- half-open - после паузы один процесс выполняет пробный запрос: успех замыкает цепь,
+  ошибка размыкает ее снова; остальные запросы пока отклоняются
+"""
+
+from typing import Any
+
+from app.core.config import settings
+from app.core.exceptions import YookassaCircuitOpen
+from app.core.logger import logger
+from app.core.redis_client import redis_client
+
+# KEYS: state, open_timer, probe; ARGV: probe_ttl_ms
+# Возвращает 0 - запрос разрешен, иначе - через сколько миллисекунд повторить
+_BEFORE_CALL_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= 'open' then
+    return 0
+end
+local open_ttl = redis.call('PTTL', KEYS[2])
+if open_ttl > 0 then
+    return open_ttl
+end
+if redis.call('SET', KEYS[3], '1', 'NX', 'PX', ARGV[1]) then
+    return 0
+end
+return math.max(redis.call('PTTL', KEYS[3]), 1)
+"""
+
+# KEYS: failures, state, open_timer, probe; ARGV: threshold, window_ms, open_ms
+# Возвращает 1, если цепь разомкнута этим вызовом
+_RECORD_FAILURE_SCRIPT = """
+if redis.call('GET', KEYS[2]) == 'open' then
+    if redis.call('PTTL', KEYS[3]) > 0 then
+        return 0
+    end
+    redis.call('SET', KEYS[3], '1', 'PX', ARGV[3])
+    redis.call('DEL', KEYS[4])
+    return 1
+end
+local failures = redis.call('INCR', KEYS[1])
+if failures == 1 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+if failures >= tonumber(ARGV[1]) then
+    redis.call('SET', KEYS[2], 'open')
+    redis.call('SET', KEYS[3], '1', 'PX', ARGV[3])
+    redis.call('DEL', KEYS[1], KEYS[4])
+    return 1
+end
+return 0
+"""
+
+# KEYS: state, open_timer, probe, failures
+# Возвращает 1, если цепь замкнута этим вызовом (успешный пробный запрос)
+_RECORD_SUCCESS_SCRIPT = """
+if redis.call('GET', KEYS[1]) == 'open' and redis.call('PTTL', KEYS[2]) <= 0 then
+    redis.call('DEL', KEYS[1], KEYS[3], KEYS[4])
+    return 1
+end
+return 0
+"""
+
+
+class YookassaCircuitBreaker:
+    """Распределенный circuit breaker (closed/open/half-open) для запросов к API Юкассы"""
+
+    REDIS_KEY_PREFIX = "yookassa:circuit"
+
+    def __init__(self):
+        self._scripts: dict[str, Any] = {}
+
+    def _key(self, name: str) -> str:
+        """Получить ключ Redis состояния цепи"""
+        return f"{self.REDIS_KEY_PREFIX}:{name}"
+
+    def _run(self, script: str, keys: list[str], args: list) -> int:
+        """Выполнить Lua-скрипт (регистрируется один раз на процесс)"""
+        if script not in self._scripts:
+            self._scripts[script] = redis_client.client.register_script(script)
+        return int(self._scripts[script](keys=keys, args=args))
+
+    def before_call(self) -> None:
+        """
+        Проверить, можно ли выполнить запрос к API.
+        При недоступности Redis запрос разрешается.
+
+        Raises:
+            YookassaCircuitOpen: Цепь разомкнута (или пробный запрос уже выполняет другой процесс)
+        """
+        probe_ttl_ms = int((settings.YOOKASSA_HTTP_CONNECT_TIMEOUT + settings.YOOKASSA_HTTP_READ_TIMEOUT) * 1000)
+        try:
+            wait_ms = self._run(
+                _BEFORE_CALL_SCRIPT, [self._key("state"), self._key("open"), self._key("probe")], [probe_ttl_ms]
+            )
+        except Exception as e:
+            logger.warning(f"YooKassa circuit breaker unavailable, request allowed: {e}")
+            return
+        if wait_ms:
+            raise YookassaCircuitOpen(wait_ms / 1000)
+
+    def record_failure(self) -> None:
+        """Учесть ошибку API (5xx или сетевая ошибка)"""
+        try:
+            opened = self._run(
+                _RECORD_FAILURE_SCRIPT,
+                [self._key("failures"), self._key("state"), self._key("open"), self._key("probe")],
+                [
+                    settings.YOOKASSA_CIRCUIT_FAILURE_THRESHOLD,
+                    int(settings.YOOKASSA_CIRCUIT_FAILURE_WINDOW_SECONDS * 1000),
+                    int(settings.YOOKASSA_CIRCUIT_OPEN_SECONDS * 1000),
+                ],
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record YooKassa failure in circuit breaker: {e}")
+            return
+        if opened:
+            logger.warning(f"YooKassa circuit opened for {settings.YOOKASSA_CIRCUIT_OPEN_SECONDS}s")
+
+    def record_success(self) -> None:
+        """Учесть успешный ответ API (в half-open замыкает цепь)"""
+        try:
+            closed = self._run(
+                _RECORD_SUCCESS_SCRIPT,
+                [self._key("state"), self._key("open"), self._key("probe"), self._key("failures")],
+                [],
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record YooKassa success in circuit breaker: {e}")
+            return
+        if closed:
+            logger.info("YooKassa circuit closed after successful probe request")
+
+    def get_state(self) -> dict[str, Any]:
+        """
+        Получить текущее состояние цепи.
+
+        Returns:
+            Dict: state (closed/open/half_open), failures в текущем окне, retry_after (секунды, для open)
+        """
+        pipe = redis_client.client.pipeline()
+        pipe.get(self._key("state"))
+        pipe.pttl(self._key("open"))
+        pipe.get(self._key("failures"))
+        state, open_ttl, failures = pipe.execute()
+
+        if state != "open":
+            return {"state": "closed", "failures": int(failures or 0), "retry_after": 0.0}
+        if open_ttl > 0:
+            return {"state": "open", "failures": 0, "retry_after": open_ttl / 1000}
+        return {"state": "half_open", "failures": 0, "retry_after": 0.0}
+
+
+yookassa_circuit_breaker = YookassaCircuitBreaker()
@@ -0,0 +1,139 @@
+"""
+Общий лимит запросов к API Юкассы для всех процессов (FastAPI, Celery воркеры, запуски из админки).
+
+Token bucket в Redis (RedisTokenBucket): отдельный бакет на каждую группу операций (create/find/refund)
+и общий бакет лимита магазина. Токен списывается атомарно - из всех бакетов сразу или ни из одного.
+Ответ 429 с Retry-After блокирует все запросы до указанного времени (ключ `yookassa:ratelimit:blocked`).
+"""
+
+import asyncio
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from app.core.config import settings
+from app.core.exceptions import YookassaRateLimitExceeded
+from app.core.logger import logger
+from app.core.redis_token_bucket import RedisTokenBucket
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """
+    Разобрать заголовок Retry-After (число секунд или HTTP-дата).
+
+    Returns:
+        Секунды ожидания или None, если заголовок отсутствует/некорректен
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class YookassaRateLimiter:
+    """Распределенный token bucket для запросов к API Юкассы"""
+
+    REDIS_KEY_PREFIX = "yookassa:ratelimit"
+
+    # Группы операций с отдельными бюджетами
+    CREATE = "create"
+    FIND = "find"
+    REFUND = "refund"
+
+    def __init__(self):
+        self._bucket = RedisTokenBucket(f"{self.REDIS_KEY_PREFIX}:blocked")
+
+    def _get_buckets(self, operation: str) -> list[tuple[str, float]]:
+        """Бакеты операции: (ключ, запросов в секунду); бакеты с нулевым лимитом не учитываются"""
+        rates = {
+            self.CREATE: settings.YOOKASSA_RATE_LIMIT_CREATE_RPS,
+            self.FIND: settings.YOOKASSA_RATE_LIMIT_FIND_RPS,
+            self.REFUND: settings.YOOKASSA_RATE_LIMIT_REFUND_RPS,
+        }
+        return [
+            (f"{self.REDIS_KEY_PREFIX}:{operation}", rates[operation]),
+            (f"{self.REDIS_KEY_PREFIX}:total", settings.YOOKASSA_RATE_LIMIT_TOTAL_RPS),
+        ]
+
+    def try_acquire(self, operation: str) -> float:
+        """
+        Попытаться получить токен для запроса.
+
+        При недоступности Redis запрос разрешается (лимит не должен останавливать платежи).
+
+        Args:
+            operation: Группа операций (create/find/refund)
+
+        Returns:
+            0 - токен получен, иначе - сколько секунд ждать до следующей попытки
+        """
+        if not settings.YOOKASSA_RATE_LIMIT_ENABLED:
+            return 0.0
+
+        try:
+            return self._bucket.try_acquire(self._get_buckets(operation), settings.YOOKASSA_RATE_LIMIT_BURST_SECONDS)
+        except Exception as e:
+            logger.warning(f"YooKassa rate limiter unavailable, request allowed: {e}")
+            return 0.0
+
+    def acquire(self, operation: str) -> None:
+        """
+        Получить токен для запроса (sync, для Celery).
+
+        Короткое ожидание обычного лимита (суммарно не дольше YOOKASSA_RATE_LIMIT_SYNC_MAX_WAIT_SECONDS)
+        выполняется в воркере: иначе каждый пустой бакет откладывал бы задачу и расходовал
+        YOOKASSA_CIRCUIT_MAX_DEFERRALS. Долгое ожидание (Retry-After после 429, перегрузка) не блокирует
+        воркер - задача откладывается через self.retry(countdown=...).
+
+        Raises:
+            YookassaRateLimitExceeded: Ожидание превысило бы лимит, retry_after - когда токен появится
+        """
+        waited = 0.0
+        while True:
+            wait = self.try_acquire(operation)
+            if not wait:
+                return
+            if waited + wait > settings.YOOKASSA_RATE_LIMIT_SYNC_MAX_WAIT_SECONDS:
+                raise YookassaRateLimitExceeded(operation, wait)
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, operation: str) -> None:
+        """
+        Дождаться токена для запроса без блокировки event loop (для FastAPI).
+        Скрипт token bucket выполняется синхронным клиентом Redis в потоке (asyncio.to_thread).
+
+        Raises:
+            YookassaRateLimitExceeded: Ожидание превысило YOOKASSA_RATE_LIMIT_MAX_WAIT_SECONDS
+        """
+        waited = 0.0
+        while True:
+            wait = await asyncio.to_thread(self.try_acquire, operation)
+            if not wait:
+                return
+            if waited + wait > settings.YOOKASSA_RATE_LIMIT_MAX_WAIT_SECONDS:
+                raise YookassaRateLimitExceeded(operation, wait)
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def block_for(self, seconds: float) -> None:
+        """
+        Остановить все запросы к Юкассе на указанное время (ответ 429 с Retry-After).
+        Более ранняя блокировка не сокращает уже установленную.
+        """
+        if not settings.YOOKASSA_RATE_LIMIT_ENABLED or seconds <= 0:
+            return
+        try:
+            self._bucket.block_for(seconds)
+            logger.warning(f"YooKassa returned 429, requests paused for {seconds:.2f}s")
+        except Exception as e:
+            logger.warning(f"Failed to store YooKassa Retry-After in Redis: {e}")
+
+
+yookassa_rate_limiter = YookassaRateLimiter()
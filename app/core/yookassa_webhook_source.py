@@ -0,0 +1,42 @@
+"""
+Проверка источника webhook-а Юкассы по IP-адресу.
+
+Юкасса отправляет уведомления только с опубликованных адресов
+(https://yookassa.ru/developers/using-api/webhooks#ip), список - YOOKASSA_WEBHOOK_TRUSTED_NETWORKS.
+Тело webhook-а с такого адреса считается данными Юкассы и может заполнять кэш платежей.
+Адрес берется из request.client: за прокси uvicorn должен запускаться с --proxy-headers
+и --forwarded-allow-ips, иначе это адрес прокси и webhook-и не считаются доверенными.
+"""
+
+import ipaddress
+from functools import lru_cache
+from typing import Optional, Union
+
+from app.core.config import settings
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+@lru_cache(maxsize=1)
+def _get_trusted_networks() -> tuple[IPNetwork, ...]:
+    """Сети Юкассы из настроек (разбираются один раз)"""
+    return tuple(ipaddress.ip_network(network, strict=False) for network in settings.YOOKASSA_WEBHOOK_TRUSTED_NETWORKS)
+
+
+def is_yookassa_webhook_source(host: Optional[str]) -> bool:
+    """
+    Пришел ли запрос с адреса Юкассы.
+
+    Args:
+        host: IP-адрес клиента (request.client.host)
+
+    Returns:
+        True - адрес входит в YOOKASSA_WEBHOOK_TRUSTED_NETWORKS
+    """
+    if not host:
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _get_trusted_networks())
@@ -41,6 +41,15 @@ class BaseRepositorySync(Generic[T], ABC):
         result = self._session.execute(stmt)
         return result.scalars().first()
 
+    def get_by_ids(self, ids: Sequence[int]) -> Sequence[T]:
+        """Get many by primary keys (one IN query)"""
+        if not ids:
+            return []
+
+        stmt = select(self._model).where(self._model.id.in_(set(ids)))
+        result = self._session.execute(stmt)
+        return result.scalars().all()
+
     def get_by(self, **kwargs: Any) -> Optional[T]:
         """Get single entity by filters"""
         stmt = select(self._model).filter_by(**kwargs)
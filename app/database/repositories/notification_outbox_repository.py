@@ -0,0 +1,67 @@
+# repository/notification_outbox.py
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.enums import NotificationOutboxStatus
+from app.core.exceptions import NotificationOutboxEntryNotFound
+from app.database.base_repository import BaseRepository
+from app.models import NotificationOutboxEntry
+
+
+class NotificationOutboxRepository(BaseRepository[NotificationOutboxEntry]):
+    """Repository для записи уведомлений в outbox (отправляет их Celery задача dispatch_notification_outbox)"""
+
+    def __init__(self, session: AsyncSession) -> None:
+        super().__init__(session)
+        # Сколько уведомлений (из них приоритетных) записано в текущей транзакции - после коммита UoW запускает отправку
+        self.added_count = 0
+        self.priority_count = 0
+
+    def _get_model(self) -> type[NotificationOutboxEntry]:
+        return NotificationOutboxEntry
+
+    def _get_not_found_exception(self, id_):
+        return NotificationOutboxEntryNotFound(id_)
+
+    async def add(
+        self,
+        user_id: int,
+        message: str,
+        notification_type: str = "info",
+        priority: bool = False,
+    ) -> NotificationOutboxEntry:
+        """
+        Записать уведомление в outbox в текущей транзакции.
+        Уведомление будет отправлено только после коммита транзакции.
+
+        Обычное уведомление ждет NOTIFICATION_COALESCE_WINDOW_SECONDS: уведомления пользователя,
+        записанные за это время, отправляются одним сообщением. Приоритетное отправляется сразу.
+
+        Args:
+            user_id: ID пользователя
+            message: Текст сообщения
+            notification_type: Тип уведомления (для логирования)
+            priority: Отправить без ожидания окна объединения
+        """
+        next_attempt_at = datetime.now(timezone.utc)
+        if not priority:
+            next_attempt_at += timedelta(seconds=settings.NOTIFICATION_COALESCE_WINDOW_SECONDS)
+        entry = NotificationOutboxEntry(
+            user_id=user_id,
+            message=message,
+            notification_type=notification_type,
+            status=NotificationOutboxStatus.pending.value,
+            attempts=0,
+            next_attempt_at=next_attempt_at,
+        )
+        self._session.add(entry)
+        self.added_count += 1
+        self.priority_count += int(priority)
+        return entry
+
+    def reset_added(self) -> None:
+        """Сбросить счетчики записанных уведомлений (после коммита или отката)"""
+        self.added_count = 0
+        self.priority_count = 0
@@ -0,0 +1,184 @@
+# repository/notification_outbox_sync.py
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.enums import NotificationOutboxStatus
+from app.core.exceptions import NotificationOutboxEntryNotFound
+from app.database.base_repository_sync import BaseRepositorySync
+from app.models import NotificationOutboxEntry, User
+
+
+class NotificationOutboxRepositorySync(BaseRepositorySync[NotificationOutboxEntry]):
+    """Синхронный Repository для outbox уведомлений (для Celery)"""
+
+    def __init__(self, session: Session) -> None:
+        super().__init__(session)
+        # Сколько уведомлений (из них приоритетных) записано в текущей транзакции - после коммита UoW запускает отправку
+        self.added_count = 0
+        self.priority_count = 0
+
+    def _get_model(self) -> type[NotificationOutboxEntry]:
+        return NotificationOutboxEntry
+
+    def _get_not_found_exception(self, id_):
+        return NotificationOutboxEntryNotFound(id_)
+
+    def add(
+        self,
+        user_id: int,
+        message: str,
+        notification_type: str = "info",
+        priority: bool = False,
+    ) -> NotificationOutboxEntry:
+        """
+        Записать уведомление в outbox в текущей транзакции.
+        Уведомление будет отправлено только после коммита транзакции.
+
+        Обычное уведомление ждет NOTIFICATION_COALESCE_WINDOW_SECONDS: уведомления пользователя,
+        записанные за это время, отправляются одним сообщением. Приоритетное отправляется сразу
+        (вместе с уже ожидающими уведомлениями этого пользователя).
+
+        Args:
+            user_id: ID пользователя
+            message: Текст сообщения
+            notification_type: Тип уведомления (для логирования)
+            priority: Отправить без ожидания окна объединения
+        """
+        next_attempt_at = datetime.now(timezone.utc)
+        if not priority:
+            next_attempt_at += timedelta(seconds=settings.NOTIFICATION_COALESCE_WINDOW_SECONDS)
+        entry = NotificationOutboxEntry(
+            user_id=user_id,
+            message=message,
+            notification_type=notification_type,
+            status=NotificationOutboxStatus.pending.value,
+            attempts=0,
+            next_attempt_at=next_attempt_at,
+        )
+        self._session.add(entry)
+        self.added_count += 1
+        self.priority_count += int(priority)
+        return entry
+
+    def reset_added(self) -> None:
+        """Сбросить счетчики записанных уведомлений (после коммита или отката)"""
+        self.added_count = 0
+        self.priority_count = 0
+
+    def claim_pending(self, limit: int, lease_seconds: int) -> list[tuple[int, int, Optional[int], str]]:
+        """
+        Захватить уведомления, ожидающие отправки (next_attempt_at <= now).
+        SELECT ... ORDER BY next_attempt_at LIMIT ... FOR UPDATE SKIP LOCKED.
+
+        Вместе с ними захватываются еще не отправлявшиеся уведомления тех же пользователей,
+        окно объединения которых не истекло: все они уходят одним сообщением.
+
+        next_attempt_at захваченных записей сдвигается на lease_seconds вперед: после коммита
+        они не захватываются другими диспетчерами, а если отправка так и не завершится
+        (падение воркера), запись будет захвачена снова после истечения аренды.
+
+        Args:
+            limit: Максимальное количество наступивших уведомлений
+            lease_seconds: Время аренды в секундах
+
+        Returns:
+            Список (id, user_id, telegram_id, текст сообщения) в порядке создания;
+            telegram_id берется у пользователя в момент захвата (после /users/transfer - новый)
+        """
+        now = datetime.now(timezone.utc)
+        pending = NotificationOutboxEntry.status == NotificationOutboxStatus.pending.value
+        due_rows = self._session.execute(
+            select(NotificationOutboxEntry.id, NotificationOutboxEntry.user_id)
+            .where(pending, NotificationOutboxEntry.next_attempt_at <= now)
+            .order_by(NotificationOutboxEntry.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not due_rows:
+            return []
+
+        # attempts == 0: записи, захваченные другим диспетчером (аренда) или ждущие повтора, не берем
+        due_ids = [row.id for row in due_rows]
+        coalesced_ids = self._session.scalars(
+            select(NotificationOutboxEntry.id)
+            .where(
+                pending,
+                NotificationOutboxEntry.attempts == 0,
+                NotificationOutboxEntry.user_id.in_({row.user_id for row in due_rows}),
+                NotificationOutboxEntry.id.not_in(due_ids),
+            )
+            .with_for_update(skip_locked=True)
+        ).all()
+        entry_ids = due_ids + list(coalesced_ids)
+
+        self._session.execute(
+            update(NotificationOutboxEntry)
+            .where(NotificationOutboxEntry.id.in_(entry_ids))
+            .values(
+                attempts=NotificationOutboxEntry.attempts + 1,
+                next_attempt_at=now + timedelta(seconds=lease_seconds),
+            )
+        )
+
+        rows = self._session.execute(
+            select(
+                NotificationOutboxEntry.id,
+                NotificationOutboxEntry.user_id,
+                User.telegram_id,
+                NotificationOutboxEntry.message,
+            )
+            .join(User, User.id == NotificationOutboxEntry.user_id)
+            .where(NotificationOutboxEntry.id.in_(entry_ids))
+            .order_by(NotificationOutboxEntry.id)
+        ).all()
+        return [(row.id, row.user_id, row.telegram_id, row.message) for row in rows]
+
+    def delete_sent(self, entry_ids: Sequence[int]) -> int:
+        """
+        Удалить отправленные уведомления одним DELETE.
+
+        Returns:
+            Количество удаленных записей
+        """
+        if not entry_ids:
+            return 0
+        result = self._session.execute(
+            delete(NotificationOutboxEntry).where(NotificationOutboxEntry.id.in_(list(entry_ids)))
+        )
+        return result.rowcount
+
+    def reschedule_failed(self, entry_ids: Sequence[int], retry_delay_seconds: int, max_attempts: int) -> int:
+        """
+        Запланировать повтор неудачных отправок.
+        Записи, исчерпавшие max_attempts попыток, переводятся в failed и больше не отправляются.
+
+        Args:
+            entry_ids: ID записей с неудачной отправкой
+            retry_delay_seconds: Через сколько секунд повторить отправку
+            max_attempts: Максимальное количество попыток
+
+        Returns:
+            Количество записей, переведенных в failed
+        """
+        if not entry_ids:
+            return 0
+        entry_ids = list(entry_ids)
+        exhausted = self._session.execute(
+            update(NotificationOutboxEntry)
+            .where(NotificationOutboxEntry.id.in_(entry_ids), NotificationOutboxEntry.attempts >= max_attempts)
+            .values(status=NotificationOutboxStatus.failed.value)
+        )
+        self._session.execute(
+            update(NotificationOutboxEntry)
+            .where(
+                NotificationOutboxEntry.id.in_(entry_ids),
+                NotificationOutboxEntry.status == NotificationOutboxStatus.pending.value,
+            )
+            .values(next_attempt_at=datetime.now(timezone.utc) + timedelta(seconds=retry_delay_seconds))
+        )
+        return exhausted.rowcount
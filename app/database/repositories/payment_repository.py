@@ -7,7 +7,7 @@ from uuid import uuid4
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.clients.yookassa_client import YookassaClient
+from app.core.clients.async_yookassa_client import AsyncYookassaClient
 from app.core.exceptions import PaymentNotFound
 from app.database.base_repository import BaseRepository
 from app.models import Payment
@@ -16,7 +16,7 @@ from app.models import Payment
 class PaymentRepository(BaseRepository[Payment]):
     """Repository для управления платежами"""
 
-    def __init__(self, session: AsyncSession, yookassa_client: YookassaClient):
+    def __init__(self, session: AsyncSession, yookassa_client: AsyncYookassaClient):
         super().__init__(session)
         self.yookassa_client = yookassa_client
 
@@ -3,7 +3,8 @@ from collections.abc import Sequence
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from app.core.clients.yookassa_client import YookassaClient
@@ -48,11 +49,126 @@ class PaymentRepositorySync(BaseRepositorySync[Payment]):
         """Создать платеж"""
         return self.create(payment)
 
+    def create_payment_if_absent(self, payment: Payment) -> tuple[Payment, bool]:
+        """
+        Атомарно создать платеж или получить существующий с тем же idempotency_key.
+        INSERT ... ON CONFLICT (idempotency_key) DO NOTHING RETURNING.
+
+        При гонке двух воркеров второй получает уже созданный платеж без IntegrityError
+        и без отката транзакции.
+
+        Args:
+            payment: Новый (не добавленный в сессию) платеж
+
+        Returns:
+            (платеж, True) если платеж создан, (существующий платеж, False) если ключ уже занят
+        """
+        values = {
+            column.key: getattr(payment, column.key)
+            for column in Payment.__table__.columns
+            if getattr(payment, column.key) is not None
+        }
+        stmt = (
+            pg_insert(Payment)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=[Payment.idempotency_key])
+            .returning(Payment)
+        )
+        created_payment = self._session.scalars(stmt).first()
+        if created_payment is not None:
+            return created_payment, True
+
+        existing_payment = self.get_payment_by_idempotency_key(payment.idempotency_key)
+        if existing_payment is None:
+            raise PaymentNotFound(payment.idempotency_key)
+        return existing_payment, False
+
     def update_payment(self, payment: Payment) -> Payment:
         """Обновить платеж"""
         payment.updated_at = datetime.utcnow()
         return self.update(payment)
 
+    def claim_due_retries(self, limit: int, lease_seconds: int) -> list[tuple[int, int]]:
+        """
+        Захватить платежи, у которых наступило время следующей попытки (next_retry_at <= now).
+        SELECT ... ORDER BY next_retry_at LIMIT ... FOR UPDATE SKIP LOCKED.
+
+        next_retry_at захваченных платежей сдвигается на lease_seconds вперед: после коммита
+        они не захватываются повторно, а если попытка так и не выполнится (падение воркера),
+        платеж будет захвачен снова после истечения аренды.
+
+        Args:
+            limit: Максимальное количество платежей
+            lease_seconds: Время аренды в секундах
+
+        Returns:
+            Список (payment_id, attempt_number) в порядке next_retry_at
+        """
+        now = datetime.now(timezone.utc)
+        stmt = (
+            select(Payment.id, Payment.attempt_number)
+            .where(Payment.next_retry_at <= now)
+            .order_by(Payment.next_retry_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        rows = self._session.execute(stmt).all()
+        if not rows:
+            return []
+
+        payment_ids = [row.id for row in rows]
+        self._session.execute(
+            update(Payment)
+            .where(Payment.id.in_(payment_ids))
+            .values(next_retry_at=now + timedelta(seconds=lease_seconds))
+        )
+        return [(row.id, row.attempt_number or 1) for row in rows]
+
+    def get_unsettled_payments_created_between(
+        self, created_from: datetime, created_to: datetime, statuses: Sequence[str]
+    ) -> dict[str, tuple[int, str]]:
+        """
+        Получить платежи в незавершенных статусах, созданные в интервале [created_from, created_to).
+        Выбираются только нужные для сверки колонки, без загрузки моделей.
+
+        Args:
+            created_from: Начало интервала
+            created_to: Конец интервала
+            statuses: Незавершенные статусы (pending, waiting_for_capture)
+
+        Returns:
+            Dict {yookassa_payment_id: (payment_id, status)}
+        """
+        stmt = select(Payment.yookassa_payment_id, Payment.id, Payment.status).where(
+            Payment.created_at >= created_from,
+            Payment.created_at < created_to,
+            Payment.status.in_(statuses),
+        )
+        return {row.yookassa_payment_id: (row.id, row.status) for row in self._session.execute(stmt)}
+
+    def bulk_update_status(self, payment_ids: Sequence[int], status: str, from_statuses: Sequence[str]) -> int:
+        """
+        Обновить статус пачки платежей одним UPDATE.
+        Платежи, статус которых уже изменился (например, webhook-ом), не перезаписываются.
+
+        Args:
+            payment_ids: ID платежей
+            status: Новый статус
+            from_statuses: Статусы, из которых разрешен переход
+
+        Returns:
+            Количество обновленных платежей
+        """
+        if not payment_ids:
+            return 0
+
+        result = self._session.execute(
+            update(Payment)
+            .where(Payment.id.in_(payment_ids), Payment.status.in_(from_statuses))
+            .values(status=status, updated_at=datetime.now(timezone.utc))
+        )
+        return result.rowcount
+
     def get_failed_payments_for_retry(self) -> Sequence[Payment]:
         """
         Получить неудачные платежи, которые можно повторить.
@@ -179,3 +295,15 @@ class PaymentRepositorySync(BaseRepositorySync[Payment]):
         Используется для проверки, не был ли уже создан платеж с таким ключом.
         """
         return self.get_by(idempotency_key=idempotency_key)
+
+    def get_payments_by_idempotency_keys(self, idempotency_keys: Sequence[str]) -> Sequence[Payment]:
+        """
+        Получить платежи по списку idempotency_key одним запросом.
+        Используется при пакетной обработке автоплатежей.
+        """
+        if not idempotency_keys:
+            return []
+
+        stmt = select(Payment).where(Payment.idempotency_key.in_(set(idempotency_keys)))
+        result = self._session.execute(stmt)
+        return result.scalars().all()
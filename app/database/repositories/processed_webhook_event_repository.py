@@ -0,0 +1,83 @@
+# repository/processed_webhook_event.py
+import asyncio
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.exceptions import ProcessedWebhookEventNotFound
+from app.core.logger import logger
+from app.core.webhook_deduplicator import webhook_deduplicator
+from app.database.base_repository import BaseRepository
+from app.models import ProcessedWebhookEvent
+
+
+class ProcessedWebhookEventRepository(BaseRepository[ProcessedWebhookEvent]):
+    """Repository для дедупликации webhook-ов Юкассы: захват события в Redis, при недоступности Redis - в БД"""
+
+    def __init__(self, session: AsyncSession) -> None:
+        super().__init__(session)
+        # События, захваченные в Redis в текущей транзакции - после коммита UoW запоминает их, после отката освобождает
+        self.claimed_keys: list[tuple[str, str, str]] = []
+
+    def _get_model(self) -> type[ProcessedWebhookEvent]:
+        return ProcessedWebhookEvent
+
+    def _get_not_found_exception(self, id_):
+        return ProcessedWebhookEventNotFound(id_)
+
+    async def claim(self, event_key: tuple[str, str, str]) -> bool:
+        """
+        Захватить событие webhook-а для обработки в текущей транзакции.
+        Сначала через Redis (SET NX, в потоке - без блокировки event loop) без обращения к БД,
+        при недоступности Redis - вставкой в processed_webhook_events (запись фиксируется или откатывается
+        вместе с транзакцией).
+
+        Args:
+            event_key: Ключ события (object.id, event, status)
+
+        Returns:
+            True - событие новое, False - повтор, обрабатывать не нужно
+        """
+        db_fallback = 0
+        try:
+            claimed = await asyncio.to_thread(webhook_deduplicator.claim, event_key)
+            if claimed:
+                self.claimed_keys.append(event_key)
+        except Exception as e:
+            logger.warning(f"Webhook dedup in Redis unavailable, using DB: {e}")
+            claimed = await self._claim_in_db(event_key)
+            db_fallback = 1
+
+        await asyncio.to_thread(
+            webhook_deduplicator.record, claimed=int(claimed), suppressed=int(not claimed), db_fallback=db_fallback
+        )
+        return claimed
+
+    async def _claim_in_db(self, event_key: tuple[str, str, str]) -> bool:
+        """Вставить событие в processed_webhook_events, если его там еще нет"""
+        object_id, event, status = event_key
+        stmt = (
+            pg_insert(ProcessedWebhookEvent)
+            .values(object_id=object_id, event=event, status=status)
+            .on_conflict_do_nothing(constraint="uq_processed_webhook_events_key")
+            .returning(ProcessedWebhookEvent.id)
+        )
+        result = await self._session.execute(stmt)
+        return result.scalar_one_or_none() is not None
+
+    async def refresh_claimed(self) -> None:
+        """Продлить захват событий, которые еще обрабатываются в текущей транзакции"""
+        if self.claimed_keys:
+            await asyncio.to_thread(webhook_deduplicator.refresh, list(self.claimed_keys))
+
+    async def confirm_claimed(self) -> None:
+        """Запомнить захваченные события как обработанные (после коммита)"""
+        claimed_keys, self.claimed_keys = self.claimed_keys, []
+        if claimed_keys:
+            await asyncio.to_thread(webhook_deduplicator.confirm, claimed_keys)
+
+    async def release_claimed(self) -> None:
+        """Освободить захваченные события (после отката) - повтор события будет обработан"""
+        claimed_keys, self.claimed_keys = self.claimed_keys, []
+        if claimed_keys:
+            await asyncio.to_thread(webhook_deduplicator.release, claimed_keys)
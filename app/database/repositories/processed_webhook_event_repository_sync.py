@@ -0,0 +1,37 @@
+# repository/processed_webhook_event_sync.py
+from datetime import datetime
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.core.exceptions import ProcessedWebhookEventNotFound
+from app.database.base_repository_sync import BaseRepositorySync
+from app.models import ProcessedWebhookEvent
+
+
+class ProcessedWebhookEventRepositorySync(BaseRepositorySync[ProcessedWebhookEvent]):
+    """Синхронный Repository для резервной таблицы дедупликации webhook-ов (для Celery)"""
+
+    def __init__(self, session: Session) -> None:
+        super().__init__(session)
+
+    def _get_model(self) -> type[ProcessedWebhookEvent]:
+        return ProcessedWebhookEvent
+
+    def _get_not_found_exception(self, id_):
+        return ProcessedWebhookEventNotFound(id_)
+
+    def delete_created_before(self, created_before: datetime) -> int:
+        """
+        Удалить события, записанные раньше указанного времени (повторов Юкассы для них уже не будет).
+
+        Args:
+            created_before: Граница времени записи
+
+        Returns:
+            Количество удаленных записей
+        """
+        result = self._session.execute(
+            delete(ProcessedWebhookEvent).where(ProcessedWebhookEvent.created_at < created_before)
+        )
+        return result.rowcount or 0
@@ -1,13 +1,13 @@
-from collections.abc import Sequence
+from collections.abc import AsyncIterator, Sequence
 from datetime import datetime, timedelta, timezone
 from typing import Any, Optional
 
-from sqlalchemy import Row, RowMapping, and_, select
+from sqlalchemy import Row, RowMapping, and_, func, select
 
 from app.core.enums import SubscriptionStatus
 from app.core.exceptions import SubscriptionNotFound
 from app.database.base_repository import BaseRepository
-from app.models import Subscription
+from app.models import RenewalCalendarEntry, Subscription, SubscriptionPlan, User
 
 
 class SubscriptionRepository(BaseRepository[Subscription]):
@@ -225,37 +225,113 @@ class SubscriptionRepository(BaseRepository[Subscription]):
         )
 
     async def get_subscriptions_ending_today(self) -> Sequence[Subscription]:
-        """Получить все активные подписки, которые заканчиваются сегодня"""
-        today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today_start + timedelta(days=1)
+        """Получить все активные подписки, которые заканчиваются сегодня (по календарю продлений)"""
+        today = datetime.now(timezone.utc).date()
 
-        stmt = select(Subscription).where(
-            and_(
-                Subscription.status == SubscriptionStatus.active.value,
-                Subscription.end_date >= today_start,
-                Subscription.end_date < today_end,
+        stmt = (
+            select(Subscription)
+            .join(RenewalCalendarEntry, RenewalCalendarEntry.subscription_id == Subscription.id)
+            .where(
+                and_(
+                    RenewalCalendarEntry.due_date == today,
+                    Subscription.status == SubscriptionStatus.active.value,
+                )
             )
         )
         result = await self._session.execute(stmt)
         return result.scalars().all()
 
     async def get_subscriptions_ending_tomorrow(self) -> Sequence[Subscription]:
-        """Получить все активные подписки, которые заканчиваются завтра"""
-        tomorrow_start = (datetime.now(timezone.utc) + timedelta(days=1)).replace(
-            hour=0, minute=0, second=0, microsecond=0
-        )
-        tomorrow_end = tomorrow_start + timedelta(days=1)
+        """Получить все активные подписки, которые заканчиваются завтра (по календарю продлений)"""
+        tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).date()
 
-        stmt = select(Subscription).where(
-            and_(
-                Subscription.status == SubscriptionStatus.active.value,
-                Subscription.end_date >= tomorrow_start,
-                Subscription.end_date < tomorrow_end,
+        stmt = (
+            select(Subscription)
+            .join(RenewalCalendarEntry, RenewalCalendarEntry.subscription_id == Subscription.id)
+            .where(
+                and_(
+                    RenewalCalendarEntry.due_date == tomorrow,
+                    Subscription.status == SubscriptionStatus.active.value,
+                )
             )
         )
         result = await self._session.execute(stmt)
         return result.scalars().all()
 
+    async def get_renewal_forecast(self, days: int) -> list[dict[str, Any]]:
+        """
+        Получить прогноз продлений на ближайшие N дней по календарю продлений.
+
+        Args:
+            days: Количество дней, начиная с сегодняшнего
+
+        Returns:
+            Список {date, count, with_saved_method, amount} по дням, в которых есть продления
+        """
+        today = datetime.now(timezone.utc).date()
+
+        stmt = (
+            select(
+                RenewalCalendarEntry.due_date,
+                func.count(RenewalCalendarEntry.subscription_id).label("count"),
+                func.count(User.saved_payment_method_id).label("with_saved_method"),
+                func.coalesce(func.sum(SubscriptionPlan.price), 0).label("amount"),
+            )
+            .join(User, User.id == RenewalCalendarEntry.user_id)
+            .join(SubscriptionPlan, SubscriptionPlan.id == RenewalCalendarEntry.plan_id)
+            .where(
+                and_(
+                    RenewalCalendarEntry.due_date >= today,
+                    RenewalCalendarEntry.due_date < today + timedelta(days=days),
+                )
+            )
+            .group_by(RenewalCalendarEntry.due_date)
+            .order_by(RenewalCalendarEntry.due_date)
+        )
+        result = await self._session.execute(stmt)
+        return [
+            {
+                "date": row.due_date.isoformat(),
+                "count": row.count,
+                "with_saved_method": row.with_saved_method,
+                "amount": float(row.amount),
+            }
+            for row in result.all()
+        ]
+
+    async def iter_reminder_rows_ending_tomorrow(self, chunk_size: int = 1000) -> AsyncIterator[Sequence[Row]]:
+        """
+        Потоково получить данные для напоминаний по подпискам, которые заканчиваются завтра.
+
+        Один запрос по завтрашнему бакету календаря продлений с JOIN пользователей и планов,
+        только нужные колонки: subscription_id, telegram_id, price, has_saved_method.
+        Строки читаются серверным курсором (stream + yield_per) и отдаются пачками по chunk_size.
+
+        Args:
+            chunk_size: Размер пачки
+
+        Yields:
+            Пачки строк (subscription_id, telegram_id, price, has_saved_method)
+        """
+        tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).date()
+
+        stmt = (
+            select(
+                RenewalCalendarEntry.subscription_id,
+                User.telegram_id,
+                SubscriptionPlan.price,
+                User.saved_payment_method_id.isnot(None).label("has_saved_method"),
+            )
+            .join(User, User.id == RenewalCalendarEntry.user_id)
+            .join(SubscriptionPlan, SubscriptionPlan.id == RenewalCalendarEntry.plan_id)
+            .where(RenewalCalendarEntry.due_date == tomorrow)
+            .order_by(RenewalCalendarEntry.subscription_id)
+            .execution_options(yield_per=chunk_size)
+        )
+        result = await self._session.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+
     async def get_last_successful_payment_subscription(self, subscription_id: int) -> Optional[Subscription]:
         """Получить последнюю успешную подписку для определения условий продления"""
         # Получаем все подписки пользователя, отсортированные по дате создания
@@ -1,13 +1,14 @@
-from collections.abc import Sequence
-from datetime import datetime, timedelta, timezone
+from collections.abc import Iterator, Sequence
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional
 
-from sqlalchemy import and_, select
+from sqlalchemy import Row, and_, func, or_, select, update
+from sqlalchemy.exc import InvalidRequestError
 
 from app.core.enums import SubscriptionStatus
 from app.core.exceptions import SubscriptionNotFound
 from app.database.base_repository_sync import BaseRepositorySync
-from app.models import Subscription
+from app.models import RenewalCalendarEntry, Subscription, SubscriptionPlan, User
 
 
 class SubscriptionRepositorySync(BaseRepositorySync[Subscription]):
@@ -28,37 +29,102 @@ class SubscriptionRepositorySync(BaseRepositorySync[Subscription]):
         return self.get_by_id_or_raise(subscription_id)
 
     def get_subscriptions_ending_today(self) -> Sequence[Subscription]:
-        """Получить все активные подписки, которые заканчиваются сегодня (SYNC)"""
-        today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-        today_end = today_start + timedelta(days=1)
+        """Получить все активные подписки, которые заканчиваются сегодня (SYNC, по календарю продлений)"""
+        today = datetime.now(timezone.utc).date()
 
-        stmt = select(Subscription).where(
-            and_(
-                Subscription.status == SubscriptionStatus.active.value,
-                Subscription.end_date >= today_start,
-                Subscription.end_date < today_end,
+        stmt = (
+            select(Subscription)
+            .join(RenewalCalendarEntry, RenewalCalendarEntry.subscription_id == Subscription.id)
+            .where(
+                and_(
+                    RenewalCalendarEntry.due_date == today,
+                    Subscription.status == SubscriptionStatus.active.value,
+                )
             )
         )
         result = self._session.execute(stmt)
         return result.scalars().all()
 
-    def get_subscriptions_ending_tomorrow(self) -> Sequence[Subscription]:
-        """Получить все активные подписки, которые заканчиваются завтра (SYNC)"""
-        tomorrow_start = (datetime.now(timezone.utc) + timedelta(days=1)).replace(
-            hour=0, minute=0, second=0, microsecond=0
+    def get_subscription_ids_ending_today(self, after_id: int = 0, limit: int = 500) -> list[int]:
+        """
+        Получить страницу ID активных подписок, которые заканчиваются сегодня (SYNC).
+
+        Читает только сегодняшний бакет календаря продлений (индекс due_date, subscription_id).
+        Keyset-пагинация по ID подписки: WHERE subscription_id > after_id ORDER BY subscription_id LIMIT limit.
+
+        Args:
+            after_id: ID последней подписки предыдущей страницы (0 - с начала)
+            limit: Размер страницы
+
+        Returns:
+            Список ID подписок по возрастанию
+        """
+        today = datetime.now(timezone.utc).date()
+
+        stmt = (
+            select(RenewalCalendarEntry.subscription_id)
+            .where(
+                and_(
+                    RenewalCalendarEntry.due_date == today,
+                    RenewalCalendarEntry.subscription_id > after_id,
+                )
+            )
+            .order_by(RenewalCalendarEntry.subscription_id)
+            .limit(limit)
         )
-        tomorrow_end = tomorrow_start + timedelta(days=1)
+        result = self._session.execute(stmt)
+        return list(result.scalars().all())
 
-        stmt = select(Subscription).where(
-            and_(
-                Subscription.status == SubscriptionStatus.active.value,
-                Subscription.end_date >= tomorrow_start,
-                Subscription.end_date < tomorrow_end,
+    def get_subscriptions_ending_tomorrow(self) -> Sequence[Subscription]:
+        """Получить все активные подписки, которые заканчиваются завтра (SYNC, по календарю продлений)"""
+        tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).date()
+
+        stmt = (
+            select(Subscription)
+            .join(RenewalCalendarEntry, RenewalCalendarEntry.subscription_id == Subscription.id)
+            .where(
+                and_(
+                    RenewalCalendarEntry.due_date == tomorrow,
+                    Subscription.status == SubscriptionStatus.active.value,
+                )
             )
         )
         result = self._session.execute(stmt)
         return result.scalars().all()
 
+    def iter_reminder_rows_ending_tomorrow(self, chunk_size: int = 1000) -> Iterator[Sequence[Row]]:
+        """
+        Потоково получить данные для напоминаний по подпискам, которые заканчиваются завтра (SYNC).
+
+        Один запрос по завтрашнему бакету календаря продлений с JOIN пользователей и планов,
+        только нужные колонки: subscription_id, telegram_id, price, has_saved_method.
+        Строки читаются серверным курсором (yield_per) и отдаются пачками по chunk_size,
+        поэтому память не растет с количеством подписок.
+
+        Args:
+            chunk_size: Размер пачки
+
+        Yields:
+            Пачки строк (subscription_id, telegram_id, price, has_saved_method)
+        """
+        tomorrow = (datetime.now(timezone.utc) + timedelta(days=1)).date()
+
+        stmt = (
+            select(
+                RenewalCalendarEntry.subscription_id,
+                User.telegram_id,
+                SubscriptionPlan.price,
+                User.saved_payment_method_id.isnot(None).label("has_saved_method"),
+            )
+            .join(User, User.id == RenewalCalendarEntry.user_id)
+            .join(SubscriptionPlan, SubscriptionPlan.id == RenewalCalendarEntry.plan_id)
+            .where(RenewalCalendarEntry.due_date == tomorrow)
+            .order_by(RenewalCalendarEntry.subscription_id)
+            .execution_options(yield_per=chunk_size)
+        )
+        result = self._session.execute(stmt)
+        yield from result.partitions()
+
     def get_for_payment_with_lock(self, subscription_id: int) -> Optional[Subscription]:
         """
         Получить подписку с блокировкой строки для безопасного платежа.
@@ -70,6 +136,105 @@ class SubscriptionRepositorySync(BaseRepositorySync[Subscription]):
         result = self._session.execute(stmt)
         return result.scalars().first()
 
+    def get_batch_for_payment(self, subscription_ids: Sequence[int]) -> Sequence[Subscription]:
+        """
+        Получить пачку подписок одним запросом без блокировки (решение принимается после lock_for_payment).
+        SELECT ... WHERE id IN (...) ORDER BY id.
+        """
+        if not subscription_ids:
+            return []
+
+        stmt = select(Subscription).where(Subscription.id.in_(set(subscription_ids))).order_by(Subscription.id)
+        result = self._session.execute(stmt)
+        return result.scalars().all()
+
+    def lock_for_payment(self, subscription: Subscription) -> bool:
+        """
+        Заблокировать строку уже загруженной подписки и перечитать ее.
+        SELECT ... FOR UPDATE - как get_for_payment_with_lock, но без повторной загрузки модели.
+
+        Returns:
+            True - строка заблокирована, False - подписка удалена
+        """
+        try:
+            self._session.refresh(subscription, with_for_update=True)
+            return True
+        except InvalidRequestError:
+            return False
+
+    def count_due_subscriptions(self) -> int:
+        """Посчитать подписки, ожидающие автоплатежа сегодня (еще не захваченные в режиме SKIP LOCKED)"""
+        today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        today_end = today_start + timedelta(days=1)
+
+        stmt = select(func.count(Subscription.id)).where(
+            and_(
+                Subscription.status == SubscriptionStatus.active.value,
+                Subscription.end_date >= today_start,
+                Subscription.end_date < today_end,
+                or_(
+                    Subscription.last_auto_payment_date.is_(None),
+                    Subscription.last_auto_payment_date < today_start.date(),
+                ),
+            )
+        )
+        result = self._session.execute(stmt)
+        return result.scalar() or 0
+
+    def claim_due_subscriptions(self, limit: int) -> Sequence[Subscription]:
+        """
+        Захватить следующие N подписок для автоплатежа сегодня.
+        SELECT ... FOR UPDATE SKIP LOCKED.
+
+        Строки, заблокированные другими воркерами, пропускаются, поэтому
+        параллельные воркеры не ждут друг друга и не берут одну подписку дважды.
+        Уже обработанные сегодня подписки (last_auto_payment_date = сегодня) не захватываются.
+        Блокировки держатся до коммита транзакции вызывающего кода.
+
+        Args:
+            limit: Максимальное количество подписок
+
+        Returns:
+            Sequence заблокированных подписок
+        """
+        today_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        today_end = today_start + timedelta(days=1)
+
+        stmt = (
+            select(Subscription)
+            .where(
+                and_(
+                    Subscription.status == SubscriptionStatus.active.value,
+                    Subscription.end_date >= today_start,
+                    Subscription.end_date < today_end,
+                    or_(
+                        Subscription.last_auto_payment_date.is_(None),
+                        Subscription.last_auto_payment_date < today_start.date(),
+                    ),
+                )
+            )
+            .order_by(Subscription.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = self._session.execute(stmt)
+        return result.scalars().all()
+
+    def mark_auto_payment_processed(self, subscription_ids: Sequence[int], processed_date: date) -> None:
+        """
+        Отметить подписки как обработанные автоплатежом за дату (одним UPDATE).
+        updated_at не изменяется - он используется для проверки применения промокода.
+        """
+        if not subscription_ids:
+            return
+
+        stmt = (
+            update(Subscription)
+            .where(Subscription.id.in_(set(subscription_ids)))
+            .values(last_auto_payment_date=processed_date, updated_at=Subscription.updated_at)
+        )
+        self._session.execute(stmt)
+
     def update_subscription(self, subscription: Subscription) -> Subscription:
         """Обновить подписку"""
         subscription.updated_at = datetime.now(timezone.utc)
@@ -92,6 +257,51 @@ class SubscriptionRepositorySync(BaseRepositorySync[Subscription]):
         # Подписка считается продленной, если end_date >= завтра
         return subscription.end_date >= tomorrow
 
+    def count_subscriptions_by_status(self, status: str) -> int:
+        """Посчитать подписки с указанным статусом (SYNC)"""
+        stmt = select(func.count(Subscription.id)).where(Subscription.status == status)
+        result = self._session.execute(stmt)
+        return result.scalar() or 0
+
+    def transition_status_chunk(self, from_status: str, to_status: str, limit: int) -> list[int]:
+        """
+        Перевести следующую пачку подписок из одного статуса в другой одним запросом.
+
+        UPDATE subscriptions SET status = :to_status, updated_at = now()
+        WHERE id IN (SELECT id ... WHERE status = :from_status ORDER BY id LIMIT :limit FOR UPDATE)
+        RETURNING id
+
+        Условие по статусу проверяется в самом UPDATE, поэтому подписки, статус которых
+        изменили вручную, не затрагиваются. Блокируются только строки текущей пачки.
+        Строки, заблокированные другой транзакцией (например, обработкой платежа), не пропускаются:
+        запрос дожидается ее завершения.
+
+        Args:
+            from_status: Текущий статус
+            to_status: Новый статус
+            limit: Размер пачки
+
+        Returns:
+            Список ID переведенных подписок
+        """
+        chunk = (
+            select(Subscription.id)
+            .where(Subscription.status == from_status)
+            .order_by(Subscription.id)
+            .limit(limit)
+            .with_for_update()
+            .scalar_subquery()
+        )
+        stmt = (
+            update(Subscription)
+            .where(and_(Subscription.id.in_(chunk), Subscription.status == from_status))
+            .values(status=to_status, updated_at=datetime.now(timezone.utc))
+            .returning(Subscription.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = self._session.execute(stmt)
+        return list(result.scalars().all())
+
     def get_subscriptions_by_status(self, status: str) -> Sequence[Subscription]:
         """
         Получить все подписки с указанным статусом (SYNC).
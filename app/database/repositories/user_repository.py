@@ -1,9 +1,13 @@
 # repository/user.py
+import asyncio
 from collections.abc import Sequence
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import select
+
 from app.core.exceptions import UserNotFound
+from app.core.telegram_id_cache import telegram_id_cache
 from app.database.base_repository import BaseRepository
 from app.models import User
 
@@ -30,6 +34,19 @@ class UserRepository(BaseRepository[User]):
             raise UserNotFound(telegram_id)
         return user
 
+    async def get_telegram_id(self, user_id: int) -> Optional[int]:
+        """
+        Получить telegram_id пользователя (для уведомлений).
+        Сначала из кэша telegram_id_cache (Redis - в потоке), при промахе - одна колонка из БД без загрузки модели.
+        """
+        telegram_id = await asyncio.to_thread(telegram_id_cache.get, user_id)
+        if telegram_id is None:
+            result = await self._session.execute(select(User.telegram_id).where(User.id == user_id))
+            telegram_id = result.scalar_one_or_none()
+            if telegram_id is not None:
+                await asyncio.to_thread(telegram_id_cache.set, user_id, telegram_id)
+        return telegram_id
+
     # async def get_by_id_or_raise(self, user_id: int) -> User:
     #     """Получить пользователя по ID или выбросить исключение"""
     #     user = await self.get_by_id(user_id)
@@ -74,7 +91,10 @@ class UserRepository(BaseRepository[User]):
 
         user.telegram_id = new_telegram_id
         user.updated_at = datetime.utcnow()
-        return await self.update(user)
+        user = await self.update(user)
+        # Старый telegram_id больше не должен использоваться для уведомлений
+        await asyncio.to_thread(telegram_id_cache.invalidate, user_id)
+        return user
 
     async def update_user_profile(
         self,
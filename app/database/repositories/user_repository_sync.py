@@ -1,7 +1,10 @@
 # repository/user_sync.py
+from typing import Optional
 
+from sqlalchemy import select
 
 from app.core.exceptions import UserNotFound
+from app.core.telegram_id_cache import telegram_id_cache
 from app.database.base_repository_sync import BaseRepositorySync
 from app.models import User
 
@@ -21,3 +24,15 @@ class UserRepositorySync(BaseRepositorySync[User]):
         if not user:
             raise UserNotFound(user_id)
         return user
+
+    def get_telegram_id(self, user_id: int) -> Optional[int]:
+        """
+        Получить telegram_id пользователя (для уведомлений).
+        Сначала из кэша telegram_id_cache, при промахе - одна колонка из БД без загрузки модели.
+        """
+        telegram_id = telegram_id_cache.get(user_id)
+        if telegram_id is None:
+            telegram_id = self._session.execute(select(User.telegram_id).where(User.id == user_id)).scalar_one_or_none()
+            if telegram_id is not None:
+                telegram_id_cache.set(user_id, telegram_id)
+        return telegram_id
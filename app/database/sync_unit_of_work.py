@@ -6,7 +6,10 @@
 from sqlalchemy.orm import Session
 
 from app.core.clients.yookassa_client import YookassaClient
+from app.core.logger import logger
+from app.database.repositories.notification_outbox_repository_sync import NotificationOutboxRepositorySync
 from app.database.repositories.payment_repository_sync import PaymentRepositorySync
+from app.database.repositories.processed_webhook_event_repository_sync import ProcessedWebhookEventRepositorySync
 from app.database.repositories.promo_repository_sync import PromotionRepositorySync
 from app.database.repositories.refund_repository_sync import RefundRepositorySync
 from app.database.repositories.subscription_plan_repository_sync import SubscriptionPlanRepositorySync
@@ -35,6 +38,8 @@ class SyncUnitOfWork:
         self.payments = PaymentRepositorySync(session, yookassa_client)
         self.promotions = PromotionRepositorySync(session)
         self.refunds = RefundRepositorySync(session)
+        self.notification_outbox = NotificationOutboxRepositorySync(session)
+        self.processed_webhook_events = ProcessedWebhookEventRepositorySync(session)
 
     @property
     def session(self) -> Session:
@@ -42,20 +47,41 @@ class SyncUnitOfWork:
         return self._session
 
     def commit(self) -> None:
-        """Коммитим транзакцию"""
+        """Коммитим транзакцию и запускаем отправку записанных в ней уведомлений"""
         try:
             self._session.commit()
         except Exception:
+            self.notification_outbox.reset_added()
             self._session.rollback()
             raise
+        self._dispatch_notifications()
 
     def rollback(self) -> None:
-        """Откатываем транзакцию"""
+        """Откатываем транзакцию (уведомления из outbox откатываются вместе с ней)"""
+        self.notification_outbox.reset_added()
         try:
             self._session.rollback()
         except Exception:
             pass
 
+    def _dispatch_notifications(self) -> None:
+        """
+        Запустить отправку уведомлений из outbox после коммита.
+        Если поставить задачу не удалось, уведомления отправит периодическая задача.
+        """
+        outbox = self.notification_outbox
+        has_priority, has_coalesced = outbox.priority_count > 0, outbox.added_count > outbox.priority_count
+        outbox.reset_added()
+        try:
+            from app.tasks.notification import schedule_notification_outbox_dispatch
+
+            if has_priority:
+                schedule_notification_outbox_dispatch()
+            if has_coalesced:
+                schedule_notification_outbox_dispatch(coalesced=True)
+        except Exception as e:
+            logger.warning(f"Failed to schedule notification outbox dispatch: {e}")
+
     def close(self) -> None:
         """Закрываем сессию"""
         try:
@@ -1,7 +1,12 @@
+import asyncio
+
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.clients.yookassa_client import YookassaClient
+from app.core.clients.async_yookassa_client import AsyncYookassaClient
+from app.core.logger import logger
+from app.database.repositories.notification_outbox_repository import NotificationOutboxRepository
 from app.database.repositories.payment_repository import PaymentRepository
+from app.database.repositories.processed_webhook_event_repository import ProcessedWebhookEventRepository
 from app.database.repositories.promo_repository import PromotionRepository
 from app.database.repositories.refund_repository import RefundRepository
 from app.database.repositories.subscription_plan_repository import SubscriptionPlanRepository
@@ -20,7 +25,7 @@ class UnitOfWork:
     - Используется как async with uow:
     """
 
-    def __init__(self, session: AsyncSession, yookassa_client: YookassaClient):
+    def __init__(self, session: AsyncSession, yookassa_client: AsyncYookassaClient):
         self._session = session
         self.yookassa_client = yookassa_client
 
@@ -32,6 +37,8 @@ class UnitOfWork:
         self.promotions = PromotionRepository(session)
         self.refunds = RefundRepository(session)
         self.user_promotion_usage = UserPromotionUsageRepository(session)
+        self.notification_outbox = NotificationOutboxRepository(session)
+        self.processed_webhook_events = ProcessedWebhookEventRepository(session)
 
     @property
     def session(self) -> AsyncSession:
@@ -39,22 +46,53 @@ class UnitOfWork:
         return self._session
 
     async def commit(self) -> None:
-        """Коммитим транзакцию"""
+        """
+        Коммитим транзакцию, запускаем отправку записанных в ней уведомлений
+        и запоминаем обработанные в ней события webhook-ов.
+        Обращения к Redis и брокеру Celery синхронные - выполняются в потоке, не блокируя event loop.
+        """
         try:
             await self._session.commit()
         except Exception:
+            self.notification_outbox.reset_added()
+            await self.processed_webhook_events.release_claimed()
             await self._session.rollback()
             # TODO logs
             raise
+        await self.processed_webhook_events.confirm_claimed()
+        await asyncio.to_thread(self._dispatch_notifications)
 
     async def rollback(self) -> None:
-        """Откатываем транзакцию"""
+        """
+        Откатываем транзакцию (уведомления из outbox откатываются вместе с ней,
+        захваченные события webhook-ов освобождаются для повторной обработки)
+        """
+        self.notification_outbox.reset_added()
+        await self.processed_webhook_events.release_claimed()
         try:
             await self._session.rollback()
         except Exception:
             # TODO logs
             pass
 
+    def _dispatch_notifications(self) -> None:
+        """
+        Запустить отправку уведомлений из outbox после коммита.
+        Если поставить задачу не удалось, уведомления отправит периодическая задача.
+        """
+        outbox = self.notification_outbox
+        has_priority, has_coalesced = outbox.priority_count > 0, outbox.added_count > outbox.priority_count
+        outbox.reset_added()
+        try:
+            from app.tasks.notification import schedule_notification_outbox_dispatch
+
+            if has_priority:
+                schedule_notification_outbox_dispatch()
+            if has_coalesced:
+                schedule_notification_outbox_dispatch(coalesced=True)
+        except Exception as e:
+            logger.warning(f"Failed to schedule notification outbox dispatch: {e}")
+
     async def close(self) -> None:
         """Закрываем сессию"""
         try:
@@ -65,6 +65,9 @@ async def lifespan(app: FastAPI):
     # ===== SHUTDOWN =====
     logger.info("Shutting down FastAPI application...")
     try:
+        from app.core.clients.async_yookassa_client import async_yookassa_client
+
+        await async_yookassa_client.aclose()
         await db_manager.close()
         logger.info("Application shut down successfully")
     except Exception as e:
@@ -3,9 +3,12 @@ Database models
 """
 
 from app.core.enums import PromotionType, SubscriptionStatus, UserRole
+from app.models.notification_outbox import NotificationOutboxEntry
 from app.models.payment import Payment
+from app.models.processed_webhook_event import ProcessedWebhookEvent
 from app.models.promotion import Promotion
 from app.models.refund import Refund
+from app.models.renewal_calendar import RenewalCalendarEntry
 from app.models.subscription import Subscription, SubscriptionPlan
 from app.models.user import User
 from app.models.user_promotion_usage import UserPromotionUsage
@@ -20,5 +23,8 @@ __all__ = [
     "Promotion",
     "Payment",
     "Refund",
+    "RenewalCalendarEntry",
+    "NotificationOutboxEntry",
+    "ProcessedWebhookEvent",
     "UserPromotionUsage",
 ]
@@ -0,0 +1,32 @@
+"""
+NotificationOutboxEntry model - outbox уведомлений в Telegram
+"""
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, func
+
+from app.core.database import Base
+from app.core.enums import NotificationOutboxStatus
+
+
+class NotificationOutboxEntry(Base):
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True)
+
+    # Получатель: telegram_id берется у пользователя при отправке
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    message = Column(Text, nullable=False)
+    notification_type = Column(String(50), nullable=False, default="info")
+
+    # Отправка: pending - ждет отправки с next_attempt_at, failed - попытки исчерпаны
+    status = Column(String(20), nullable=False, default=NotificationOutboxStatus.pending.value)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (Index("ix_notification_outbox_status_next_attempt_at", "status", "next_attempt_at"),)
+
+    def __repr__(self):
+        return f"<NotificationOutboxEntry(id={self.id}, user_id={self.user_id}, status={self.status})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, func
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, func
 
 from app.core.database import Base
 
@@ -36,5 +36,10 @@ class Payment(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
+    # Частичный индекс для выборки запланированных попыток автосписания
+    __table_args__ = (
+        Index("ix_payments_next_retry_at", "next_retry_at", postgresql_where=next_retry_at.isnot(None)),
+    )
+
     def __repr__(self):
         return f"<Payment(id={self.id}, subscription_id={self.subscription_id}, status={self.status})>"
@@ -0,0 +1,25 @@
+"""
+ProcessedWebhookEvent model - обработанные события webhook-ов Юкассы (резерв дедупликации, если Redis недоступен)
+"""
+
+from sqlalchemy import Column, DateTime, Integer, String, UniqueConstraint, func
+
+from app.core.database import Base
+
+
+class ProcessedWebhookEvent(Base):
+    __tablename__ = "processed_webhook_events"
+
+    id = Column(Integer, primary_key=True)
+
+    # Ключ события: ID объекта Юкассы (платежа или возврата), тип события и статус объекта
+    object_id = Column(String(255), nullable=False)
+    event = Column(String(100), nullable=False)
+    status = Column(String(50), nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    __table_args__ = (UniqueConstraint("object_id", "event", "status", name="uq_processed_webhook_events_key"),)
+
+    def __repr__(self):
+        return f"<ProcessedWebhookEvent(object_id={self.object_id}, event={self.event}, status={self.status})>"
@@ -0,0 +1,83 @@
+"""
+RenewalCalendarEntry model - календарь продлений (дата следующего автосписания активных подписок)
+"""
+
+from datetime import date, datetime, timezone
+
+from sqlalchemy import Column, Date, ForeignKey, Index, Integer, delete, event, insert, inspect
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.core.enums import SubscriptionStatus
+from app.models.subscription import Subscription
+
+
+class RenewalCalendarEntry(Base):
+    __tablename__ = "renewal_calendar"
+
+    # Одна запись на активную подписку
+    subscription_id = Column(Integer, ForeignKey("subscriptions.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    plan_id = Column(Integer, ForeignKey("subscription_plans.id"), nullable=False)
+
+    # Дата окончания подписки (UTC) - день автосписания
+    due_date = Column(Date, nullable=False)
+
+    __table_args__ = (Index("ix_renewal_calendar_due_date", "due_date", "subscription_id"),)
+
+    def __repr__(self):
+        return f"<RenewalCalendarEntry(subscription_id={self.subscription_id}, due_date={self.due_date})>"
+
+
+# Изменение этих полей подписки меняет ее положение в календаре
+_CALENDAR_FIELDS = ("status", "end_date", "plan_id", "user_id")
+
+
+def _due_date(end_date: datetime) -> date:
+    """Дата автосписания (UTC) по end_date подписки"""
+    if end_date.tzinfo is not None:
+        end_date = end_date.astimezone(timezone.utc)
+    return end_date.date()
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_renewal_calendar(session: Session, flush_context) -> None:
+    """
+    Поддерживать календарь продлений в той же транзакции, что и изменения подписок.
+
+    Срабатывает для синхронных и асинхронных сессий (AsyncSession работает поверх Session),
+    поэтому создание, продление, отмена и применение промокода обновляют календарь без
+    явных вызовов в сервисах. Массовые UPDATE без ORM (update(Subscription)) календарь не меняют.
+    """
+    changed: list[Subscription] = []
+    for obj in session.new:
+        if isinstance(obj, Subscription):
+            changed.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Subscription):
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in _CALENDAR_FIELDS):
+                changed.append(obj)
+
+    if not changed:
+        return
+
+    connection = session.connection()
+    connection.execute(
+        delete(RenewalCalendarEntry).where(
+            RenewalCalendarEntry.subscription_id.in_([subscription.id for subscription in changed])
+        )
+    )
+
+    rows = [
+        {
+            "subscription_id": subscription.id,
+            "user_id": subscription.user_id,
+            "plan_id": subscription.plan_id,
+            "due_date": _due_date(subscription.end_date),
+        }
+        for subscription in changed
+        if subscription.status == SubscriptionStatus.active.value and subscription.end_date is not None
+    ]
+    if rows:
+        connection.execute(insert(RenewalCalendarEntry), rows)
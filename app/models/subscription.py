@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, String, func
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, func
 
 from app.core.database import Base
 
@@ -29,8 +29,14 @@ class Subscription(Base):
 
     start_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     end_date = Column(DateTime(timezone=True), nullable=False)
+
+    # Дата последней обработки автоплатежа (маркер захвата в режиме SKIP LOCKED)
+    last_auto_payment_date = Column(Date, nullable=True)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
+    __table_args__ = (Index("ix_subscriptions_status_end_date", "status", "end_date"),)
+
     def __repr__(self):
         return f"<Subscription(id={self.id}, user_id={self.user_id}, status={self.status})>"
@@ -2,6 +2,7 @@
 Auto Payment Service - сервис для автоматических платежей подписок
 """
 
+import asyncio
 import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Any
@@ -11,6 +12,7 @@ from app.core.logger import logger
 from app.models import Payment, Subscription
 from app.schemas.subscription import SubscriptionWithPaymentRequest
 from app.services.base_service import BaseService
+from app.services.payment_reminders import dispatch_reminder_rows
 from app.services.subscription_orchestrator_service import SubscriptionOrchestratorService
 
 
@@ -102,6 +104,7 @@ class AutoPaymentService(BaseService):
             await self._send_notification(
                 subscription.user_id,
                 f"Для продления подписки необходимо оплатить. Перейдите по ссылке: {result.confirmation_url}",
+                priority=True,
             )
 
             return {
@@ -145,7 +148,7 @@ class AutoPaymentService(BaseService):
             )
 
             # Создаем одностадийный платеж (capture=True)
-            yookassa_payment = self.uow.yookassa_client.create_payment(
+            yookassa_payment = await self.uow.yookassa_client.create_payment(
                 request=yookassa_request, idempotency_key=idempotency_key
             )
 
@@ -254,63 +257,41 @@ class AutoPaymentService(BaseService):
             f"end_date={subscription.end_date}, status={subscription.status}"
         )
 
-    async def _send_notification(self, user_id: int, message: str) -> None:
+    async def _send_notification(self, user_id: int, message: str, priority: bool = False) -> None:
         """
         Отправить уведомление пользователю
 
+        Уведомление пишется в outbox в текущей транзакции и отправляется Celery задачей
+        dispatch_notification_outbox после коммита; уведомления пользователя за
+        NOTIFICATION_COALESCE_WINDOW_SECONDS отправляются одним сообщением.
+
         Args:
             user_id: ID пользователя
             message: Текст сообщения
+            priority: Отправить без ожидания окна объединения (пользователю нужно действовать сразу)
         """
         try:
-            # Импортируем задачу Celery для отправки уведомлений
-            from app.tasks.notification import send_notification
-
-            # Отправляем асинхронно через Celery
-            send_notification.delay(user_id, message, "payment")
+            await self.uow.notification_outbox.add(user_id, message, notification_type="payment", priority=priority)
         except Exception as e:
             logger.error(f"Error sending notification to user {user_id}: {str(e)}")
 
-    async def send_payment_reminder_notifications(self) -> dict[str, Any]:
+    async def send_payment_reminder_notifications(self, chunk_size: int = 1000) -> dict[str, Any]:
         """
         Отправить уведомления пользователям о предстоящем платеже завтра
 
+        Данные читаются одним потоковым запросом пачками по chunk_size,
+        на каждую пачку ставится одна задача send_notifications_batch.
+
+        Args:
+            chunk_size: Количество напоминаний в одной пачке
+
         Returns:
             Dict с результатами
         """
-        subscriptions = await self.uow.subscriptions.get_subscriptions_ending_tomorrow()
-
-        results = {"total": len(subscriptions), "sent": 0, "failed": 0, "errors": []}
-
-        for subscription in subscriptions:
-            try:
-                # Получаем план для информации о сумме
-                plan = await self.uow.subscription_plans.get_by_id_or_raise(subscription.plan_id)
-
-                user = await self.uow.users.get_by_id_or_raise(subscription.user_id)
-
-                # Формируем сообщение
-                if user.saved_payment_method_id:
-                    message = (
-                        f"Напоминание: завтра будет автоматически списана сумма "
-                        f"{plan.price} RUB за продление подписки. "
-                        f"Если вы хотите отменить автоплатеж, пожалуйста, сделайте это сейчас."
-                    )
-                else:
-                    message = (
-                        f"Напоминание: завтра истекает ваша подписка. "
-                        f"Для продления необходимо будет создать новый платеж на сумму "
-                        f"{plan.price} RUB."
-                    )
-
-                await self._send_notification(subscription.user_id, message)
-                results["sent"] += 1
-
-            except Exception as e:
-                logger.error(f"Error sending reminder for subscription {subscription.id}: {str(e)}")
-                results["failed"] += 1
-                results["errors"].append({"subscription_id": subscription.id, "error": str(e)})
-
+        results = {"total": 0, "sent": 0, "failed": 0, "errors": []}
+        async for rows in self.uow.subscriptions.iter_reminder_rows_ending_tomorrow(chunk_size):
+            # Постановка задачи в брокер синхронная - в потоке, не блокируя event loop
+            await asyncio.to_thread(dispatch_reminder_rows, rows, results)
         return results
 
     async def _is_subscription_already_extended(self, subscription_id: int) -> bool:
@@ -363,8 +344,8 @@ class AutoPaymentService(BaseService):
             yookassa_payment_id: ID платежа в YooKassa
         """
         try:
-            # Получаем информацию о платеже из YooKassa
-            payment_info = self.uow.yookassa_client.get_payment(yookassa_payment_id)
+            # Получаем информацию о платеже (из кэша финальных статусов, при промахе - из YooKassa)
+            payment_info = await self.uow.yookassa_client.get_payment_cached(yookassa_payment_id)
 
             # Если платеж был успешным, проверяем согласие пользователя на сохранение метода
             if payment_info.status == "succeeded":
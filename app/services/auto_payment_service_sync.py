@@ -3,15 +3,18 @@
 Используется в Celery задачах.
 """
 
+from collections.abc import Sequence
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from typing import Any, Optional
 
 from app.core.auto_payment_config import auto_payment_config
 from app.core.config import settings
 from app.core.enums import PaymentStatus, SubscriptionStatus
+from app.core.exceptions import YookassaUnavailable
 from app.core.logger import logger
 from app.database.sync_unit_of_work import SyncUnitOfWork
-from app.models import Payment, Subscription
+from app.models import Payment, Subscription, SubscriptionPlan, User
+from app.services.payment_reminders import dispatch_reminder_rows
 
 
 class AutoPaymentServiceSync:
@@ -99,31 +102,224 @@ class AutoPaymentServiceSync:
         # Есть сохраненный метод - создаем платеж для автосписания
         return self._create_payment_for_auto_charge(locked_subscription, user.saved_payment_method_id)
 
-    def _create_payment_without_method(self, subscription: Subscription) -> dict[str, Any]:
+    def process_subscription_batch(self, subscription_ids: list[int]) -> dict[str, Any]:
+        """
+        Обработать платежи для пачки подписок.
+
+        Та же логика, что и в process_single_subscription_payment, но все данные
+        загружаются пачкой без блокировки: один запрос подписок, один запрос существующих
+        платежей по idempotency_key, один IN-запрос пользователей и один - планов.
+
+        Как и при поштучной обработке, блокируется только одна строка на запрос к Юкассе:
+        подписка блокируется (SELECT ... FOR UPDATE) и перечитывается перед решением,
+        а после обработки транзакция коммитится. Отмена подписки или промокод ждут
+        не дольше одного запроса к API, а не всю пачку. Повтор после падения безопасен:
+        созданные платежи находятся по idempotency_key.
+
+        Каждая подписка обрабатывается в своем SAVEPOINT, поэтому ошибка одной
+        подписки не откатывает остальные.
+
+        Если API Юкассы недоступно (YookassaUnavailable), эта и оставшиеся подписки пачки,
+        которым нужен платеж, получают результат deferred (summary: deferred, retry_after)
+        и должны быть обработаны повторно.
+
+        Args:
+            subscription_ids: ID подписок для обработки
+
+        Returns:
+            Dict со сводкой и результатами по каждой подписке
+        """
+        subscriptions = self.uow.subscriptions.get_batch_for_payment(subscription_ids)
+        return self._process_prefetched_batch(subscription_ids, subscriptions, lock_each=True)
+
+    def claim_and_process_batch(self, limit: int) -> dict[str, Any]:
+        """
+        Захватить следующие N подписок к оплате (FOR UPDATE SKIP LOCKED) и обработать их.
+
+        Захваченные подписки отмечаются last_auto_payment_date = сегодня в той же транзакции,
+        поэтому после коммита они больше не захватываются, а при падении воркера
+        (откат транзакции) снова становятся доступны другим воркерам.
+
+        Args:
+            limit: Максимальный размер пачки
+
+        Returns:
+            Dict со сводкой и результатами по каждой подписке (total = 0 - подписок к оплате не осталось)
+        """
+        subscriptions = self.uow.subscriptions.claim_due_subscriptions(limit)
+        subscription_ids = [subscription.id for subscription in subscriptions]
+
+        results = self._process_prefetched_batch(subscription_ids, subscriptions)
+
+        # Отложенные (API Юкассы недоступно) подписки остаются доступными для следующего захвата
+        processed_ids = [sid for sid in subscription_ids if not results["results"][sid].get("deferred")]
+        self.uow.subscriptions.mark_auto_payment_processed(processed_ids, datetime.now(timezone.utc).date())
+        return results
+
+    def _process_prefetched_batch(
+        self, subscription_ids: list[int], subscriptions: Sequence[Subscription], lock_each: bool = False
+    ) -> dict[str, Any]:
+        """
+        Обработать пачку загруженных подписок.
+
+        Args:
+            subscription_ids: ID подписок в порядке обработки
+            subscriptions: Подписки пачки (отсутствующие считаются не найденными)
+            lock_each: Подписки не заблокированы - блокировать каждую перед решением
+                и коммитить после нее (иначе подписки уже заблокированы вызывающим кодом)
+
+        Returns:
+            Dict со сводкой и результатами по каждой подписке
+        """
+        results: dict[str, Any] = {
+            "total": len(subscription_ids),
+            "processed": 0,
+            "skipped": 0,
+            "failed": 0,
+            "deferred": 0,
+            "retry_after": 0.0,
+            "results": {},
+        }
+        unavailable: Optional[YookassaUnavailable] = None
+
+        subscriptions_by_id = {subscription.id: subscription for subscription in subscriptions}
+
+        now = datetime.now(timezone.utc)
+        today_str = now.strftime("%Y-%m-%d")
+        tomorrow_start = now.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+        # 🔍 ИДЕМПОТЕНТНОСТЬ: существующие платежи за сегодня - одним запросом
+        idempotency_keys = {
+            subscription.id: f"auto_payment_{subscription.id}_{today_str}" for subscription in subscriptions
+        }
+        existing_payments = {
+            payment.idempotency_key: payment
+            for payment in self.uow.payments.get_payments_by_idempotency_keys(list(idempotency_keys.values()))
+        }
+
+        # Предзагрузка пользователей и планов - по одному IN-запросу
+        users = {user.id: user for user in self.uow.users.get_by_ids([s.user_id for s in subscriptions])}
+        plans = {plan.id: plan for plan in self.uow.subscription_plans.get_by_ids([s.plan_id for s in subscriptions])}
+
+        for subscription_id in subscription_ids:
+            subscription = subscriptions_by_id.get(subscription_id)
+            # 🔒 Блокируем строку подписки только на время ее обработки
+            if lock_each and subscription is not None and not self.uow.subscriptions.lock_for_payment(subscription):
+                subscription = None
+            if subscription is None:
+                result = {"success": False, "error": "subscription_not_found"}
+            elif subscription.status in [
+                SubscriptionStatus.cancelled.value,
+                SubscriptionStatus.cancelled_waiting.value,
+            ]:
+                result = {
+                    "success": False,
+                    "error": "subscription_cancelled",
+                    "message": "Subscription was cancelled, no auto payment needed",
+                }
+            elif subscription.end_date >= tomorrow_start:
+                result = {"success": True, "skipped": True, "message": "Subscription already extended"}
+            elif self._was_promotion_applied_today(subscription):
+                result = {"success": True, "skipped": True, "message": "Promotion applied today, auto payment skipped"}
+            elif idempotency_keys[subscription.id] in existing_payments:
+                result = {
+                    "success": True,
+                    "skipped": True,
+                    "message": "Payment already exists",
+                    "payment_id": existing_payments[idempotency_keys[subscription.id]].id,
+                }
+            elif unavailable is not None:
+                # API Юкассы недоступно - оставшиеся подписки откладываются без обращения к API
+                result = {"success": False, "deferred": True, "error": str(unavailable)}
+            else:
+                try:
+                    result = self._process_prefetched_subscription(
+                        subscription, users.get(subscription.user_id), plans.get(subscription.plan_id)
+                    )
+                except YookassaUnavailable as e:
+                    logger.warning(f"YooKassa unavailable, deferring rest of the batch from {subscription.id}: {e}")
+                    unavailable = e
+                    results["retry_after"] = e.retry_after
+                    result = {"success": False, "deferred": True, "error": str(e)}
+
+            if result.get("deferred"):
+                results["deferred"] += 1
+            elif result.get("skipped"):
+                results["skipped"] += 1
+            elif result.get("success"):
+                results["processed"] += 1
+            else:
+                results["failed"] += 1
+            results["results"][subscription_id] = result
+
+            if lock_each:
+                # Снимаем блокировку подписки до запроса к Юкассе по следующей
+                self.uow.commit()
+
+        return results
+
+    def _process_prefetched_subscription(
+        self, subscription: Subscription, user: Optional[User], plan: Optional[SubscriptionPlan]
+    ) -> dict[str, Any]:
+        """
+        Создать платеж для заблокированной подписки с предзагруженными пользователем и планом.
+        Выполняется в SAVEPOINT: при ошибке откатываются только изменения этой подписки.
+
+        Args:
+            subscription: Заблокированная подписка
+            user: Пользователь подписки (None - не найден)
+            plan: План подписки (None - не найден)
+
+        Returns:
+            Dict с результатом обработки
+        """
+        if user is None:
+            return {"success": False, "error": f"User not found: {subscription.user_id}"}
+        if plan is None:
+            return {"success": False, "error": f"SubscriptionPlan not found: {subscription.plan_id}"}
+
+        savepoint = self.uow.session.begin_nested()
+        try:
+            if not user.saved_payment_method_id:
+                result = self._create_payment_without_method(subscription, plan=plan)
+            else:
+                result = self._create_payment_for_auto_charge(subscription, user.saved_payment_method_id, plan=plan)
+        except YookassaUnavailable:
+            savepoint.rollback()
+            raise
+        except Exception as e:
+            savepoint.rollback()
+            logger.error(f"Error processing subscription {subscription.id} in batch: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+        if result.get("success") and savepoint.is_active:
+            savepoint.commit()
+        else:
+            savepoint.rollback()
+        return result
+
+    def _create_payment_without_method(
+        self,
+        subscription: Subscription,
+        plan: Optional[SubscriptionPlan] = None,
+    ) -> dict[str, Any]:
         """
         Создать платеж для подписки без сохраненного метода.
         Отправляет ссылку на оплату и ставит статус cancelled.
 
         Args:
             subscription: Подписка для продления
+            plan: Предзагруженный план (пакетная обработка)
 
         Returns:
             Dict с результатом
         """
         try:
-            plan = self.uow.subscription_plans.get_by_id_or_raise(subscription.plan_id)
             today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
             idempotency_key = f"auto_payment_{subscription.id}_{today_str}"
 
-            # Проверяем еще раз на случай race condition
-            existing_payment = self.uow.payments.get_payment_by_idempotency_key(idempotency_key)
-            if existing_payment:
-                return {
-                    "success": True,
-                    "skipped": True,
-                    "message": "Payment already exists",
-                    "payment_id": existing_payment.id,
-                }
+            if plan is None:
+                plan = self.uow.subscription_plans.get_by_id_or_raise(subscription.plan_id)
 
             from app.schemas.yookassa import YookassaPaymentRequest
 
@@ -151,21 +347,15 @@ class AutoPaymentServiceSync:
                 payment_method="manual",
             )
 
-            try:
-                created_payment = self.uow.payments.create_payment(db_payment)
-            except Exception as e:
-                from sqlalchemy.exc import IntegrityError
-
-                if isinstance(e, IntegrityError) and "idempotency_key" in str(e):
-                    existing_payment = self.uow.payments.get_payment_by_idempotency_key(idempotency_key)
-                    if existing_payment:
-                        return {
-                            "success": True,
-                            "skipped": True,
-                            "message": "Payment already exists (race condition)",
-                            "payment_id": existing_payment.id,
-                        }
-                raise
+            # 🔍 ИДЕМПОТЕНТНОСТЬ: INSERT ... ON CONFLICT (idempotency_key) DO NOTHING - без исключений при гонке
+            created_payment, created = self.uow.payments.create_payment_if_absent(db_payment)
+            if not created:
+                return {
+                    "success": True,
+                    "skipped": True,
+                    "message": "Payment already exists (race condition)",
+                    "payment_id": created_payment.id,
+                }
 
             # Обновляем статус подписки на cancelled
             subscription.status = SubscriptionStatus.cancelled.value
@@ -180,6 +370,7 @@ class AutoPaymentServiceSync:
                 self._send_notification(
                     subscription.user_id,
                     f"Для продления подписки необходимо оплатить. Перейдите по ссылке: {confirmation_url}",
+                    priority=True,
                 )
 
             return {
@@ -189,35 +380,33 @@ class AutoPaymentServiceSync:
                 "payment_id": created_payment.id,
                 "confirmation_url": confirmation_url,
             }
+        except YookassaUnavailable:
+            # API недоступно - подписка будет обработана позже, а не помечена ошибкой
+            raise
         except Exception as e:
             logger.error(f"Error creating payment without method for subscription {subscription.id}: {str(e)}")
             return {"success": False, "no_payment_method": True, "error": str(e)}
 
-    def _create_payment_for_auto_charge(self, subscription: Subscription, payment_method_id: str) -> dict[str, Any]:
+    def _create_payment_for_auto_charge(
+        self, subscription: Subscription, payment_method_id: str, plan: Optional[SubscriptionPlan] = None
+    ) -> dict[str, Any]:
         """
         Создать платеж для автосписания с сохраненным методом.
 
         Args:
             subscription: Подписка для продления
             payment_method_id: ID сохраненного платежного метода в YooKassa
+            plan: Предзагруженный план (пакетная обработка)
 
         Returns:
             Dict с результатом (содержит payment_id для запуска попыток)
         """
         try:
-            plan = self.uow.subscription_plans.get_by_id_or_raise(subscription.plan_id)
             today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
             idempotency_key = f"auto_payment_{subscription.id}_{today_str}"
 
-            # Проверяем еще раз на случай race condition
-            existing_payment = self.uow.payments.get_payment_by_idempotency_key(idempotency_key)
-            if existing_payment:
-                return {
-                    "success": True,
-                    "skipped": True,
-                    "message": "Payment already exists",
-                    "payment_id": existing_payment.id,
-                }
+            if plan is None:
+                plan = self.uow.subscription_plans.get_by_id_or_raise(subscription.plan_id)
 
             from app.schemas.yookassa import YookassaPaymentRequest
 
@@ -246,21 +435,15 @@ class AutoPaymentServiceSync:
                 payment_method="auto_payment",
             )
 
-            try:
-                created_payment = self.uow.payments.create_payment(db_payment)
-            except Exception as e:
-                from sqlalchemy.exc import IntegrityError
-
-                if isinstance(e, IntegrityError) and "idempotency_key" in str(e):
-                    existing_payment = self.uow.payments.get_payment_by_idempotency_key(idempotency_key)
-                    if existing_payment:
-                        return {
-                            "success": True,
-                            "skipped": True,
-                            "message": "Payment already exists (race condition)",
-                            "payment_id": existing_payment.id,
-                        }
-                raise
+            # 🔍 ИДЕМПОТЕНТНОСТЬ: INSERT ... ON CONFLICT (idempotency_key) DO NOTHING - без исключений при гонке
+            created_payment, created = self.uow.payments.create_payment_if_absent(db_payment)
+            if not created:
+                return {
+                    "success": True,
+                    "skipped": True,
+                    "message": "Payment already exists (race condition)",
+                    "payment_id": created_payment.id,
+                }
 
             return {
                 "success": True,
@@ -268,6 +451,9 @@ class AutoPaymentServiceSync:
                 "payment_id": created_payment.id,
                 "needs_retry": True,  # Флаг для запуска попыток
             }
+        except YookassaUnavailable:
+            # API недоступно - подписка будет обработана позже, а не помечена ошибкой
+            raise
         except Exception as e:
             logger.error(f"Error creating payment for auto charge subscription {subscription.id}: {str(e)}")
             return {"success": False, "error": str(e)}
@@ -342,9 +528,9 @@ class AutoPaymentServiceSync:
                 self.uow.payments.update_payment(payment)
                 return {"success": False, "error": "no_payment_method"}
 
-            # Проверяем статус платежа в YooKassa
+            # Проверяем статус платежа: финальный статус (из webhook-а Юкассы или ответа API) берется из кэша
             try:
-                yookassa_payment = self.uow.yookassa_client.get_payment(payment.yookassa_payment_id)
+                yookassa_payment = self.uow.yookassa_client.get_payment_cached(payment.yookassa_payment_id)
 
                 # 🔍 ИДЕМПОТЕНТНОСТЬ: Обновляем статус только если он изменился
                 # Не перезаписываем succeeded, если платеж уже был обработан
@@ -405,6 +591,9 @@ class AutoPaymentServiceSync:
                             "message": f"Payment failed, attempt {attempt}/{max_attempts}",
                         }
 
+            except YookassaUnavailable:
+                # API недоступно - попытка не расходуется, задача повторит ее позже
+                raise
             except Exception as e:
                 logger.error(f"Error checking payment status from YooKassa: {str(e)}")
                 payment.attempt_number = attempt
@@ -434,50 +623,114 @@ class AutoPaymentServiceSync:
                 else:
                     return {"success": False, "final": False, "error": str(e)}
 
+        except YookassaUnavailable:
+            raise
         except Exception as e:
             logger.error(f"Error in retry_auto_payment_attempt for payment {payment_id}: {str(e)}")
             return {"success": False, "error": str(e)}
 
-    def process_cancelled_waiting_subscriptions(self) -> dict[str, Any]:
+    def run_auto_payment_attempt(self, payment_id: int, attempt: int) -> dict[str, Any]:
+        """
+        Выполнить попытку автосписания и запланировать следующую.
+
+        Следующая попытка не ставится в очередь Celery с countdown, а записывается
+        в payment.next_retry_at - ее подхватит периодическая задача retry_failed_payments.
+
+        Платеж блокируется (SELECT FOR UPDATE) до конца транзакции, устаревшая попытка отбрасывается:
+        отложенная задача (YooKassa недоступна) и задача, запущенная sweeper-ом после истечения аренды,
+        могут нести один и тот же номер попытки - выполняется только первая из них.
+
+        Args:
+            payment_id: ID платежа
+            attempt: Номер попытки (начинается с 1)
+
+        Returns:
+            Dict с результатом попытки (next_retry_at - время следующей попытки, если она будет)
+        """
+        payment = self.uow.payments.get_for_processing_with_lock(payment_id)
+        if payment and self._is_stale_attempt(payment, attempt):
+            logger.info(
+                f"Stale auto payment attempt {attempt} for payment {payment_id} dropped "
+                f"(attempt_number={payment.attempt_number}, next_retry_at={payment.next_retry_at})"
+            )
+            return {"success": False, "skipped": True, "stale": True, "message": "Stale attempt dropped"}
+
+        result = self.retry_auto_payment_attempt(payment_id, attempt)
+
+        payment = self.uow.payments.get_by_id(payment_id)
+        if not payment:
+            return result
+
+        # Номер попытки фиксируем и для ранних выходов, иначе повтор получит тот же номер
+        payment.attempt_number = max(payment.attempt_number or 1, attempt)
+
+        config = auto_payment_config.get_config()
+        if not result.get("success") and not result.get("final") and attempt < config["max_attempts"]:
+            payment.next_retry_at = datetime.now(timezone.utc) + timedelta(seconds=config["retry_interval_seconds"])
+            result["next_retry_at"] = payment.next_retry_at.isoformat()
+        else:
+            payment.next_retry_at = None
+        self.uow.payments.update_payment(payment)
+
+        return result
+
+    @staticmethod
+    def _is_stale_attempt(payment: Payment, attempt: int) -> bool:
+        """
+        Проверить, что попытка уже выполнена или вытеснена другой.
+
+        Попытка 1 запускается сразу после создания платежа (next_retry_at еще не задан),
+        попытка N > 1 - sweeper-ом после попытки N - 1 (attempt_number == N - 1, next_retry_at задан арендой).
+        """
+        last_attempt = payment.attempt_number or 1
+        if attempt == 1:
+            return payment.next_retry_at is not None or last_attempt > 1
+        return last_attempt != attempt - 1 or payment.next_retry_at is None
+
+    def process_cancelled_waiting_subscriptions(self, chunk_size: int = 1000) -> dict[str, Any]:
         """
         Обработать все подписки со статусом cancelled_waiting.
         Переводит их в статус cancelled.
 
+        Подписки переводятся пачками одним UPDATE ... RETURNING id, после каждой пачки - коммит,
+        чтобы не держать блокировки всех строк до конца обработки. Пачки выбираются, пока
+        подписки в cancelled_waiting не закончатся; если после обработки они остались
+        (ошибка пачки), их количество возвращается в remaining.
+
+        Args:
+            chunk_size: Количество подписок в одном UPDATE
+
         Returns:
             Dict с результатами обработки
         """
-        # Получаем все подписки со статусом cancelled_waiting
-        subscriptions = self.uow.subscriptions.get_subscriptions_by_status(SubscriptionStatus.cancelled_waiting.value)
+        from_status = SubscriptionStatus.cancelled_waiting.value
+        total = self.uow.subscriptions.count_subscriptions_by_status(from_status)
+        results = {"total": total, "processed": 0, "errors": []}
 
-        results = {"total": len(subscriptions), "processed": 0, "errors": []}
-
-        for subscription in subscriptions:
+        while True:
             try:
-                # Блокируем подписку
-                locked_subscription = self.uow.subscriptions.get_for_payment_with_lock(subscription.id)
-                if not locked_subscription:
-                    results["errors"].append({"subscription_id": subscription.id, "error": "subscription_not_found"})
-                    continue
-
-                # Проверяем статус (может быть изменен вручную)
-                if locked_subscription.status != SubscriptionStatus.cancelled_waiting.value:
-                    logger.info(
-                        f"Subscription {locked_subscription.id} status changed from cancelled_waiting "
-                        f"to {locked_subscription.status}, skipping"
-                    )
-                    continue
+                subscription_ids = self.uow.subscriptions.transition_status_chunk(
+                    from_status, SubscriptionStatus.cancelled.value, chunk_size
+                )
+                self.uow.commit()
+            except Exception as e:
+                logger.error(f"Error processing cancelled_waiting subscriptions chunk: {str(e)}")
+                self.uow.rollback()
+                results["errors"].append({"subscription_id": None, "error": str(e)})
+                break
 
-                # Переводим в cancelled
-                locked_subscription.status = SubscriptionStatus.cancelled.value
-                locked_subscription.updated_at = datetime.now(timezone.utc)
-                self.uow.subscriptions.update_subscription(locked_subscription)
+            if not subscription_ids:
+                break
 
-                results["processed"] += 1
-                logger.info(f"Subscription {locked_subscription.id} moved from cancelled_waiting to cancelled")
+            results["processed"] += len(subscription_ids)
+            logger.info(f"{len(subscription_ids)} subscriptions moved from cancelled_waiting to cancelled")
 
-            except Exception as e:
-                logger.error(f"Error processing cancelled_waiting subscription {subscription.id}: {str(e)}")
-                results["errors"].append({"subscription_id": subscription.id, "error": str(e)})
+        if results["processed"] < total:
+            results["remaining"] = self.uow.subscriptions.count_subscriptions_by_status(from_status)
+            if results["remaining"]:
+                logger.warning(
+                    f"{results['remaining']} of {total} cancelled_waiting subscriptions were not cancelled: {results}"
+                )
 
         return results
 
@@ -514,77 +767,39 @@ class AutoPaymentServiceSync:
             f"end_date={subscription.end_date}, status={subscription.status}"
         )
 
-    def _send_notification(self, user_id: int, message: str) -> None:
+    def _send_notification(self, user_id: int, message: str, priority: bool = False) -> None:
         """
-        Отправить уведомление пользователю в Telegram
+        Записать уведомление пользователю в outbox.
+
+        Уведомление пишется в текущую транзакцию и отправляется в Telegram задачей
+        dispatch_notification_outbox после коммита: запрос к Telegram не выполняется под
+        блокировкой подписки/платежа, а при откате транзакции уведомление не уходит.
+        Уведомления пользователя за NOTIFICATION_COALESCE_WINDOW_SECONDS отправляются одним сообщением.
+        Получатель определяется по user_id при отправке, а не при записи.
 
         Args:
-            user_id: ID пользователя (используется для получения telegram_id)
+            user_id: ID пользователя
             message: Текст сообщения
+            priority: Отправить без ожидания окна объединения (пользователю нужно действовать сразу)
         """
-        try:
-            user = self.uow.users.get_by_id(user_id)
-            if not user:
-                logger.warning(f"User {user_id} not found, cannot send notification")
-                return
-
-            if not user.telegram_id:
-                logger.warning(f"User {user_id} has no telegram_id, cannot send notification")
-                return
-
-            from app.core.telegram_notifier import telegram_notifier
+        self.uow.notification_outbox.add(user_id, message, notification_type="auto_payment", priority=priority)
 
-            success = telegram_notifier.send_notification_to_user(telegram_id=user.telegram_id, message=message)
-
-            if not success:
-                logger.warning(
-                    f"Failed to send Telegram notification to user {user_id} (telegram_id={user.telegram_id})"
-                )
-            else:
-                logger.debug(
-                    f"Telegram notification sent successfully to user {user_id} (telegram_id={user.telegram_id})"
-                )
-
-        except Exception as e:
-            logger.error(f"Error sending notification to user {user_id}: {str(e)}", exc_info=True)
-
-    def send_payment_reminder_notifications(self) -> dict[str, Any]:
+    def send_payment_reminder_notifications(self, chunk_size: int = 1000) -> dict[str, Any]:
         """
         Отправить уведомления пользователям о предстоящем платеже завтра
 
+        Данные читаются одним потоковым запросом пачками по chunk_size,
+        на каждую пачку ставится одна задача send_notifications_batch.
+
+        Args:
+            chunk_size: Количество напоминаний в одной пачке
+
         Returns:
             Dict с результатами
         """
-        subscriptions = self.uow.subscriptions.get_subscriptions_ending_tomorrow()
-
-        results = {"total": len(subscriptions), "sent": 0, "failed": 0, "errors": []}
-
-        for subscription in subscriptions:
-            try:
-                plan = self.uow.subscription_plans.get_by_id_or_raise(subscription.plan_id)
-                user = self.uow.users.get_by_id_or_raise(subscription.user_id)
-
-                if user.saved_payment_method_id:
-                    message = (
-                        f"Напоминание: завтра будет автоматически списана сумма "
-                        f"{plan.price} RUB за продление подписки. "
-                        f"Если вы хотите отменить автоплатеж, пожалуйста, сделайте это сейчас."
-                    )
-                else:
-                    message = (
-                        f"Напоминание: завтра истекает ваша подписка. "
-                        f"Для продления необходимо будет создать новый платеж на сумму "
-                        f"{plan.price} RUB."
-                    )
-
-                self._send_notification(subscription.user_id, message)
-                results["sent"] += 1
-
-            except Exception as e:
-                logger.error(f"Error sending reminder for subscription {subscription.id}: {str(e)}")
-                results["failed"] += 1
-                results["errors"].append({"subscription_id": subscription.id, "error": str(e)})
-
+        results = {"total": 0, "sent": 0, "failed": 0, "errors": []}
+        for rows in self.uow.subscriptions.iter_reminder_rows_ending_tomorrow(chunk_size):
+            dispatch_reminder_rows(rows, results)
         return results
 
     def _was_promotion_applied_today(self, subscription: Subscription) -> bool:
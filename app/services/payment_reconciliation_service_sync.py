@@ -0,0 +1,91 @@
+"""
+Синхронный сервис сверки статусов платежей с Юкассой.
+Используется в Celery задачах.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any
+
+from app.core.enums import PaymentStatus
+from app.core.logger import logger
+from app.database.sync_unit_of_work import SyncUnitOfWork
+
+# Статусы, в которых платеж может "зависнуть", если webhook не дошел
+UNSETTLED_PAYMENT_STATUSES = (PaymentStatus.pending.value, PaymentStatus.waiting_for_capture.value)
+
+# Статусы Юкассы, которые в БД хранятся иначе
+YOOKASSA_STATUS_MAPPING = {"canceled": PaymentStatus.cancelled.value}
+
+# Запас интервала запроса к Юкассе: платеж создается в Юкассе и в БД не в одну и ту же секунду
+CREATED_AT_MARGIN = timedelta(minutes=10)
+
+
+class PaymentReconciliationServiceSync:
+    """Сверка незавершенных платежей со списком платежей Юкассы (для Celery)"""
+
+    def __init__(self, uow: SyncUnitOfWork):
+        self.uow = uow
+
+    def reconcile(self, created_from: datetime, created_to: datetime) -> dict[str, Any]:
+        """
+        Сверить платежи, созданные в интервале [created_from, created_to).
+
+        Логика:
+        1. Загрузить из БД незавершенные платежи интервала: {yookassa_payment_id: (id, status)}
+        2. Постранично (по курсору) получить список платежей Юкассы за тот же интервал
+        3. Сравнить статусы в памяти и сгруппировать ID платежей по новому статусу
+        4. Применить исправления одним UPDATE на каждый статус, кроме succeeded
+
+        Платежи, перешедшие в succeeded, здесь не обновляются: их статус вместе с активацией/продлением
+        подписки меняет обработка webhook payment.succeeded в своей транзакции. Если она не удалась,
+        платеж остается незавершенным и будет сверен снова.
+
+        Вместо запроса get_payment на каждый платеж - один запрос на страницу из 100 платежей.
+        Платежи в финальном статусе сохраняются в кэш платежей Юкассы (в iter_payments).
+
+        Args:
+            created_from: Начало интервала
+            created_to: Конец интервала
+
+        Returns:
+            Dict со статистикой: unsettled, scanned, updated по статусам (без succeeded) и succeeded -
+            объекты платежей Юкассы, перешедших в succeeded (для обработки как webhook)
+        """
+        unsettled = self.uow.payments.get_unsettled_payments_created_between(
+            created_from, created_to, UNSETTLED_PAYMENT_STATUSES
+        )
+        result: dict[str, Any] = {"unsettled": len(unsettled), "scanned": 0, "updated": {}, "succeeded": []}
+        if not unsettled:
+            return result
+
+        corrections: dict[str, list[int]] = defaultdict(list)
+        for item in self.uow.yookassa_client.iter_payments(
+            created_from - CREATED_AT_MARGIN, created_to + CREATED_AT_MARGIN
+        ):
+            result["scanned"] += 1
+            local = unsettled.get(item.get("id"))
+            if local is None:
+                continue
+
+            payment_id, status = local
+            new_status = YOOKASSA_STATUS_MAPPING.get(item["status"], item["status"])
+            if new_status == status:
+                continue
+
+            if new_status == PaymentStatus.succeeded.value:
+                result["succeeded"].append(item)
+            else:
+                corrections[new_status].append(payment_id)
+
+        for new_status, payment_ids in corrections.items():
+            result["updated"][new_status] = self.uow.payments.bulk_update_status(
+                payment_ids, new_status, UNSETTLED_PAYMENT_STATUSES
+            )
+
+        logger.info(
+            f"Reconciled payments created {created_from.isoformat()} - {created_to.isoformat()}: "
+            f"unsettled={result['unsettled']}, scanned={result['scanned']}, updated={result['updated']}, "
+            f"succeeded={len(result['succeeded'])}"
+        )
+        return result
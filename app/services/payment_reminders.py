@@ -0,0 +1,54 @@
+"""
+Напоминания о завтрашнем платеже - общая часть AutoPaymentService и AutoPaymentServiceSync
+"""
+
+from collections.abc import Sequence
+from typing import Any
+
+from app.core.logger import logger
+
+
+def build_reminder_message(price: float, has_saved_method: bool) -> str:
+    """Сформировать текст напоминания о завтрашнем платеже"""
+    if has_saved_method:
+        return (
+            f"Напоминание: завтра будет автоматически списана сумма "
+            f"{price} RUB за продление подписки. "
+            f"Если вы хотите отменить автоплатеж, пожалуйста, сделайте это сейчас."
+        )
+    return (
+        f"Напоминание: завтра истекает ваша подписка. "
+        f"Для продления необходимо будет создать новый платеж на сумму "
+        f"{price} RUB."
+    )
+
+
+def dispatch_reminder_rows(rows: Sequence[Any], results: dict[str, Any]) -> None:
+    """
+    Поставить одну задачу send_notifications_batch на пачку напоминаний.
+
+    Args:
+        rows: Строки iter_reminder_rows_ending_tomorrow (subscription_id, telegram_id, price, has_saved_method)
+        results: Счетчики send_payment_reminder_notifications (обновляются)
+    """
+    from app.tasks.notification import send_notifications_batch
+
+    results["total"] += len(rows)
+    messages = []
+    for row in rows:
+        if not row.telegram_id:
+            results["failed"] += 1
+            results["errors"].append({"subscription_id": row.subscription_id, "error": "no_telegram_id"})
+            continue
+        messages.append([row.telegram_id, build_reminder_message(row.price, row.has_saved_method)])
+
+    if not messages:
+        return
+
+    try:
+        send_notifications_batch.delay(messages, "payment_reminder")
+        results["sent"] += len(messages)
+    except Exception as e:
+        logger.error(f"Error dispatching reminders batch: {str(e)}")
+        results["failed"] += len(messages)
+        results["errors"].append({"subscription_id": None, "error": str(e)})
@@ -8,6 +8,7 @@ from typing import Any
 
 from app.core.enums import PaymentStatus, SubscriptionStatus
 from app.core.logger import logger
+from app.core.webhook_deduplicator import get_webhook_event_key
 from app.models import Payment, Refund
 from app.schemas.payment import PaymentCreateRequest, PaymentCreateResponse
 from app.schemas.refund import RefundResponse
@@ -46,7 +47,7 @@ class PaymentService(BaseService):
             return_url=payment_request.return_url,
         )
 
-        yookassa_payment = self.uow.yookassa_client.create_payment(
+        yookassa_payment = await self.uow.yookassa_client.create_payment(
             request=create_payment_request, idempotency_key=idempotency_key
         )
 
@@ -97,7 +98,7 @@ class PaymentService(BaseService):
             return_url=payment_request.return_url,
         )
 
-        yookassa_payment = self.uow.yookassa_client.create_payment_two_stage(
+        yookassa_payment = await self.uow.yookassa_client.create_payment_two_stage(
             request=create_payment_request, idempotency_key=idempotency_key
         )
 
@@ -143,7 +144,7 @@ class PaymentService(BaseService):
 
         # Проводим платеж в Юкассе
         idempotency_key = str(uuid.uuid4())
-        yookassa_payment = self.uow.yookassa_client.capture_payment(
+        yookassa_payment = await self.uow.yookassa_client.capture_payment(
             payment_id=db_payment.yookassa_payment_id, idempotency_key=idempotency_key
         )
 
@@ -288,7 +289,7 @@ class PaymentService(BaseService):
 
         # Отменяем платеж в Юкассе
         idempotency_key = str(uuid.uuid4())
-        self.uow.yookassa_client.cancel_payment(
+        await self.uow.yookassa_client.cancel_payment(
             payment_id=db_payment.yookassa_payment_id, idempotency_key=idempotency_key
         )
 
@@ -307,6 +308,7 @@ class PaymentService(BaseService):
         """
         Обработать webhook от Юкассы о статусе платежа или возврата.
         Обрабатывает одностадийные платежи и возвраты.
+        Повторы события (object.id, event, status) отбрасываются (см. app/core/webhook_deduplicator.py).
 
         Args:
             webhook_data: Данные webhook от Юкассы
@@ -316,8 +318,15 @@ class PaymentService(BaseService):
         """
         from app.core.logger import logger
 
-        # Логируем входящий webhook для отладки
         event = webhook_data.get("event")
+
+        # Повторная доставка уже обработанного (или обрабатываемого) события отбрасывается до обращения к БД
+        event_key = get_webhook_event_key(webhook_data)
+        if event_key is not None and not await self.uow.processed_webhook_events.claim(event_key):
+            logger.info(f"Duplicate webhook suppressed: event={event}, object_id={event_key[0]}, status={event_key[2]}")
+            return {"status": "ok", "message": "Duplicate webhook"}
+
+        # Логируем входящий webhook для отладки
         logger.info(f"Processing webhook: event={event}, data={webhook_data}")
 
         # Обработка webhook для возвратов
@@ -610,7 +619,7 @@ class PaymentService(BaseService):
             return_url=return_url,
         )
 
-        yookassa_payment = self.uow.yookassa_client.create_payment(
+        yookassa_payment = await self.uow.yookassa_client.create_payment(
             request=create_payment_request, idempotency_key=idempotency_key
         )
 
@@ -793,7 +802,7 @@ class PaymentService(BaseService):
         # Создаем возврат через YooKassa
         idempotency_key = str(uuid.uuid4())
         try:
-            refund_response = self.uow.yookassa_client.create_refund(
+            refund_response = await self.uow.yookassa_client.create_refund(
                 payment_id=payment.yookassa_payment_id,
                 amount=amount,
                 idempotency_key=idempotency_key,
@@ -118,7 +118,7 @@ class SubscriptionOrchestratorService(BaseService):
             amount_value=str(plan.price), description=description, return_url=request.return_url
         )
 
-        yookassa_payment = self.uow.yookassa_client.create_payment(
+        yookassa_payment = await self.uow.yookassa_client.create_payment(
             request=yookassa_request, idempotency_key=idempotency_key
         )
 
@@ -5,17 +5,26 @@ Auto Payment Celery tasks - задачи для автоматических п
 Используют SyncUnitOfWork и синхронные репозитории.
 """
 
+import time
+from collections.abc import Sequence
 from datetime import datetime, timezone
-from typing import Any
+from typing import Any, Optional
 
 from app.celery_app import celery_app
 from app.core.auto_payment_config import auto_payment_config
 from app.core.clients.yookassa_client import yookassa_client
+from app.core.config import settings
 from app.core.database import db_manager
+from app.core.exceptions import YookassaUnavailable
 from app.core.logger import logger
 from app.core.redis_client import redis_client
+from app.core.renewal_pacer import RenewalPacer
 from app.database.sync_unit_of_work import SyncUnitOfWork
 from app.services.auto_payment_service_sync import AutoPaymentServiceSync
+from app.tasks.utils import yookassa_retry_countdown
+
+# Максимальное время одного цикла захвата подписок (после - задача перезапускает себя)
+CLAIM_LOOP_MAX_SECONDS = 300
 
 
 # Условный декоратор для задач Celery
@@ -45,30 +54,75 @@ def collect_subscriptions_for_payment(self) -> dict[str, Any]:
     Периодическая задача для сбора подписок, которые требуют платежа сегодня.
     Запускается ежедневно в начале дня (по расписанию из конфига).
 
-    Собирает все активные подписки с end_date сегодня, сохраняет их ID в Redis,
-    и запускает обработку для каждой подписки отдельной задачей.
+    Собирает все активные подписки с end_date сегодня, сохраняет их ID в Redis
+    и запускает их обработку.
+
+    В режиме пачек (chunked_mode в auto_payment_config) ID читаются страницами
+    по keyset-курсору, и на каждую пачку из chunk_size подписок ставится одна задача
+    process_subscription_chunk. Пачки ставятся в очередь в Redis, запускается chunk_concurrency
+    пачек, и каждая завершенная (в том числе упавшая после всех повторов) пачка запускает
+    следующую - одновременно обрабатывается не больше chunk_concurrency пачек.
+    Без режима пачек - одна задача process_single_subscription_payment на подписку.
+
+    В режиме захвата (claim_mode) подписки не собираются заранее: запускается
+    chunk_concurrency задач claim_subscriptions_for_payment, которые сами захватывают
+    подписки из БД через FOR UPDATE SKIP LOCKED. Redis для координации не используется.
+
+    Если задана target_rate_per_second, списания распределяются по времени (RenewalPacer):
+    подписки (пачки) ставятся в очередь запуска в Redis, и их запускает периодическая задача
+    dispatch_paced_renewals, а воркеры захвата откладывают следующую пачку через countdown.
+    Прогресс и прогноз завершения - GET /auto-payments/pacing-status.
 
     СИНХРОННАЯ задача - использует SyncUnitOfWork и синхронные репозитории.
 
     Returns:
         Dict с результатами сбора
     """
-    session = db_manager.get_sync_session()
-
     try:
+        config = auto_payment_config.get_config()
+        today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        pacer = RenewalPacer(config)
+
+        session = db_manager.get_sync_session()
         with SyncUnitOfWork(session, yookassa_client) as uow:
+            if config["claim_mode"]:
+                total = uow.subscriptions.count_due_subscriptions()
+                pacer.start_run(today_str, total)
+                redis_client.start_run(today_str, pending=total)
+                for _ in range(config["chunk_concurrency"]):
+                    claim_subscriptions_for_payment.delay()
+
+                result = {
+                    "total": total,
+                    "date": today_str,
+                    "claim_workers": config["chunk_concurrency"],
+                    "batch_size": config["chunk_size"],
+                }
+                logger.info(f"Started claim workers for payment processing: {result}")
+                return result
+
+            if config["chunked_mode"]:
+                return _dispatch_subscription_chunks(
+                    uow, today_str, pacer, chunk_size=config["chunk_size"], concurrency=config["chunk_concurrency"]
+                )
+
             # Получаем все подписки, которые заканчиваются сегодня
             subscriptions = uow.subscriptions.get_subscriptions_ending_today()
 
-            subscription_ids = [sub.id for sub in subscriptions]
-
-            # Сохраняем в Redis
-            today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-            redis_client.add_subscriptions_for_date(subscription_ids, today_str)
-
-            # Запускаем обработку для каждой подписки отдельной задачей
-            for subscription_id in subscription_ids:
-                process_single_subscription_payment.delay(subscription_id)
+            # Сохраняем в Redis; при повторном запуске остаются только необработанные
+            redis_client.start_run(today_str)
+            subscription_ids = redis_client.add_unfinished_subscriptions_for_date(
+                [sub.id for sub in subscriptions], today_str
+            )
+            pacer.start_run(today_str, len(subscription_ids), batches=[[sid] for sid in subscription_ids])
+
+            if pacer.enabled:
+                # Темп задан: подписки запускает dispatch_paced_renewals
+                dispatch_paced_renewals.delay()
+            else:
+                # Запускаем обработку для каждой подписки отдельной задачей
+                for subscription_id in subscription_ids:
+                    process_single_subscription_payment.delay(subscription_id)
 
             result = {
                 "total": len(subscription_ids),
@@ -84,6 +138,312 @@ def collect_subscriptions_for_payment(self) -> dict[str, Any]:
         raise self.retry(exc=e, countdown=300)
 
 
+def _dispatch_subscription_chunks(
+    uow: SyncUnitOfWork, today_str: str, pacer: RenewalPacer, chunk_size: int, concurrency: int
+) -> dict[str, Any]:
+    """
+    Собрать ID подписок страницами и запустить их обработку пачками.
+
+    Args:
+        uow: SyncUnitOfWork для чтения ID
+        today_str: Дата в формате YYYY-MM-DD
+        pacer: Планировщик темпа (если включен - пачки запускает dispatch_paced_renewals)
+        chunk_size: Количество подписок в одной пачке
+        concurrency: Количество пачек, обрабатываемых одновременно
+
+    Returns:
+        Dict с результатами сбора
+    """
+    chunks: list[list[int]] = []
+    last_id = 0
+    redis_client.start_run(today_str)
+
+    # Keyset-пагинация: каждая страница - одна пачка (без уже обработанных при повторном запуске)
+    while True:
+        subscription_ids = uow.subscriptions.get_subscription_ids_ending_today(after_id=last_id, limit=chunk_size)
+        if not subscription_ids:
+            break
+
+        last_id = subscription_ids[-1]
+        unfinished_ids = redis_client.add_unfinished_subscriptions_for_date(subscription_ids, today_str)
+        if unfinished_ids:
+            chunks.append(unfinished_ids)
+
+        if len(subscription_ids) < chunk_size:
+            break
+
+    total = sum(len(chunk_ids) for chunk_ids in chunks)
+    pacer.start_run(today_str, total, batches=chunks)
+
+    if pacer.enabled:
+        # Темп задан: пачка стартует, когда до нее доходит очередь при целевой скорости
+        dispatch_paced_renewals.delay()
+    else:
+        # Очередь пачек: не больше concurrency пачек одновременно, следующую запускает завершенная пачка
+        redis_client.push_subscription_chunks(chunks, today_str)
+        for _ in range(min(concurrency, len(chunks))):
+            _dispatch_next_subscription_chunk(today_str)
+
+    result = {
+        "total": total,
+        "collected": total,
+        "date": today_str,
+        "chunks": len(chunks),
+        "chunk_size": chunk_size,
+        "concurrency": concurrency,
+    }
+
+    logger.info(f"Collected {total} subscriptions in {len(chunks)} chunks for payment processing: {result}")
+    return result
+
+
+@task_decorator(name="app.tasks.auto_payment.dispatch_paced_renewals")
+def dispatch_paced_renewals() -> dict[str, Any]:
+    """
+    Запустить подписки из очереди темпа (RenewalPacer), время которых наступило.
+    Запускается beat-ом раз в AUTO_PAYMENT_PACING_TICK_SECONDS; без плана с очередью ничего не делает.
+
+    Пачка из одной подписки (поштучный режим) запускается process_single_subscription_payment,
+    пачка - process_subscription_chunk. После конца окна оставшиеся подписки не запускаются
+    и остаются необработанными в журнале запуска.
+
+    Returns:
+        Dict с количеством запущенных пачек и подписок, не запущенных из-за конца окна
+    """
+    today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    lock_key = f"{RenewalPacer.REDIS_KEY_PREFIX}:dispatch_lock"
+    try:
+        if not redis_client.client.set(lock_key, "1", nx=True, ex=60):
+            return {"dispatched": 0, "not_dispatched": 0}
+        try:
+            batches, not_dispatched = RenewalPacer.take_due(today_str)
+        finally:
+            redis_client.client.delete(lock_key)
+    except Exception as e:
+        logger.error(f"Error taking paced renewals from Redis: {str(e)}", exc_info=True)
+        return {"dispatched": 0, "not_dispatched": 0}
+
+    for batch in batches:
+        if len(batch) == 1:
+            process_single_subscription_payment.delay(batch[0])
+        else:
+            process_subscription_chunk.delay(batch)
+
+    if not_dispatched:
+        logger.error(f"Auto payment window ended, {not_dispatched} subscriptions for {today_str} were not dispatched")
+    return {"dispatched": len(batches), "not_dispatched": not_dispatched}
+
+
+def _record_run_progress(today_str: str, subscription_ids: Sequence[int], results: dict[str, Any]) -> None:
+    """
+    Записать результаты обработки подписок в журнал дневного запуска.
+
+    Args:
+        today_str: Дата в формате YYYY-MM-DD
+        subscription_ids: ID обработанных подписок (убираются из набора ожидающих)
+        results: Результаты обработки с ключом "results" - {subscription_id: result}
+    """
+    charged = skipped = failed = notified = 0
+    for result in results["results"].values():
+        if result.get("deferred"):
+            # Отложена до восстановления API Юкассы - остается в наборе ожидающих
+            continue
+        if result.get("skipped"):
+            skipped += 1
+        elif result.get("success"):
+            charged += 1
+        else:
+            failed += 1
+        if result.get("confirmation_url"):
+            notified += 1
+
+    redis_client.record_run_progress(
+        today_str, subscription_ids, charged=charged, skipped=skipped, failed=failed, notified=notified
+    )
+
+
+def _dispatch_next_subscription_chunk(today_str: str) -> bool:
+    """
+    Запустить следующую пачку из очереди пачек за дату.
+
+    Args:
+        today_str: Дата в формате YYYY-MM-DD
+
+    Returns:
+        True - пачка запущена, False - очередь пуста
+    """
+    chunk_ids = redis_client.pop_subscription_chunk(today_str)
+    if not chunk_ids:
+        return False
+    process_subscription_chunk.delay(chunk_ids, queue_date=today_str)
+    return True
+
+
+@task_decorator(
+    name="app.tasks.auto_payment.process_subscription_chunk",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=300,
+    acks_late=True,
+)
+def process_subscription_chunk(self, subscription_ids: list[int], queue_date: Optional[str] = None) -> dict[str, Any]:
+    """
+    Обработать пачку подписок в одной задаче.
+
+    Использует одну сессию SyncUnitOfWork на всю пачку и
+    AutoPaymentServiceSync.process_subscription_batch: предзагрузка подписок, пользователей
+    и планов, блокировка и коммит по одной подписке (строка не заблокирована дольше одного
+    запроса к Юкассе). Первые попытки автосписания запускаются после обработки пачки.
+
+    Пачка из очереди пачек (queue_date) после завершения - успешного или после всех
+    повторов - запускает следующую пачку очереди, поэтому упавшая пачка не останавливает остальные.
+
+    СИНХРОННАЯ задача - использует SyncUnitOfWork и синхронные репозитории.
+
+    Args:
+        subscription_ids: ID подписок для обработки
+        queue_date: Дата очереди пачек (YYYY-MM-DD), если пачка запущена из очереди
+
+    Returns:
+        Dict с результатами обработки пачки
+    """
+    session = db_manager.get_sync_session()
+    today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    try:
+        with SyncUnitOfWork(session, yookassa_client) as uow:
+            service = AutoPaymentServiceSync(uow)
+            results = service.process_subscription_batch(subscription_ids)
+
+        # Пачка закоммичена - можно запускать первые попытки автосписания
+        for result in results["results"].values():
+            if result.get("success") and result.get("needs_retry") and result.get("payment_id"):
+                retry_auto_payment_attempt.apply_async(args=[result["payment_id"], 1], countdown=0)
+
+        deferred_ids = [sid for sid, result in results["results"].items() if result.get("deferred")]
+        done_ids = list(set(subscription_ids) - set(deferred_ids))
+        _record_run_progress(today_str, done_ids, results)
+        RenewalPacer.mark_done(today_str, len(done_ids))
+
+        summary = {key: value for key, value in results.items() if key != "results"}
+        logger.info(f"Processed subscription chunk of {len(subscription_ids)}: {summary}")
+
+    except Exception as e:
+        logger.error(f"Error processing subscription chunk: {str(e)}", exc_info=True)
+        if queue_date and self.request.retries >= self.max_retries:
+            # Повторов не осталось - пачка не должна останавливать очередь
+            _dispatch_next_subscription_chunk(queue_date)
+        raise self.retry(exc=e, countdown=300, args=[subscription_ids])
+
+    if deferred_ids:
+        # API Юкассы недоступно: откладываем необработанные подписки, не занимая воркер ожиданием
+        logger.warning(f"YooKassa unavailable, {len(deferred_ids)} subscriptions of chunk deferred")
+        if queue_date and self.request.retries >= settings.YOOKASSA_CIRCUIT_MAX_DEFERRALS:
+            _dispatch_next_subscription_chunk(queue_date)
+        raise self.retry(
+            args=[deferred_ids],
+            countdown=yookassa_retry_countdown(results["retry_after"]),
+            max_retries=settings.YOOKASSA_CIRCUIT_MAX_DEFERRALS,
+        )
+
+    if queue_date:
+        _dispatch_next_subscription_chunk(queue_date)
+    return summary
+
+
+@task_decorator(
+    name="app.tasks.auto_payment.claim_subscriptions_for_payment",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60,
+    acks_late=True,
+)
+def claim_subscriptions_for_payment(self) -> dict[str, Any]:
+    """
+    Цикл захвата подписок для автоплатежа (режим claim_mode).
+
+    Воркер в цикле захватывает следующие chunk_size подписок к оплате через
+    FOR UPDATE SKIP LOCKED, обрабатывает их и коммитит - одна транзакция на пачку.
+    Несколько таких задач (на любых узлах) работают параллельно без дублей
+    и без ожидания блокировок друг друга.
+
+    Цикл завершается, когда подписок к оплате не осталось. Если цикл работает дольше
+    CLAIM_LOOP_MAX_SECONDS, задача ставит себя в очередь заново и завершается,
+    чтобы не держать слот воркера бесконечно. С включенным темпом задача после пачки
+    ставит себя в очередь с паузой (countdown) вместо ожидания в воркере и не захватывает
+    подписки после конца окна.
+
+    СИНХРОННАЯ задача - использует SyncUnitOfWork и синхронные репозитории.
+
+    Returns:
+        Dict с результатами обработки
+    """
+    started_at = time.monotonic()
+    totals = {"batches": 0, "total": 0, "processed": 0, "skipped": 0, "failed": 0}
+    retry_after = 0.0
+    config = auto_payment_config.get_config()
+    batch_size = config["chunk_size"]
+    pacer = RenewalPacer(config)
+
+    try:
+        while True:
+            if pacer.enabled and pacer.window_closed():
+                logger.error(f"Auto payment window ended at {pacer.window_end}, claim loop stopped: {totals}")
+                return totals
+
+            batch_started_at = time.monotonic()
+            session = db_manager.get_sync_session()
+            with SyncUnitOfWork(session, yookassa_client) as uow:
+                service = AutoPaymentServiceSync(uow)
+                results = service.claim_and_process_batch(batch_size)
+
+            if not results["total"]:
+                break
+
+            # Пачка закоммичена - можно запускать первые попытки автосписания
+            for result in results["results"].values():
+                if result.get("success") and result.get("needs_retry") and result.get("payment_id"):
+                    retry_auto_payment_attempt.apply_async(args=[result["payment_id"], 1], countdown=0)
+
+            totals["batches"] += 1
+            for key in ("total", "processed", "skipped", "failed"):
+                totals[key] += results[key]
+            today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+            _record_run_progress(today_str, (), results)
+            RenewalPacer.mark_done(today_str, results["total"] - results["deferred"])
+
+            if results["deferred"]:
+                # API Юкассы недоступно: отложенные подписки не отмечены обработанными и будут захвачены снова
+                retry_after = results["retry_after"]
+                break
+
+            # Темп: воркеры делят целевую скорость поровну, следующая пачка - после паузы без занятия слота воркера
+            pause = pacer.seconds_per_batch(results["total"], config["chunk_concurrency"]) - (
+                time.monotonic() - batch_started_at
+            )
+            if pause > 0:
+                claim_subscriptions_for_payment.apply_async(countdown=pause)
+                return totals
+
+            if time.monotonic() - started_at > CLAIM_LOOP_MAX_SECONDS:
+                claim_subscriptions_for_payment.delay()
+                logger.info(f"Claim loop time budget exceeded, re-enqueued: {totals}")
+                return totals
+
+    except Exception as e:
+        logger.error(f"Error in claim_subscriptions_for_payment task: {str(e)}", exc_info=True)
+        raise self.retry(exc=e, countdown=60)
+
+    if retry_after:
+        logger.warning(f"YooKassa unavailable, claim loop paused for {retry_after:.1f}s: {totals}")
+        raise self.retry(
+            countdown=yookassa_retry_countdown(retry_after), max_retries=settings.YOOKASSA_CIRCUIT_MAX_DEFERRALS
+        )
+
+    logger.info(f"Claim loop finished, no due subscriptions left: {totals}")
+    return totals
+
+
 @task_decorator(
     name="app.tasks.auto_payment.process_single_subscription_payment",
     bind=True,
@@ -124,12 +484,22 @@ def process_single_subscription_payment(self, subscription_id: int) -> dict[str,
                 retry_auto_payment_attempt.apply_async(args=[result["payment_id"], 1], countdown=0)
                 logger.info(f"Scheduled first auto payment attempt for payment {result['payment_id']}")
 
-            # Удаляем из Redis после обработки
-            redis_client.remove_subscription(subscription_id, today_str)
+            # Удаляем из Redis после обработки и записываем в журнал запуска
+            _record_run_progress(today_str, [subscription_id], {"results": {subscription_id: result}})
+            RenewalPacer.mark_done(today_str)
 
             logger.info(f"Processed subscription {subscription_id}: {result}")
             return result
 
+    except YookassaUnavailable as e:
+        # Подписка остается в наборе ожидающих, задача повторится после восстановления API
+        logger.warning(f"YooKassa unavailable, subscription {subscription_id} deferred: {e}")
+        raise self.retry(
+            exc=e,
+            countdown=yookassa_retry_countdown(e.retry_after),
+            args=[subscription_id],
+            max_retries=settings.YOOKASSA_CIRCUIT_MAX_DEFERRALS,
+        )
     except Exception as e:
         logger.error(f"Error processing subscription {subscription_id}: {str(e)}", exc_info=True)
         # Удаляем из Redis даже при ошибке, чтобы не застрять
@@ -148,12 +518,13 @@ def retry_auto_payment_attempt(self, payment_id: int, attempt: int) -> dict[str,
     """
     Попытка автосписания для платежа.
 
-    Запускается для каждой попытки автосписания (с интервалом из конфига).
+    Первая попытка запускается сразу после создания платежа, следующие - задачей
+    app.tasks.payment.retry_failed_payments по payment.next_retry_at.
 
     Логика:
     - Делает попытку автосписания через YooKassa
     - При успехе: продлевает подписку, отправляет уведомление
-    - При неудаче и attempt < MAX: запускает следующую попытку через apply_async с countdown
+    - При неудаче и attempt < MAX: записывает next_retry_at = now + retry_interval_seconds
     - При неудаче и attempt == MAX: ставит cancelled_waiting, отправляет уведомление
 
     СИНХРОННАЯ задача - использует SyncUnitOfWork и синхронные репозитории.
@@ -170,26 +541,25 @@ def retry_auto_payment_attempt(self, payment_id: int, attempt: int) -> dict[str,
     try:
         with SyncUnitOfWork(session, yookassa_client) as uow:
             service = AutoPaymentServiceSync(uow)
-            result = service.retry_auto_payment_attempt(payment_id, attempt)
-
-            # Если неудача и есть еще попытки - запускаем следующую
-            if not result.get("success") and not result.get("final"):
-                next_attempt = attempt + 1
-                # Получаем настройки из Redis (с fallback на settings)
-                config = auto_payment_config.get_config()
-                max_attempts = config["max_attempts"]
-                retry_interval = config["retry_interval_seconds"]
-
-                if next_attempt <= max_attempts:
-                    # Запускаем следующую попытку через интервал
-                    retry_auto_payment_attempt.apply_async(args=[payment_id, next_attempt], countdown=retry_interval)
-                    logger.info(
-                        f"Scheduled next attempt {next_attempt} for payment {payment_id} in {retry_interval} seconds"
-                    )
+            # Следующая попытка (если нужна) планируется через next_retry_at, без countdown-задач
+            result = service.run_auto_payment_attempt(payment_id, attempt)
+
+            # Финальный результат (продление или исчерпание попыток) сопровождается уведомлением
+            if result.get("final"):
+                redis_client.record_run_progress(datetime.now(timezone.utc).strftime("%Y-%m-%d"), notified=1)
 
             logger.info(f"Auto payment attempt {attempt} for payment {payment_id}: {result}")
             return result
 
+    except YookassaUnavailable as e:
+        # Попытка не израсходована (транзакция откачена) - повторяем ее после восстановления API
+        logger.warning(f"YooKassa unavailable, auto payment attempt {attempt} for payment {payment_id} deferred: {e}")
+        raise self.retry(
+            exc=e,
+            countdown=yookassa_retry_countdown(e.retry_after),
+            args=[payment_id, attempt],
+            max_retries=settings.YOOKASSA_CIRCUIT_MAX_DEFERRALS,
+        )
     except Exception as e:
         logger.error(
             f"Error in retry_auto_payment_attempt for payment {payment_id}, attempt {attempt}: {str(e)}", exc_info=True
@@ -210,6 +580,7 @@ def process_cancelled_waiting_subscriptions(self) -> dict[str, Any]:
     Запускается ежедневно в конце дня (по расписанию из конфига).
 
     Переводит все подписки со статусом cancelled_waiting в cancelled.
+    Если часть подписок перевести не удалось, задача повторяется (обрабатывает только оставшиеся).
 
     СИНХРОННАЯ задача - использует SyncUnitOfWork и синхронные репозитории.
 
@@ -224,12 +595,15 @@ def process_cancelled_waiting_subscriptions(self) -> dict[str, Any]:
             result = service.process_cancelled_waiting_subscriptions()
 
             logger.info(f"Cancelled waiting subscriptions processed: {result}")
-            return result
 
     except Exception as e:
         logger.error(f"Error in process_cancelled_waiting_subscriptions task: {str(e)}", exc_info=True)
         raise self.retry(exc=e, countdown=300)
 
+    if result.get("remaining"):
+        raise self.retry(countdown=300)
+    return result
+
 
 @task_decorator(
     name="app.tasks.auto_payment.send_payment_reminders",
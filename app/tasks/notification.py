@@ -2,11 +2,17 @@
 Notification-related Celery tasks
 """
 
+from collections import Counter
+from typing import Optional
+
 from app.celery_app import celery_app
 from app.core.clients.yookassa_client import yookassa_client
+from app.core.config import settings
 from app.core.database import db_manager
 from app.core.logger import logger
+from app.core.redis_client import redis_client
 from app.database.sync_unit_of_work import SyncUnitOfWork
+from app.tasks.utils import run_async
 
 # Логируем импорт модуля
 logger.info("[NOTIFICATION MODULE] Module app.tasks.notification imported")
@@ -45,7 +51,9 @@ else:
     default_retry_delay=60,
     acks_late=True,
 )
-def send_notification(self, user_id: int, message: str, notification_type: str = "info"):
+def send_notification(
+    self, user_id: int, message: str, notification_type: str = "info", telegram_id: Optional[int] = None
+):
     """
     Отправить уведомление пользователю через Telegram
 
@@ -53,6 +61,7 @@ def send_notification(self, user_id: int, message: str, notification_type: str =
         user_id: ID пользователя
         message: Текст сообщения
         notification_type: Тип уведомления (для логирования)
+        telegram_id: Telegram ID, если известен вызывающему коду (иначе берется из кэша, при промахе - из БД)
     """
     if hasattr(self, "request"):
         logger.debug(f"[NOTIFICATION MODULE] Task executed as Celery task: {self.request.id}")
@@ -73,58 +82,238 @@ def send_notification(self, user_id: int, message: str, notification_type: str =
         logger.error(f"[NOTIFICATION] [PID {pid}] Failed to load settings: {e}", exc_info=True)
 
     try:
-        logger.info("[NOTIFICATION] Getting sync session...")
-        session = db_manager.get_sync_session()
-        logger.info("[NOTIFICATION] Session obtained successfully")
+        if telegram_id is None:
+            logger.info("[NOTIFICATION] Getting sync session...")
+            session = db_manager.get_sync_session()
+            try:
+                with SyncUnitOfWork(session, yookassa_client) as uow:
+                    logger.info(f"[NOTIFICATION] Resolving telegram_id of user {user_id}...")
+                    telegram_id = uow.users.get_telegram_id(user_id)
+            finally:
+                session.close()
+
+        if not telegram_id:
+            logger.warning(f"[NOTIFICATION] User {user_id} not found or has no telegram_id, cannot send notification")
+            return False
+
+        logger.info("[NOTIFICATION] Importing telegram_notifier...")
+        from app.core.telegram_notifier import telegram_notifier
+
+        logger.info("[NOTIFICATION] telegram_notifier imported successfully")
+
+        logger.info(f"[NOTIFICATION] Sending message to telegram_id={telegram_id}, message_length={len(message)}")
+        success = telegram_notifier.send_notification_to_user(telegram_id=telegram_id, message=message)
+
+        if success:
+            logger.info(
+                f"[NOTIFICATION] Sent successfully to user {user_id} "
+                f"(telegram_id={telegram_id}, type={notification_type})"
+            )
+        else:
+            logger.warning(
+                f"[NOTIFICATION] Failed to send to user {user_id} "
+                f"(telegram_id={telegram_id}, type={notification_type})"
+            )
 
-        try:
-            logger.info("[NOTIFICATION] Creating SyncUnitOfWork...")
-            with SyncUnitOfWork(session, yookassa_client) as uow:
-                logger.info(f"[NOTIFICATION] SyncUnitOfWork created, getting user {user_id}...")
-                user = uow.users.get_by_id(user_id)
+        return success
 
-                if not user:
-                    logger.warning(f"[NOTIFICATION] User {user_id} not found, cannot send notification")
-                    return False
+    except Exception as e:
+        logger.error(f"[NOTIFICATION] Error sending notification to user {user_id}: {str(e)}", exc_info=True)
+        # Повторяем попытку при ошибке
+        raise self.retry(exc=e, countdown=60)
 
-                logger.info(f"[NOTIFICATION] User found: id={user.id}, telegram_id={user.telegram_id}")
 
-                if not user.telegram_id:
-                    logger.warning(f"[NOTIFICATION] User {user_id} has no telegram_id, cannot send notification")
-                    return False
+@task_decorator(
+    name="app.tasks.notification.send_notifications_batch",
+    bind=True,
+    acks_late=True,
+)
+def send_notifications_batch(self, messages: list[list], notification_type: str = "info") -> dict:
+    """
+    Отправить пачку уведомлений в Telegram одной задачей.
 
-                logger.info("[NOTIFICATION] Importing telegram_notifier...")
-                from app.core.telegram_notifier import telegram_notifier
+    Получатели уже известны по telegram_id, поэтому пользователи из БД не загружаются.
+    Сообщения отправляются параллельно через AsyncTelegramSender (общий лимит бота и лимит на чат),
+    ожидание лимитов не блокирует воркер.
+    Задача не повторяется целиком: неудачные отправки только считаются,
+    чтобы повтор не продублировал уже доставленные сообщения.
 
-                logger.info("[NOTIFICATION] telegram_notifier imported successfully")
+    Args:
+        messages: Список пар [telegram_id, текст сообщения]
+        notification_type: Тип уведомления (для логирования)
 
-                logger.info(
-                    f"[NOTIFICATION] Sending message to telegram_id={user.telegram_id}, message_length={len(message)}"
-                )
-                success = telegram_notifier.send_notification_to_user(telegram_id=user.telegram_id, message=message)
+    Returns:
+        Dict с количеством отправленных и неудачных сообщений
+    """
+    from app.core.telegram_sender import telegram_sender
+
+    try:
+        results = run_async(telegram_sender.send_many([(telegram_id, message) for telegram_id, message in messages]))
+    except Exception as e:
+        logger.error(f"[NOTIFICATION] Error sending batch of {notification_type} notifications: {str(e)}")
+        return {"total": len(messages), "sent": 0, "failed": len(messages)}
+
+    results.pop("failed_chat_ids")
+    logger.info(f"[NOTIFICATION] Batch of {notification_type} notifications processed: {results}")
+    return results
+
+
+# Ключи, объединяющие коммиты за NOTIFICATION_OUTBOX_DISPATCH_DELAY_SECONDS в одну задачу отправки
+# (отдельно для приоритетных уведомлений и для уведомлений, ожидающих окна объединения)
+NOTIFICATION_OUTBOX_DISPATCH_KEY = "notification_outbox:dispatch_scheduled"
+
+# Максимальная длина сообщения Telegram: объединенные уведомления длиннее разбиваются на несколько сообщений
+TELEGRAM_MESSAGE_MAX_LENGTH = 4096
+
+# Разделитель уведомлений в объединенном сообщении
+COALESCED_MESSAGE_SEPARATOR = "\n\n"
 
-                if success:
-                    logger.info(
-                        f"[NOTIFICATION] Sent successfully to user {user_id} "
-                        f"(telegram_id={user.telegram_id}, type={notification_type})"
-                    )
-                else:
-                    logger.warning(
-                        f"[NOTIFICATION] Failed to send to user {user_id} "
-                        f"(telegram_id={user.telegram_id}, type={notification_type})"
-                    )
 
-                return success
+def schedule_notification_outbox_dispatch(coalesced: bool = False) -> None:
+    """
+    Поставить задачу отправки уведомлений из outbox (вызывается UoW после коммита).
 
-        finally:
-            logger.info("[NOTIFICATION] Closing session...")
-            session.close()
-            logger.info("[NOTIFICATION] Session closed")
+    Задача ставится с задержкой NOTIFICATION_OUTBOX_DISPATCH_DELAY_SECONDS (для уведомлений,
+    ожидающих окна объединения, - плюс NOTIFICATION_COALESCE_WINDOW_SECONDS), и в течение
+    NOTIFICATION_OUTBOX_DISPATCH_DELAY_SECONDS повторные вызовы ничего не ставят:
+    уведомления всех коммитов за это время отправляются одной задачей.
 
+    Args:
+        coalesced: Записаны уведомления, ожидающие окна объединения
+    """
+    delay = settings.NOTIFICATION_OUTBOX_DISPATCH_DELAY_SECONDS
+    countdown = delay + settings.NOTIFICATION_COALESCE_WINDOW_SECONDS if coalesced else delay
+    key = f"{NOTIFICATION_OUTBOX_DISPATCH_KEY}:{'coalesced' if coalesced else 'priority'}"
+    try:
+        if not redis_client.client.set(key, "1", nx=True, px=max(int(delay * 1000), 1)):
+            return
     except Exception as e:
-        logger.error(f"[NOTIFICATION] Error sending notification to user {user_id}: {str(e)}", exc_info=True)
-        # Повторяем попытку при ошибке
-        raise self.retry(exc=e, countdown=60)
+        # Redis недоступен - ставим задачу без объединения
+        logger.warning(f"[NOTIFICATION] Failed to check outbox dispatch key in Redis: {e}")
+    dispatch_notification_outbox.apply_async(countdown=countdown)
+
+
+def _coalesce_outbox_entries(entries: list[tuple[int, int, int, str]]) -> list[tuple[int, str, list[int]]]:
+    """
+    Объединить уведомления outbox по получателю: одно сообщение в чат вместо нескольких.
+    Уведомления идут в порядке создания, слишком длинное объединение разбивается на несколько сообщений.
+
+    Args:
+        entries: Список (id записи, user_id, telegram_id, текст сообщения) в порядке создания
+
+    Returns:
+        Список (telegram_id, текст сообщения, ID объединенных записей)
+    """
+    messages: list[tuple[int, str, list[int]]] = []
+    last_message_index: dict[int, int] = {}
+    for entry_id, _, telegram_id, text in entries:
+        index = last_message_index.get(telegram_id)
+        if index is not None:
+            _, merged_text, entry_ids = messages[index]
+            merged_text = f"{merged_text}{COALESCED_MESSAGE_SEPARATOR}{text}"
+            if len(merged_text) <= TELEGRAM_MESSAGE_MAX_LENGTH:
+                messages[index] = (telegram_id, merged_text, entry_ids + [entry_id])
+                continue
+        last_message_index[telegram_id] = len(messages)
+        messages.append((telegram_id, text, [entry_id]))
+    return messages
+
+
+def _send_outbox_entries(entries: list[tuple[int, int, int, str]]) -> tuple[list[int], list[int], int]:
+    """
+    Отправить захваченные уведомления outbox одной пачкой (объединив уведомления каждого получателя).
+
+    Args:
+        entries: Список (id записи, user_id, telegram_id, текст сообщения) в порядке создания
+
+    Returns:
+        (ID отправленных записей, ID записей с неудачной отправкой, количество сообщений Telegram)
+    """
+    from app.core.telegram_sender import telegram_sender
+
+    messages = _coalesce_outbox_entries(entries)
+    try:
+        results = run_async(telegram_sender.send_many([(telegram_id, text) for telegram_id, text, _ in messages]))
+    except Exception as e:
+        logger.error(f"[NOTIFICATION] Error sending batch of {len(entries)} outbox notifications: {str(e)}")
+        return [], [entry[0] for entry in entries], len(messages)
+
+    # Отправитель возвращает chat_id неудачных отправок - сопоставляем их с сообщениями.
+    # Сообщения в заблокированные чаты (blocked/suppressed) не повторяются и удаляются как отправленные
+    failed_chat_ids = Counter(results["failed_chat_ids"])
+    sent_ids, failed_ids = [], []
+    for telegram_id, _, entry_ids in messages:
+        if failed_chat_ids[telegram_id]:
+            failed_chat_ids[telegram_id] -= 1
+            failed_ids.extend(entry_ids)
+        else:
+            sent_ids.extend(entry_ids)
+    return sent_ids, failed_ids, len(messages)
+
+
+@task_decorator(
+    name="app.tasks.notification.dispatch_notification_outbox",
+    bind=True,
+    acks_late=True,
+)
+def dispatch_notification_outbox(self) -> dict:
+    """
+    Отправить уведомления из outbox.
+
+    Уведомления записываются в outbox в транзакции бизнес-операции, поэтому отправляются
+    только для закоммиченного состояния, а запросы к Telegram не выполняются под блокировками строк.
+
+    Пачка захватывается (FOR UPDATE SKIP LOCKED + аренда) в короткой транзакции вместе с еще ожидающими
+    окна уведомлениями тех же пользователей, уведомления каждого получателя объединяются в одно сообщение
+    и отправляются через AsyncTelegramSender без открытой транзакции, затем отправленные записи удаляются,
+    а неудачные планируются на повтор (после NOTIFICATION_OUTBOX_MAX_ATTEMPTS попыток - failed).
+    Несколько задач могут работать параллельно: захваченные записи пропускаются.
+
+    Returns:
+        Dict с количеством захваченных, отправленных и неудачных уведомлений и сообщений Telegram
+    """
+    results = {"claimed": 0, "messages": 0, "sent": 0, "failed": 0, "exhausted": 0}
+    batch_size = settings.NOTIFICATION_OUTBOX_BATCH_SIZE
+    lease_seconds = settings.NOTIFICATION_OUTBOX_LEASE_SECONDS
+
+    try:
+        for _ in range(settings.NOTIFICATION_OUTBOX_MAX_BATCHES_PER_RUN):
+            session = db_manager.get_sync_session()
+            try:
+                with SyncUnitOfWork(session, yookassa_client) as uow:
+                    entries = uow.notification_outbox.claim_pending(batch_size, lease_seconds)
+            finally:
+                session.close()
+
+            if not entries:
+                break
+            results["claimed"] += len(entries)
+
+            sent_ids, failed_ids, messages_count = _send_outbox_entries(entries)
+            results["messages"] += messages_count
+            results["sent"] += len(sent_ids)
+            results["failed"] += len(failed_ids)
+
+            session = db_manager.get_sync_session()
+            try:
+                with SyncUnitOfWork(session, yookassa_client) as uow:
+                    uow.notification_outbox.delete_sent(sent_ids)
+                    results["exhausted"] += uow.notification_outbox.reschedule_failed(
+                        failed_ids,
+                        settings.NOTIFICATION_OUTBOX_RETRY_DELAY_SECONDS,
+                        settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS,
+                    )
+            finally:
+                session.close()
+
+    except Exception as e:
+        # Захваченные записи будут отправлены снова после истечения аренды
+        logger.error(f"[NOTIFICATION] Error dispatching notification outbox: {str(e)}", exc_info=True)
+        results["error"] = str(e)
+
+    if results["claimed"]:
+        logger.info(f"[NOTIFICATION] Notification outbox dispatched: {results}")
+    return results
 
 
 @task_decorator(name="app.tasks.notification.send_payment_notification")
@@ -2,11 +2,15 @@
 Payment-related Celery tasks
 """
 
-from typing import Any
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
 
 from app.celery_app import celery_app
+from app.core.config import settings
+from app.core.exceptions import YookassaUnavailable
 from app.core.logger import logger
-from app.tasks.utils import run_async
+from app.tasks.utils import run_async, yookassa_retry_countdown
 
 
 # Условный декоратор для задач Celery
@@ -56,14 +60,14 @@ def create_refund_for_card_change(self, payment_id: int) -> dict[str, Any]:
     """
 
     async def _create_refund():
-        from app.core.clients.yookassa_client import yookassa_client
+        from app.core.clients.async_yookassa_client import async_yookassa_client
         from app.core.database import db_manager
         from app.database.unit_of_work import UnitOfWork
         from app.services.payment_service import PaymentService
 
         session = await db_manager.get_session()
         try:
-            uow = UnitOfWork(session, yookassa_client)
+            uow = UnitOfWork(session, async_yookassa_client)
             async with uow:
                 payment_service = PaymentService(uow)
 
@@ -134,6 +138,14 @@ def create_refund_for_card_change(self, payment_id: int) -> dict[str, Any]:
     try:
         result = run_async(_create_refund())
         return result
+    except YookassaUnavailable as e:
+        # API Юкассы недоступно - откладываем задачу, а не ждем в воркере
+        logger.warning(f"YooKassa unavailable, refund for payment {payment_id} deferred: {e}")
+        raise self.retry(
+            exc=e,
+            countdown=yookassa_retry_countdown(e.retry_after),
+            max_retries=settings.YOOKASSA_CIRCUIT_MAX_DEFERRALS,
+        )
     except Exception as e:
         # Если это последняя попытка или ошибка не требует retry
         if self.request.retries >= self.max_retries:
@@ -148,15 +160,316 @@ def create_refund_for_card_change(self, payment_id: int) -> dict[str, Any]:
 
 
 @celery_app.task(name="app.tasks.payment.retry_failed_payments")
-def retry_failed_payments():
+def retry_failed_payments() -> dict[str, Any]:
     """
-    Retry failed payments that haven't exceeded max retries
+    Запустить попытки автосписания, время которых наступило (payment.next_retry_at <= now).
+
+    Заменяет цепочки apply_async(countdown=...): расписание попыток хранится в БД,
+    поэтому не теряется и не дублируется при перезапуске воркеров.
+
+    Логика:
+    1. Захватить пачку платежей по индексу next_retry_at (FOR UPDATE SKIP LOCKED)
+       и сдвинуть их next_retry_at на время аренды - коммит
+    2. Запустить retry_auto_payment_attempt для каждого со следующим номером попытки
+    3. Повторять, пока есть платежи с наступившим next_retry_at
+
+    Returns:
+        Dict с количеством запущенных попыток
     """
-    # TODO: Implement retry failed payments logic
-    # 1. Query failed payments with retry_count < max_retries
-    # 2. Retry each payment
-    # 3. Log results
-    pass
+    from app.core.clients.yookassa_client import yookassa_client
+    from app.core.database import db_manager
+    from app.database.sync_unit_of_work import SyncUnitOfWork
+    from app.tasks.auto_payment import retry_auto_payment_attempt
+
+    dispatched = 0
+    while True:
+        session = db_manager.get_sync_session()
+        with SyncUnitOfWork(session, yookassa_client) as uow:
+            claimed = uow.payments.claim_due_retries(
+                limit=settings.AUTO_PAYMENT_RETRY_SWEEP_BATCH_SIZE,
+                lease_seconds=settings.AUTO_PAYMENT_RETRY_LEASE_SECONDS,
+            )
+
+        for payment_id, attempt_number in claimed:
+            retry_auto_payment_attempt.delay(payment_id, attempt_number + 1)
+        dispatched += len(claimed)
+
+        if len(claimed) < settings.AUTO_PAYMENT_RETRY_SWEEP_BATCH_SIZE:
+            break
+
+    if dispatched:
+        logger.info(f"Dispatched {dispatched} due auto payment attempts")
+    return {"dispatched": dispatched}
+
+
+@celery_app.task(name="app.tasks.payment.cleanup_processed_webhook_events")
+def cleanup_processed_webhook_events() -> dict[str, Any]:
+    """
+    Удалить из резервной таблицы дедупликации webhook-ов события старше YOOKASSA_WEBHOOK_DEDUP_TTL_SECONDS
+    (таблица заполняется, только пока Redis недоступен).
+
+    Returns:
+        Dict с количеством удаленных записей
+    """
+    from app.core.clients.yookassa_client import yookassa_client
+    from app.core.database import db_manager
+    from app.database.sync_unit_of_work import SyncUnitOfWork
+
+    created_before = datetime.now(timezone.utc) - timedelta(seconds=settings.YOOKASSA_WEBHOOK_DEDUP_TTL_SECONDS)
+    session = db_manager.get_sync_session()
+    with SyncUnitOfWork(session, yookassa_client) as uow:
+        deleted = uow.processed_webhook_events.delete_created_before(created_before)
+
+    if deleted:
+        logger.info(f"Deleted {deleted} processed webhook events created before {created_before.isoformat()}")
+    return {"deleted": deleted}
+
+
+@task_decorator(
+    name="app.tasks.payment.reconcile_payments",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=300,
+)
+def reconcile_payments(self, created_from: Optional[str] = None, created_to: Optional[str] = None) -> dict[str, Any]:
+    """
+    Сверить незавершенные платежи (pending/waiting_for_capture) со списком платежей Юкассы.
+
+    По умолчанию сверяются платежи за последние PAYMENT_RECONCILIATION_WINDOW_HOURS часов,
+    кроме созданных позже PAYMENT_RECONCILIATION_MIN_AGE_MINUTES минут назад (для них еще ждем webhook).
+
+    Логика:
+    1. Статусы (кроме succeeded) исправляются пачками UPDATE в одной транзакции - коммит
+    2. Платежи, перешедшие в succeeded, обрабатываются как webhook payment.succeeded: статус платежа
+       меняется в одной транзакции с активацией/продлением подписки и сохранением платежного метода.
+       Если обработка не удалась, платеж остается незавершенным и будет сверен при следующем запуске
+
+    Args:
+        created_from: Начало интервала (ISO 8601), по умолчанию - now - окно
+        created_to: Конец интервала (ISO 8601), по умолчанию - now - минимальный возраст
+
+    Returns:
+        Dict со статистикой сверки
+    """
+    from app.core.clients.yookassa_client import yookassa_client
+    from app.core.database import db_manager
+    from app.database.sync_unit_of_work import SyncUnitOfWork
+    from app.services.payment_reconciliation_service_sync import PaymentReconciliationServiceSync
+
+    now = datetime.now(timezone.utc)
+    window_to = (
+        datetime.fromisoformat(created_to)
+        if created_to
+        else now - timedelta(minutes=settings.PAYMENT_RECONCILIATION_MIN_AGE_MINUTES)
+    )
+    window_from = (
+        datetime.fromisoformat(created_from)
+        if created_from
+        else window_to - timedelta(hours=settings.PAYMENT_RECONCILIATION_WINDOW_HOURS)
+    )
+
+    try:
+        session = db_manager.get_sync_session()
+        with SyncUnitOfWork(session, yookassa_client) as uow:
+            result = PaymentReconciliationServiceSync(uow).reconcile(window_from, window_to)
+    except YookassaUnavailable as e:
+        logger.warning(f"YooKassa unavailable, payment reconciliation deferred: {e}")
+        raise self.retry(
+            exc=e,
+            countdown=yookassa_retry_countdown(e.retry_after),
+            max_retries=settings.YOOKASSA_CIRCUIT_MAX_DEFERRALS,
+        )
+    except Exception as e:
+        logger.error(f"Error reconciling payments: {str(e)}", exc_info=True)
+        raise self.retry(exc=e)
+
+    succeeded = result.pop("succeeded")
+    if succeeded:
+        result["succeeded_processed"] = run_async(_process_reconciled_succeeded_payments(succeeded))
+    return result
+
+
+async def _process_reconciled_succeeded_payments(payment_objects: list[dict[str, Any]]) -> int:
+    """
+    Обработать платежи, которые по данным Юкассы перешли в succeeded, так же, как webhook payment.succeeded.
+    Каждый платеж - в своей транзакции (статус платежа + подписка), ошибка одного не откатывает остальные,
+    а необработанный платеж остается незавершенным в БД для следующей сверки.
+
+    Returns:
+        Количество обработанных платежей
+    """
+    from app.core.clients.async_yookassa_client import async_yookassa_client
+    from app.core.database import db_manager
+    from app.database.unit_of_work import UnitOfWork
+    from app.services.payment_service import PaymentService
+
+    processed = 0
+    for payment_object in payment_objects:
+        session = await db_manager.get_session()
+        try:
+            async with UnitOfWork(session, async_yookassa_client) as uow:
+                await PaymentService(uow).process_webhook({"event": "payment.succeeded", "object": payment_object})
+            processed += 1
+        except Exception as e:
+            logger.error(f"Error processing reconciled payment {payment_object.get('id')}: {str(e)}", exc_info=True)
+        finally:
+            await session.close()
+    return processed
+
+
+@task_decorator(
+    name="app.tasks.payment.consume_payment_webhooks",
+    bind=True,
+    acks_late=True,
+)
+def consume_payment_webhooks(self) -> dict[str, Any]:
+    """
+    Обработать webhook-и Юкассы, поставленные endpoint-ом в Redis Stream.
+
+    Логика:
+    1. Забрать зависшие сообщения упавших потребителей (XAUTOCLAIM), затем читать новые (XREADGROUP)
+    2. Пачку из YOOKASSA_WEBHOOK_BATCH_SIZE событий обработать PaymentService.process_webhook в одной транзакции
+    3. Если транзакция пачки упала - обработать события пачки по одному (ошибка одного не откатывает остальные)
+    4. Обработанные сообщения подтвердить (XACK); неудачные остаются в группе и забираются повторно,
+       после YOOKASSA_WEBHOOK_MAX_DELIVERIES попыток - в dead letter поток
+
+    Запускается периодически (YOOKASSA_WEBHOOK_CONSUMER_INTERVAL_SECONDS) и завершается, когда поток пуст;
+    параллельные запуски не мешают друг другу - группа выдает каждое сообщение одному потребителю.
+
+    Returns:
+        Dict с количеством обработанных пачек, событий, неудачных и перенесенных в dead letter
+    """
+    import os
+    import socket
+
+    from app.core.payment_webhook_stream import payment_webhook_stream
+
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    batch_size = settings.YOOKASSA_WEBHOOK_BATCH_SIZE
+    results = {"batches": 0, "events": 0, "failed": 0, "dead_lettered": 0}
+
+    try:
+        payment_webhook_stream.ensure_group()
+        messages = payment_webhook_stream.claim_stale(consumer, batch_size)
+        for _ in range(settings.YOOKASSA_WEBHOOK_CONSUMER_MAX_BATCHES):
+            if not messages:
+                messages = payment_webhook_stream.read(consumer, batch_size)
+            if not messages:
+                break
+            _consume_payment_webhook_messages(messages, results)
+            messages = []
+    except Exception as e:
+        # Неподтвержденные сообщения будут забраны повторно после YOOKASSA_WEBHOOK_CLAIM_IDLE_SECONDS
+        logger.error(f"Error consuming payment webhooks: {str(e)}", exc_info=True)
+        results["error"] = str(e)
+
+    if results["batches"]:
+        logger.info(f"Payment webhooks consumed: {results}")
+    return results
+
+
+def _consume_payment_webhook_messages(messages: list[tuple[str, Optional[dict[str, Any]]]], results: dict) -> None:
+    """
+    Обработать пачку сообщений потока webhook-ов и подтвердить обработанные.
+
+    Args:
+        messages: Список (ID сообщения, событие webhook-а или None, если payload не разбирается)
+        results: Счетчики задачи consume_payment_webhooks (обновляются)
+    """
+    from app.core.payment_webhook_stream import payment_webhook_stream
+
+    valid = []
+    for message_id, event in messages:
+        if event is None:
+            payment_webhook_stream.dead_letter(message_id, event, "invalid payload")
+            results["dead_lettered"] += 1
+        else:
+            valid.append((message_id, event))
+
+    failed_indexes = run_async(_process_webhook_batch([event for _, event in valid])) if valid else []
+    results["batches"] += 1
+    results["events"] += len(valid)
+    results["failed"] += len(failed_indexes)
+
+    failed_ids = [valid[index][0] for index in failed_indexes]
+    failed_set = set(failed_ids)
+    payment_webhook_stream.ack([message_id for message_id, _ in valid if message_id not in failed_set])
+
+    delivery_counts = payment_webhook_stream.get_delivery_counts(failed_ids)
+    for index in failed_indexes:
+        message_id, event = valid[index]
+        if delivery_counts.get(message_id, 0) >= settings.YOOKASSA_WEBHOOK_MAX_DELIVERIES:
+            payment_webhook_stream.dead_letter(message_id, event, "max deliveries exceeded")
+            results["dead_lettered"] += 1
+
+
+async def _process_webhook_batch(events: list[dict[str, Any]]) -> list[int]:
+    """
+    Обработать пачку webhook-ов в одной транзакции.
+    Если транзакция пачки не удалась, события обрабатываются по одному, каждое в своей транзакции.
+
+    Args:
+        events: События webhook-ов в порядке поступления
+
+    Returns:
+        Индексы событий, обработка которых не удалась
+    """
+    try:
+        await _process_webhooks_in_transaction(events)
+        return []
+    except Exception as e:
+        logger.warning(f"Payment webhook batch of {len(events)} failed, processing one by one: {str(e)}")
+
+    failed_indexes = []
+    for index, event in enumerate(events):
+        try:
+            await _process_webhooks_in_transaction([event])
+        except Exception as e:
+            logger.error(
+                f"Error processing payment webhook {event.get('event')} for {event.get('object', {}).get('id')}: "
+                f"{str(e)}",
+                exc_info=True,
+            )
+            failed_indexes.append(index)
+    return failed_indexes
+
+
+async def _process_webhooks_in_transaction(events: list[dict[str, Any]]) -> None:
+    """
+    Обработать события webhook-ов в одной транзакции.
+
+    Пока транзакция не завершена, захваты событий в Redis продлеваются каждую треть
+    YOOKASSA_WEBHOOK_DEDUP_PROCESSING_TTL_SECONDS: захват не истекает посреди долгой пачки
+    (иначе повтор события обработал бы другой воркер), а после падения воркера истекает быстро.
+
+    Args:
+        events: События webhook-ов в порядке поступления
+    """
+    from app.core.clients.async_yookassa_client import async_yookassa_client
+    from app.core.database import db_manager
+    from app.database.unit_of_work import UnitOfWork
+    from app.services.payment_service import PaymentService
+
+    session = await db_manager.get_session()
+    try:
+        async with UnitOfWork(session, async_yookassa_client) as uow:
+            heartbeat = asyncio.create_task(_refresh_webhook_claims(uow))
+            try:
+                service = PaymentService(uow)
+                for event in events:
+                    await service.process_webhook(event)
+            finally:
+                heartbeat.cancel()
+    finally:
+        await session.close()
+
+
+async def _refresh_webhook_claims(uow) -> None:
+    """Продлевать захваты событий webhook-ов текущей транзакции, пока задачу не отменят"""
+    interval = settings.YOOKASSA_WEBHOOK_DEDUP_PROCESSING_TTL_SECONDS / 3
+    while True:
+        await asyncio.sleep(interval)
+        await uow.processed_webhook_events.refresh_claimed()
 
 
 @celery_app.task(name="app.tasks.payment.process_payment_async")
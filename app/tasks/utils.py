@@ -1,36 +1,106 @@
 """
 Utility functions for Celery tasks with proper async/await handling.
 
-Best practices for running async code in Celery tasks:
-1. Create a new event loop for each task (Celery runs in sync context)
-2. Properly handle event loop lifecycle
-3. Ensure all async resources are cleaned up
-4. Handle exceptions properly
-5. Use asyncio.run() or properly manage event loop
+Async runtime for Celery workers:
+1. One event loop and one async engine per worker process
+2. Created in worker_process_init (or lazily on the first async task, e.g. for the solo pool)
+3. Every coroutine task runs on the same loop and reuses the asyncpg pool
+4. Closed in worker_process_shutdown
 """
 
 import asyncio
 import logging
+import math
+import os
+import random
 from collections.abc import Coroutine
-from typing import Any
+from typing import Any, Optional
 
 logger = logging.getLogger(__name__)
 
+# Event loop процесса воркера и PID, в котором он создан (после fork loop родителя использовать нельзя)
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+_worker_loop_pid: Optional[int] = None
+
+
+def init_worker_async_runtime() -> asyncio.AbstractEventLoop:
+    """
+    Создать event loop и async engine для текущего процесса воркера.
+
+    ВАЖНО: asyncpg соединения привязываются к event loop при создании.
+    Поэтому engine создается внутри постоянного loop процесса, и все async задачи
+    выполняются в этом же loop - пул соединений переиспользуется между задачами.
+
+    Returns:
+        Event loop процесса
+    """
+    global _worker_loop, _worker_loop_pid
+
+    from app.core.config import settings
+    from app.core.database import db_manager, init_database
+
+    pid = os.getpid()
+    if _worker_loop is not None and _worker_loop_pid == pid and not _worker_loop.is_closed():
+        return _worker_loop
+
+    # Engine, унаследованный от родительского процесса (или от старого loop), привязан к чужому loop.
+    # Его соединения не закрываем: они принадлежат другому процессу/loop
+    if db_manager.engine is not None:
+        logger.debug(f"[PID {pid}] Dropping async engine created outside the worker loop")
+        db_manager.engine = None
+        db_manager.async_session_maker = None
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    async def _init_engine():
+        init_database(debug=settings.DEBUG)
+
+    loop.run_until_complete(_init_engine())
+
+    _worker_loop = loop
+    _worker_loop_pid = pid
+    logger.info(f"[PID {pid}] Async runtime initialized (event loop + async engine)")
+    return loop
+
+
+def shutdown_worker_async_runtime() -> None:
+    """
+    Закрыть async engine, HTTP-клиенты Юкассы и Telegram и event loop процесса воркера.
+    """
+    global _worker_loop, _worker_loop_pid
+
+    if _worker_loop is None or _worker_loop_pid != os.getpid() or _worker_loop.is_closed():
+        return
+
+    from app.core.clients.async_yookassa_client import async_yookassa_client
+    from app.core.database import db_manager
+    from app.core.telegram_sender import telegram_sender
+
+    loop = _worker_loop
+    try:
+        loop.run_until_complete(async_yookassa_client.aclose())
+        loop.run_until_complete(telegram_sender.aclose())
+        loop.run_until_complete(db_manager.close())
+        loop.run_until_complete(loop.shutdown_asyncgens())
+    except Exception as e:
+        logger.warning(f"Error closing async runtime: {e}")
+    finally:
+        db_manager.engine = None
+        db_manager.async_session_maker = None
+        loop.close()
+        asyncio.set_event_loop(None)
+        _worker_loop = None
+        _worker_loop_pid = None
+
 
 def run_async(coro: Coroutine) -> Any:
     """
     Run an async coroutine in a Celery task.
 
-    Best practices:
-    - Creates a new event loop for the task
-    - Ensures database engine is initialized in this loop
-    - Runs the coroutine
-    - Properly cleans up the loop
-    - Handles all exceptions
-
-    ВАЖНО: asyncpg соединения привязываются к event loop при создании.
-    Если engine был создан в другом loop, соединения не будут работать.
-    Поэтому мы проверяем и пересоздаем engine в текущем loop, если нужно.
+    Выполняет корутину в постоянном event loop процесса воркера
+    (создается в worker_process_init или при первом вызове).
+    Engine и пул соединений не пересоздаются между задачами.
 
     Args:
         coro: The coroutine to run
@@ -44,75 +114,30 @@ def run_async(coro: Coroutine) -> Any:
     # Check if there's already an event loop running
     # This shouldn't happen in Celery tasks (they run in sync context)
     try:
-        loop = asyncio.get_running_loop()
-        # If we're already in an async context, we can't use run_until_complete
-        logger.warning("Event loop already running, this shouldn't happen in Celery tasks")
-        raise RuntimeError("Cannot run async code in already running event loop")
+        asyncio.get_running_loop()
     except RuntimeError:
         # No event loop running, which is expected in Celery tasks
         pass
+    else:
+        coro.close()
+        logger.warning("Event loop already running, this shouldn't happen in Celery tasks")
+        raise RuntimeError("Cannot run async code in already running event loop")
 
-    # Create a new event loop for this task
-    # Each task gets its own isolated event loop
-    loop = None
-    try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-
-        # ВАЖНО: asyncpg соединения привязываются к event loop при создании.
-        # Если engine был создан в другом loop (например, в worker_process_init),
-        # соединения не будут работать в новом loop.
-        # Решение: пересоздаем engine в текущем loop, если он уже был создан.
-        async def ensure_db_in_current_loop():
-            """Убедиться, что БД engine создан в текущем event loop"""
-            from app.core.config import settings
-            from app.core.database import db_manager, init_database
-
-            # Если engine уже создан, закрываем его и пересоздаем в текущем loop
-            # Это гарантирует, что все соединения создаются в правильном loop
-            if db_manager.engine is not None:
-                logger.debug("Recreating database engine in current event loop")
-                await db_manager.close()
-                # Сбрасываем engine, чтобы init_database мог его пересоздать
-                db_manager.engine = None
-                db_manager.async_session_maker = None
-
-            # Инициализируем БД в текущем event loop
-            init_database(debug=settings.DEBUG)
-
-        # Убеждаемся, что БД инициализирована в этом loop
-        loop.run_until_complete(ensure_db_in_current_loop())
-
-        # Run the coroutine
-        return loop.run_until_complete(coro)
-    finally:
-        # Clean up: cancel any remaining tasks
-        if loop is not None:
-            try:
-                # Get all pending tasks
-                pending = asyncio.all_tasks(loop)
-                if pending:
-                    logger.debug(f"Cancelling {len(pending)} pending tasks")
-                    for task in pending:
-                        task.cancel()
-                    # Wait for cancellation to complete (with timeout)
-                    try:
-                        loop.run_until_complete(
-                            asyncio.wait_for(asyncio.gather(*pending, return_exceptions=True), timeout=5.0)
-                        )
-                    except asyncio.TimeoutError:
-                        logger.warning("Timeout waiting for tasks to cancel")
-            except Exception as e:
-                logger.warning(f"Error cancelling pending tasks: {e}")
-            finally:
-                # Close the event loop
-                try:
-                    loop.close()
-                except Exception as e:
-                    logger.warning(f"Error closing event loop: {e}")
-                finally:
-                    # Remove the loop from thread-local storage
-                    try:
-                        asyncio.set_event_loop(None)
-                    except Exception:
-                        pass
+    loop = init_worker_async_runtime()
+    return loop.run_until_complete(coro)
+
+
+def yookassa_retry_countdown(retry_after: float) -> int:
+    """
+    Countdown повторного запуска задачи, когда API Юкассы недоступно (YookassaUnavailable).
+
+    К retry_after добавляется случайный разброс, чтобы отложенные задачи не пришли
+    одновременно в момент пробного запроса circuit breaker.
+
+    Args:
+        retry_after: Через сколько секунд API снова принимает запросы
+
+    Returns:
+        Задержка в секундах
+    """
+    return math.ceil(retry_after) + random.randint(1, 5)
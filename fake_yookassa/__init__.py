@@ -0,0 +1,3 @@
+"""
+Локальная замена API Юкассы для нагрузочного тестирования (платежи, возвраты, webhook-и).
+"""
@@ -0,0 +1,82 @@
+"""
+Fake YooKassa configuration
+"""
+
+from typing import Optional
+
+from pydantic import BaseModel
+from pydantic_settings import BaseSettings
+
+
+class EndpointProfile(BaseModel):
+    """Поведение одной операции API: задержка ответа и доля ошибок"""
+
+    median_ms: float = 0.0  # Медиана задержки ответа
+    p99_ms: float = 0.0  # 99-й перцентиль задержки (логнормальное распределение), <= median_ms - без разброса
+    error_429_rate: float = 0.0  # Доля ответов 429 Too Many Requests
+    error_500_rate: float = 0.0  # Доля ответов 500 Internal Server Error
+
+
+# Операции API: create (POST /payments), capture, cancel, find (GET /payments/{id}), refund (POST /refunds)
+ENDPOINTS = ("create", "capture", "cancel", "find", "refund")
+
+# Готовые профили поведения API
+PROFILES: dict[str, dict[str, EndpointProfile]] = {
+    "instant": {name: EndpointProfile() for name in ENDPOINTS},
+    "realistic": {
+        "create": EndpointProfile(median_ms=350, p99_ms=1500),
+        "capture": EndpointProfile(median_ms=300, p99_ms=1200),
+        "cancel": EndpointProfile(median_ms=300, p99_ms=1200),
+        "find": EndpointProfile(median_ms=120, p99_ms=600),
+        "refund": EndpointProfile(median_ms=400, p99_ms=1500),
+    },
+    "degraded": {
+        "create": EndpointProfile(median_ms=1500, p99_ms=8000, error_429_rate=0.05, error_500_rate=0.05),
+        "capture": EndpointProfile(median_ms=1200, p99_ms=6000, error_429_rate=0.05, error_500_rate=0.05),
+        "cancel": EndpointProfile(median_ms=1200, p99_ms=6000, error_429_rate=0.05, error_500_rate=0.05),
+        "find": EndpointProfile(median_ms=500, p99_ms=3000, error_429_rate=0.05, error_500_rate=0.05),
+        "refund": EndpointProfile(median_ms=1500, p99_ms=8000, error_429_rate=0.05, error_500_rate=0.05),
+    },
+}
+
+
+class FakeYookassaConfig(BaseSettings):
+    """Fake YooKassa configuration (переменные окружения с префиксом FAKE_YOOKASSA_)"""
+
+    HOST: str = "0.0.0.0"
+    PORT: int = 8100
+
+    PROFILE: str = "realistic"  # instant / realistic / degraded
+    ENDPOINTS: dict[str, EndpointProfile] = {}  # Переопределение профиля по операциям (JSON)
+    ERROR_429_RATE: Optional[float] = None  # Доля ответов 429 для всех операций (поверх профиля)
+    ERROR_500_RATE: Optional[float] = None  # Доля ответов 500 для всех операций (поверх профиля)
+    RETRY_AFTER_SECONDS: float = 1.0  # Заголовок Retry-After в ответах 429
+
+    SUCCEED_DELAY_SECONDS: float = 2.0  # Через сколько pending-платеж переходит в succeeded/waiting_for_capture
+    SUCCEED_DELAY_JITTER_SECONDS: float = 1.0  # Случайная добавка к задержке перехода
+    CANCEL_RATE: float = 0.0  # Доля платежей, которые вместо succeeded переходят в canceled
+    SAVE_PAYMENT_METHOD: bool = True  # payment_method.saved у новых платежей (согласие на автоплатежи)
+
+    WEBHOOK_URL: Optional[str] = "http://localhost:8000/api/v1/payments/webhook"  # None - webhook-и не отправляются
+    WEBHOOK_ATTEMPTS: int = 3  # Попыток доставки webhook-а
+
+    class Config:
+        env_prefix = "FAKE_YOOKASSA_"
+        env_file = ".env"
+        case_sensitive = False
+        extra = "ignore"
+
+    def get_endpoint_profiles(self) -> dict[str, EndpointProfile]:
+        """Профили операций с учетом переопределений из окружения"""
+        profiles = {}
+        for name, profile in PROFILES[self.PROFILE].items():
+            profile = self.ENDPOINTS.get(name, profile).model_copy()
+            if self.ERROR_429_RATE is not None:
+                profile.error_429_rate = self.ERROR_429_RATE
+            if self.ERROR_500_RATE is not None:
+                profile.error_500_rate = self.ERROR_500_RATE
+            profiles[name] = profile
+        return profiles
+
+
+config = FakeYookassaConfig()
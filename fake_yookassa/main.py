@@ -0,0 +1,394 @@
+"""
+Fake YooKassa: локальный HTTP-сервер с API платежей и возвратов Юкассы для нагрузочного тестирования.
+
+Запуск:
+    python -m fake_yookassa.main
+    В окружении биллинга: YOOKASSA_API_URL=http://localhost:8100/v3
+
+Операции: POST /v3/payments, POST /v3/payments/{id}/capture, POST /v3/payments/{id}/cancel,
+GET /v3/payments/{id}, GET /v3/payments (список с курсором), POST /v3/refunds.
+Через SUCCEED_DELAY_SECONDS созданный платеж переходит в succeeded (или waiting_for_capture
+при capture=false), о каждом переходе отправляется webhook на FAKE_YOOKASSA_WEBHOOK_URL.
+Данные хранятся в памяти - сервер запускается одним процессом.
+
+Управление во время теста:
+- GET /_fake/state - профили операций и счетчики запросов
+- PUT /_fake/endpoints/{operation} - изменить задержку и долю ошибок операции
+- POST /_fake/reset - очистить платежи, возвраты и счетчики
+"""
+
+import asyncio
+import logging
+import math
+import random
+import sys
+import uuid
+from collections import Counter
+from collections.abc import Coroutine
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+import httpx
+import uvicorn
+from fastapi import APIRouter, FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+
+from fake_yookassa.config import ENDPOINTS, EndpointProfile, config
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", stream=sys.stdout, force=True
+)
+logger = logging.getLogger(__name__)
+
+# z-оценка 99-го перцентиля нормального распределения (для логнормальной задержки)
+P99_Z = 2.326
+
+
+def _now() -> str:
+    """Текущее время в формате API Юкассы"""
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _amount(value: Any, currency: str = "RUB") -> dict[str, str]:
+    """Сумма в формате API Юкассы"""
+    return {"value": f"{float(value):.2f}", "currency": currency}
+
+
+def _error(status_code: int, code: str, description: str, headers: Optional[dict] = None) -> JSONResponse:
+    """Ответ с ошибкой в формате API Юкассы"""
+    return JSONResponse(
+        status_code=status_code,
+        content={"type": "error", "id": str(uuid.uuid4()), "code": code, "description": description},
+        headers=headers,
+    )
+
+
+class FakeYookassa:
+    """Состояние fake-сервера: платежи, возвраты, ответы по ключам идемпотентности и счетчики"""
+
+    def __init__(self):
+        self.profiles: dict[str, EndpointProfile] = config.get_endpoint_profiles()
+        self.payments: dict[str, dict[str, Any]] = {}
+        self.refunds: dict[str, dict[str, Any]] = {}
+        self.idempotency: dict[str, dict[str, Any]] = {}
+        self.two_stage: set[str] = set()
+        self.stats: Counter = Counter()
+        self._tasks: set[asyncio.Task] = set()
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def reset(self) -> None:
+        """Очистить данные и счетчики (профили операций сохраняются)"""
+        self.payments.clear()
+        self.refunds.clear()
+        self.idempotency.clear()
+        self.two_stage.clear()
+        self.stats.clear()
+
+    async def close(self) -> None:
+        """Остановить отложенные переходы статусов и закрыть HTTP-клиент webhook-ов"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def _spawn(self, coro: Coroutine) -> None:
+        """Запустить фоновую задачу (ссылка хранится до ее завершения)"""
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def simulate(self, operation: str) -> Optional[JSONResponse]:
+        """
+        Выдержать задержку операции и при необходимости вернуть внедренную ошибку.
+
+        Returns:
+            Ответ 429/500 или None, если запрос обрабатывается штатно
+        """
+        profile = self.profiles[operation]
+        self.stats[f"{operation}.requests"] += 1
+
+        delay_ms = profile.median_ms
+        if profile.median_ms > 0 and profile.p99_ms > profile.median_ms:
+            sigma = math.log(profile.p99_ms / profile.median_ms) / P99_Z
+            delay_ms = profile.median_ms * math.exp(random.gauss(0.0, sigma))
+        if delay_ms > 0:
+            await asyncio.sleep(delay_ms / 1000)
+
+        roll = random.random()
+        if roll < profile.error_429_rate:
+            self.stats[f"{operation}.429"] += 1
+            return _error(
+                429,
+                "too_many_requests",
+                "Too many requests",
+                headers={"Retry-After": str(math.ceil(config.RETRY_AFTER_SECONDS))},
+            )
+        if roll < profile.error_429_rate + profile.error_500_rate:
+            self.stats[f"{operation}.500"] += 1
+            return _error(500, "internal_server_error", "Internal server error")
+        return None
+
+    async def notify(self, event: str, obj: dict[str, Any]) -> None:
+        """Отправить webhook о событии на FAKE_YOOKASSA_WEBHOOK_URL (с повторами)"""
+        if not config.WEBHOOK_URL:
+            return
+        if self._http is None:
+            self._http = httpx.AsyncClient(timeout=10.0)
+
+        payload = {"type": "notification", "event": event, "object": dict(obj)}
+        for attempt in range(1, config.WEBHOOK_ATTEMPTS + 1):
+            try:
+                response = await self._http.post(config.WEBHOOK_URL, json=payload)
+                if response.is_success:
+                    self.stats["webhooks.delivered"] += 1
+                    return
+                logger.warning(f"Webhook {event} for {obj['id']} returned {response.status_code}")
+            except httpx.HTTPError as e:
+                logger.warning(f"Webhook {event} for {obj['id']} failed: {e}")
+            await asyncio.sleep(attempt)
+        self.stats["webhooks.failed"] += 1
+
+    async def settle(self, payment_id: str) -> None:
+        """Перевести pending-платеж в succeeded/canceled (или waiting_for_capture) после задержки"""
+        await asyncio.sleep(config.SUCCEED_DELAY_SECONDS + random.uniform(0.0, config.SUCCEED_DELAY_JITTER_SECONDS))
+        payment = self.payments.get(payment_id)
+        if payment is None or payment["status"] != "pending":
+            return
+
+        if random.random() < config.CANCEL_RATE:
+            payment.update(
+                status="canceled",
+                cancellation_details={"party": "payment_network", "reason": "insufficient_funds"},
+            )
+            payment.pop("confirmation", None)
+            await self.notify("payment.canceled", payment)
+            return
+
+        payment["paid"] = True
+        payment["payment_method"]["saved"] = payment["payment_method"]["saved"] or config.SAVE_PAYMENT_METHOD
+        payment.pop("confirmation", None)
+        if payment_id not in self.two_stage:
+            payment.update(status="succeeded", captured_at=_now(), refundable=True)
+            await self.notify("payment.succeeded", payment)
+        else:
+            payment.update(status="waiting_for_capture", expires_at=_now())
+            await self.notify("payment.waiting_for_capture", payment)
+
+    def create_payment(self, body: dict[str, Any]) -> dict[str, Any]:
+        """Создать платеж (pending) и запланировать смену статуса"""
+        payment_id = str(uuid.uuid4())
+        amount = body["amount"]
+        payment = {
+            "id": payment_id,
+            "status": "pending",
+            "paid": False,
+            "amount": _amount(amount["value"], amount.get("currency", "RUB")),
+            "description": body.get("description"),
+            "created_at": _now(),
+            "metadata": body.get("metadata", {}),
+            "refundable": False,
+            "refunded_amount": _amount(0, amount.get("currency", "RUB")),
+            "test": True,
+        }
+        if not body.get("capture", False):
+            self.two_stage.add(payment_id)
+        if body.get("payment_method_id"):
+            # Автоплатеж по сохраненному методу - без подтверждения пользователем
+            payment["payment_method"] = {"type": "bank_card", "id": body["payment_method_id"], "saved": True}
+        else:
+            payment["payment_method"] = {"type": "bank_card", "id": payment_id, "saved": False}
+            payment["confirmation"] = {
+                "type": "redirect",
+                "return_url": (body.get("confirmation") or {}).get("return_url"),
+                "confirmation_url": f"https://yoomoney.ru/checkout/payments/v2/contract?orderId={payment_id}",
+            }
+
+        self.payments[payment_id] = payment
+        self._spawn(self.settle(payment_id))
+        return payment
+
+
+fake = FakeYookassa()
+api = APIRouter(prefix="/v3")
+control = APIRouter(prefix="/_fake")
+
+
+async def _idempotent(operation: str, key: Optional[str], handler) -> JSONResponse:
+    """
+    Выполнить операцию с учетом задержки/ошибок профиля и ключа идемпотентности.
+    Повторный запрос с тем же ключом возвращает сохраненный ответ.
+    """
+    injected = await fake.simulate(operation)
+    if injected is not None:
+        return injected
+    if not key:
+        return _error(400, "invalid_request", "Idempotence-Key header is required")
+    if key in fake.idempotency:
+        return JSONResponse(fake.idempotency[key])
+
+    result = handler()
+    if isinstance(result, JSONResponse):
+        return result
+    fake.idempotency[key] = result
+    return JSONResponse(result)
+
+
+@api.post("/payments")
+async def create_payment(request: Request, idempotence_key: Optional[str] = Header(None)):
+    """Создать платеж"""
+    body = await request.json()
+    if not (body.get("amount") or {}).get("value"):
+        return _error(400, "invalid_request", "Parameter amount is required")
+    return await _idempotent("create", idempotence_key, lambda: fake.create_payment(body))
+
+
+@api.post("/payments/{payment_id}/capture")
+async def capture_payment(payment_id: str, idempotence_key: Optional[str] = Header(None)):
+    """Подтвердить двухстадийный платеж"""
+
+    def handler():
+        payment = fake.payments.get(payment_id)
+        if payment is None:
+            return _error(404, "not_found", f"Payment {payment_id} not found")
+        if payment["status"] != "waiting_for_capture":
+            return _error(400, "invalid_request", f"Payment status is {payment['status']}")
+        payment.update(status="succeeded", captured_at=_now(), refundable=True)
+        fake._spawn(fake.notify("payment.succeeded", payment))
+        return payment
+
+    return await _idempotent("capture", idempotence_key, handler)
+
+
+@api.post("/payments/{payment_id}/cancel")
+async def cancel_payment(payment_id: str, idempotence_key: Optional[str] = Header(None)):
+    """Отменить платеж"""
+
+    def handler():
+        payment = fake.payments.get(payment_id)
+        if payment is None:
+            return _error(404, "not_found", f"Payment {payment_id} not found")
+        if payment["status"] != "waiting_for_capture":
+            return _error(400, "invalid_request", f"Payment status is {payment['status']}")
+        payment.update(
+            status="canceled", cancellation_details={"party": "merchant", "reason": "canceled_by_merchant"}
+        )
+        fake._spawn(fake.notify("payment.canceled", payment))
+        return payment
+
+    return await _idempotent("cancel", idempotence_key, handler)
+
+
+@api.get("/payments")
+async def list_payments(
+    created_at_gte: Optional[datetime] = Query(None, alias="created_at.gte"),
+    created_at_lt: Optional[datetime] = Query(None, alias="created_at.lt"),
+    status: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    """Список платежей по интервалу created_at, постранично по курсору (курсор - смещение в выборке)"""
+    injected = await fake.simulate("find")
+    if injected is not None:
+        return injected
+
+    items = [
+        payment
+        for payment in fake.payments.values()
+        if (created_at_gte is None or datetime.fromisoformat(payment["created_at"]) >= created_at_gte)
+        and (created_at_lt is None or datetime.fromisoformat(payment["created_at"]) < created_at_lt)
+        and (status is None or payment["status"] == status)
+    ]
+    offset = int(cursor or 0)
+    page = {"type": "list", "items": items[offset : offset + limit]}
+    if offset + limit < len(items):
+        page["next_cursor"] = str(offset + limit)
+    return JSONResponse(page)
+
+
+@api.get("/payments/{payment_id}")
+async def get_payment(payment_id: str):
+    """Получить информацию о платеже"""
+    injected = await fake.simulate("find")
+    if injected is not None:
+        return injected
+    payment = fake.payments.get(payment_id)
+    if payment is None:
+        return _error(404, "not_found", f"Payment {payment_id} not found")
+    return JSONResponse(payment)
+
+
+@api.post("/refunds")
+async def create_refund(request: Request, idempotence_key: Optional[str] = Header(None)):
+    """Создать возврат (сразу succeeded)"""
+    body = await request.json()
+
+    def handler():
+        payment = fake.payments.get(body.get("payment_id"))
+        if payment is None:
+            return _error(404, "not_found", f"Payment {body.get('payment_id')} not found")
+        available = float(payment["amount"]["value"]) - float(payment["refunded_amount"]["value"])
+        value = float((body.get("amount") or {}).get("value", available))
+        if payment["status"] != "succeeded" or value <= 0 or value > available + 1e-9:
+            return _error(400, "invalid_request", f"Refund of {value} is not available for payment {payment['id']}")
+
+        currency = payment["amount"]["currency"]
+        refunded = float(payment["refunded_amount"]["value"]) + value
+        payment["refunded_amount"] = _amount(refunded, currency)
+        payment["refundable"] = refunded < float(payment["amount"]["value"])
+        refund = {
+            "id": str(uuid.uuid4()),
+            "payment_id": payment["id"],
+            "status": "succeeded",
+            "amount": _amount(value, currency),
+            "created_at": _now(),
+        }
+        fake.refunds[refund["id"]] = refund
+        fake._spawn(fake.notify("refund.succeeded", refund))
+        return refund
+
+    return await _idempotent("refund", idempotence_key, handler)
+
+
+@control.get("/state")
+async def get_state():
+    """Профили операций, счетчики запросов/ошибок/webhook-ов и количество платежей по статусам"""
+    return {
+        "profiles": {name: profile.model_dump() for name, profile in fake.profiles.items()},
+        "stats": dict(fake.stats),
+        "payments": dict(Counter(payment["status"] for payment in fake.payments.values())),
+        "refunds": len(fake.refunds),
+    }
+
+
+@control.put("/endpoints/{operation}")
+async def update_endpoint(operation: str, profile: EndpointProfile):
+    """Изменить задержку и долю ошибок операции без перезапуска"""
+    if operation not in ENDPOINTS:
+        raise HTTPException(status_code=404, detail=f"Unknown operation {operation}, expected one of {ENDPOINTS}")
+    fake.profiles[operation] = profile
+    return profile
+
+
+@control.post("/reset")
+async def reset():
+    """Очистить платежи, возвраты и счетчики"""
+    fake.reset()
+    return {"status": "ok"}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info(f"Fake YooKassa started: profile={config.PROFILE}, webhook_url={config.WEBHOOK_URL}")
+    yield
+    await fake.close()
+
+
+app = FastAPI(title="Fake YooKassa", lifespan=lifespan)
+app.include_router(api)
+app.include_router(control)
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=config.HOST, port=config.PORT, workers=1)
@@ -0,0 +1,28 @@
+"""add last_auto_payment_date and status/end_date index to subscriptions
+
+Revision ID: add_auto_payment_claim
+Revises: add_assigned_user_id
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "add_auto_payment_claim"
+down_revision = "add_assigned_user_id"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Маркер обработки автоплатежа (захват подписок через FOR UPDATE SKIP LOCKED)
+    op.add_column("subscriptions", sa.Column("last_auto_payment_date", sa.Date(), nullable=True))
+    # Индекс для выборки подписок по статусу и дате окончания
+    op.create_index("ix_subscriptions_status_end_date", "subscriptions", ["status", "end_date"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_subscriptions_status_end_date", table_name="subscriptions")
+    op.drop_column("subscriptions", "last_auto_payment_date")
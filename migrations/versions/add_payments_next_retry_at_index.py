@@ -0,0 +1,31 @@
+"""add partial index on payments.next_retry_at
+
+Revision ID: add_payments_next_retry_idx
+Revises: add_auto_payment_claim
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "add_payments_next_retry_idx"
+down_revision = "add_auto_payment_claim"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Индекс для выборки попыток автосписания с наступившим next_retry_at
+    op.create_index(
+        "ix_payments_next_retry_at",
+        "payments",
+        ["next_retry_at"],
+        unique=False,
+        postgresql_where=sa.text("next_retry_at IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_payments_next_retry_at", table_name="payments")
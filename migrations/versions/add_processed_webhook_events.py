@@ -0,0 +1,38 @@
+"""add processed_webhook_events table
+
+Revision ID: add_processed_webhook_events
+Revises: add_notification_outbox
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "add_processed_webhook_events"
+down_revision = "add_notification_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Резерв дедупликации webhook-ов Юкассы на время недоступности Redis
+    op.create_table(
+        "processed_webhook_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("object_id", sa.String(length=255), nullable=False),
+        sa.Column("event", sa.String(length=100), nullable=False),
+        sa.Column("status", sa.String(length=50), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("object_id", "event", "status", name="uq_processed_webhook_events_key"),
+    )
+    op.create_index(
+        op.f("ix_processed_webhook_events_created_at"), "processed_webhook_events", ["created_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_processed_webhook_events_created_at"), table_name="processed_webhook_events")
+    op.drop_table("processed_webhook_events")
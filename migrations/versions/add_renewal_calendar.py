@@ -0,0 +1,47 @@
+"""add renewal_calendar table
+
+Revision ID: add_renewal_calendar
+Revises: add_payments_next_retry_idx
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "add_renewal_calendar"
+down_revision = "add_payments_next_retry_idx"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Календарь продлений: одна запись на активную подписку, ключ выборки - дата автосписания
+    op.create_table(
+        "renewal_calendar",
+        sa.Column("subscription_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("plan_id", sa.Integer(), nullable=False),
+        sa.Column("due_date", sa.Date(), nullable=False),
+        sa.ForeignKeyConstraint(["subscription_id"], ["subscriptions.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["plan_id"], ["subscription_plans.id"]),
+        sa.PrimaryKeyConstraint("subscription_id"),
+    )
+    op.create_index("ix_renewal_calendar_due_date", "renewal_calendar", ["due_date", "subscription_id"], unique=False)
+
+    # Заполняем календарь текущими активными подписками
+    op.execute(
+        """
+        INSERT INTO renewal_calendar (subscription_id, user_id, plan_id, due_date)
+        SELECT id, user_id, plan_id, (end_date AT TIME ZONE 'UTC')::date
+        FROM subscriptions
+        WHERE status = 'active'
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_renewal_calendar_due_date", table_name="renewal_calendar")
+    op.drop_table("renewal_calendar")